@@ -309,11 +309,12 @@ private function generateChunkAudio(AudioBookChapterChunk $chunk, AudioBookChapt
 
         // Run Edge TTS
         $python = 'D:\\Download\\apps\\laragon\\www\\sumotech\\.venv\\Scripts\\python.exe';
-        $script = storage_path('scripts/edge_tts_generate.py');
+        $script = storage_path('scripts/dubsync.py');
 
         $process = new Process([
             $python,
             $script,
+            'tts',
             '--text',
             $chunk->text_content,
             '--out',
@@ -32,11 +32,12 @@ public function generate(Request $request)
 
         // Use absolute path to Python in virtual environment
         $python = 'D:\\Download\\apps\\laragon\\www\\sumotech\\.venv\\Scripts\\python.exe';
-        $script = storage_path('scripts/edge_tts_generate.py');
+        $script = storage_path('scripts/dubsync.py');
 
         $process = new Process([
             $python,
             $script,
+            'tts',
             '--text',
             $text,
             '--out',
@@ -637,7 +637,7 @@ private function generateWithEdgeTTS(
         $outputPath = Storage::path($filename);
 
         // Path to Python script
-        $scriptPath = storage_path('scripts/edge_tts_generate.py');
+        $scriptPath = storage_path('scripts/dubsync.py');
         $pythonPath = base_path('.venv/bin/python');
 
         // Escape text for command line
@@ -648,7 +648,7 @@ private function generateWithEdgeTTS(
         $rateStr = ($ratePercent >= 0 ? '+' : '') . $ratePercent . '%';
 
         // Build command
-        $command = "\"{$pythonPath}\" \"{$scriptPath}\" --text \"{$escapedText}\" --out \"{$outputPath}\" --voice \"{$selectedVoice}\" --rate \"{$rateStr}\" 2>&1";
+        $command = "\"{$pythonPath}\" \"{$scriptPath}\" tts --text \"{$escapedText}\" --out \"{$outputPath}\" --voice \"{$selectedVoice}\" --rate \"{$rateStr}\" 2>&1";
 
         Log::info('Edge TTS Command', [
             'voice' => $selectedVoice,
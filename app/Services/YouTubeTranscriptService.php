@@ -4,6 +4,7 @@
 
 use Exception;
 use Illuminate\Support\Facades\Log;
+use Symfony\Component\Process\ExecutableFinder;
 use Symfony\Component\Process\Process;
 
 class YouTubeTranscriptService
@@ -19,7 +20,7 @@ public function getTranscript(string $videoId): array
         try {
             Log::info('YouTubeTranscriptService: Starting to fetch transcript for video: ' . $videoId);
 
-            $pythonScript = storage_path('scripts/get_youtube_transcript.py');
+            $pythonScript = storage_path('scripts/dubsync.py');
 
             // Check if Python script exists
             if (!file_exists($pythonScript)) {
@@ -30,20 +31,14 @@ public function getTranscript(string $videoId): array
             // Find Python executable
             $pythonCmd = env('PYTHON_PATH', 'python');
 
-            // Verify Python is available
-            $checkProcess = new Process([$pythonCmd, '--version']);
-            $checkProcess->run();
-            if (!$checkProcess->isSuccessful()) {
-                Log::error('Python executable not found or not working', [
-                    'python_cmd' => $pythonCmd,
-                    'error' => $checkProcess->getErrorOutput()
-                ]);
+            // Verify Python is available, without spawning a `python --version` process
+            if (!$this->pythonExists($pythonCmd)) {
+                Log::error('Python executable not found', ['python_cmd' => $pythonCmd]);
                 throw new Exception('Python not found in system. Tried: ' . $pythonCmd);
             }
 
             // Use Symfony Process for reliable execution
-            // Redirect stderr to null to avoid DEBUG messages mixing with JSON output
-            $process = new Process([$pythonCmd, $pythonScript, $videoId]);
+            $process = new Process([$pythonCmd, $pythonScript, 'transcript', $videoId]);
             $process->setTimeout(120); // 120 seconds timeout
             $process->setIdleTimeout(60);
 
@@ -205,7 +200,7 @@ public function getMetadata(string $videoId): array
         try {
             Log::info('YouTubeTranscriptService: Starting to fetch metadata for video: ' . $videoId);
 
-            $pythonScript = storage_path('scripts/get_youtube_metadata.py');
+            $pythonScript = storage_path('scripts/dubsync.py');
 
             // Check if Python script exists
             if (!file_exists($pythonScript)) {
@@ -214,7 +209,7 @@ public function getMetadata(string $videoId): array
             }
 
             // Use Symfony Process for reliable execution
-            $process = new Process(['python', $pythonScript, $videoId]);
+            $process = new Process(['python', $pythonScript, 'metadata', $videoId]);
             $process->setTimeout(30); // 30 seconds timeout
             $process->setIdleTimeout(30);
 
@@ -292,4 +287,22 @@ public function getMetadata(string $videoId): array
             throw new Exception('Không thể lấy metadata từ YouTube: ' . $e->getMessage());
         }
     }
+
+    /**
+     * Check that the Python interpreter exists without starting it
+     *
+     * A path such as D:\Python312\python.exe or /usr/bin/python3 must point to a
+     * file; a bare command is looked up on PATH (with PATHEXT on Windows).
+     *
+     * @param string $pythonCmd
+     * @return bool
+     */
+    private function pythonExists(string $pythonCmd): bool
+    {
+        if (strpbrk($pythonCmd, '/\\') !== false) {
+            return is_file($pythonCmd) && (DIRECTORY_SEPARATOR === '\\' || is_executable($pythonCmd));
+        }
+
+        return (new ExecutableFinder())->find($pythonCmd) !== null;
+    }
 }
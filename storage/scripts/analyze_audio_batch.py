@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Batch Loudness and Silence Analyzer
+Measures every generated chunk of a book in one invocation: each file is
+decoded once to PCM and NumPy computes its integrated loudness (ITU-R
+BS.1770 / EBU R128), sample and true peak, and where speech starts and ends,
+with the files spread over a process pool sized to the machine's cores
+
+Usage:
+    python analyze_audio_batch.py [--root DIR] [--workers N] PATH [PATH ...]
+    python analyze_audio_batch.py [--root DIR] - < paths.txt
+A directory stands for the .mp3/.wav files directly inside it.
+
+Each file gets a sidecar next to it (chunk_3.mp3 -> chunk_3.analysis.json):
+    {"duration": 6.912, "integrated_lufs": -19.84, "sample_peak_db": -3.1, "true_peak_db": -2.87,
+     "speech_start": 0.231, "speech_end": 6.52, "leading_silence": 0.231, "trailing_silence": 0.392,
+     "inpoint": 0.191, "outpoint": 6.56, "gain_db": 3.84,
+     "filter": "atrim=start=0.191:end=6.56,asetpts=PTS-STARTPTS,volume=3.84dB", ...}
+so a merge can trim and level every chunk in its single encode: inpoint and
+outpoint (speech padded by --pad-ms) suit ffmpeg concat-list directives, and
+'filter' is the per-input chain for a filter_complex concat. gain_db brings
+the chunk to --target-lufs without pushing its true peak over --max-true-peak.
+A sidecar that matches its file's size, mtime and the settings is reused
+unless --force is given.
+
+Output: one JSON line per file as it finishes, with per-phase timings, then
+a summary line. Exits 1 when any file failed.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from audio_batch import decode, default_workers, emit, run_pool
+from script_metrics import metrics
+from tts_cache import write_json_atomic
+
+AUDIO_EXTENSIONS = ('.mp3', '.wav')
+SIDECAR_SUFFIX = '.analysis.json'
+SIDECAR_VERSION = 1
+
+# Loudness target and ceiling, as in the FFmpeg loudnorm=I=-16:TP=-1.5 used for final renders
+DEFAULT_TARGET_LUFS = -16.0
+DEFAULT_MAX_TRUE_PEAK = -1.5
+
+# Speech detection: 10 ms frames louder than the threshold, in runs of at
+# least --min-speech-ms, start and end speech
+DEFAULT_SILENCE_THRESHOLD_DB = -50.0
+DEFAULT_MIN_SPEECH_MS = 30
+DEFAULT_PAD_MS = 40
+DETECT_FRAME_SECONDS = 0.01
+
+# BS.1770: 400 ms gating blocks every 100 ms, -70 LUFS absolute and -10 LU relative gates
+GATE_BLOCK_SECONDS = 0.4
+GATE_STEP_SECONDS = 0.1
+ABSOLUTE_GATE = -70.0
+RELATIVE_GATE = -10.0
+
+# K-weighting is applied by FFT overlap-add with the filter's impulse
+# response, truncated where it has decayed below float32 precision
+FILTER_TAIL_SECONDS = 0.1
+FILTER_BLOCK = 1 << 16
+
+# True peak: 4x oversampling with a windowed-sinc interpolator (12 taps per phase)
+OVERSAMPLE = 4
+INTERPOLATOR_TAPS = 48
+
+
+def biquad_response(b, a, z):
+    """Frequency response of a biquad at the points z = e^-jw"""
+    return (b[0] + b[1] * z + b[2] * z * z) / (a[0] + a[1] * z + a[2] * z * z)
+
+
+def k_weighting_taps(sample_rate):
+    """
+    Impulse response of the BS.1770 K-weighting filter at sample_rate
+
+    The two stages (a +4 dB high shelf at 1.5 kHz, then a 38 Hz high-pass)
+    are designed for the given rate rather than taken from the 48 kHz
+    coefficient table, so 24 kHz edge-tts output is weighted correctly.
+    """
+    shelf_gain = 10 ** (4.0 / 40)
+    w0 = 2 * np.pi * 1500.0 / sample_rate
+    alpha = np.sin(w0) / (2 * (1 / np.sqrt(2)))
+    cos_w0, root = np.cos(w0), 2 * np.sqrt(shelf_gain) * alpha
+    shelf_b = (shelf_gain * ((shelf_gain + 1) + (shelf_gain - 1) * cos_w0 + root),
+               -2 * shelf_gain * ((shelf_gain - 1) + (shelf_gain + 1) * cos_w0),
+               shelf_gain * ((shelf_gain + 1) + (shelf_gain - 1) * cos_w0 - root))
+    shelf_a = ((shelf_gain + 1) - (shelf_gain - 1) * cos_w0 + root,
+               2 * ((shelf_gain - 1) - (shelf_gain + 1) * cos_w0),
+               (shelf_gain + 1) - (shelf_gain - 1) * cos_w0 - root)
+
+    w0 = 2 * np.pi * 38.0 / sample_rate
+    alpha, cos_w0 = np.sin(w0) / (2 * 0.5), np.cos(w0)
+    high_pass_b = ((1 + cos_w0) / 2, -(1 + cos_w0), (1 + cos_w0) / 2)
+    high_pass_a = (1 + alpha, -2 * cos_w0, 1 - alpha)
+
+    size = 1 << int(np.ceil(np.log2(sample_rate)))
+    z = np.exp(-2j * np.pi * np.arange(size // 2 + 1) / size)
+    response = biquad_response(shelf_b, shelf_a, z) * biquad_response(high_pass_b, high_pass_a, z)
+    return np.fft.irfft(response, size)[:int(sample_rate * FILTER_TAIL_SECONDS)]
+
+
+def fft_filter(samples, taps, block=FILTER_BLOCK):
+    """
+    Convolve (channels, n) audio with an FIR by FFT overlap-add
+
+    Returns:
+        numpy.ndarray: float32 array shaped like samples (the tail is cut)
+    """
+    channels, length = samples.shape
+    size = 1 << int(np.ceil(np.log2(block + len(taps) - 1)))
+    response = np.fft.rfft(taps, size)
+    out = np.zeros((channels, length + size), dtype=np.float32)
+    for start in range(0, length, block):
+        part = np.fft.irfft(np.fft.rfft(samples[:, start:start + block], size) * response, size)
+        out[:, start:start + size] += part
+    return out[:, :length]
+
+
+def integrated_loudness(samples, sample_rate):
+    """
+    Gated integrated loudness in LUFS, or None for silence
+
+    Block mean squares come from a cumulative sum of the K-weighted signal,
+    so all overlapping 400 ms blocks are measured in one vectorized step.
+    Audio shorter than one block is measured as a single block.
+    """
+    weighted = fft_filter(samples, k_weighting_taps(sample_rate))
+    channels, length = weighted.shape
+    block = int(round(GATE_BLOCK_SECONDS * sample_rate))
+    step = int(round(GATE_STEP_SECONDS * sample_rate))
+    energy = np.zeros((channels, length + 1))
+    np.cumsum(np.square(weighted, dtype=np.float64), axis=1, out=energy[:, 1:])
+    if length < block:
+        power = energy[:, -1:].sum(axis=0) / max(1, length)
+    else:
+        starts = np.arange(0, length - block + 1, step)
+        # Channel weights are 1 for mono and stereo
+        power = (energy[:, starts + block] - energy[:, starts]).sum(axis=0) / block
+
+    with np.errstate(divide='ignore'):
+        loudness = -0.691 + 10 * np.log10(power)
+    gated = loudness > ABSOLUTE_GATE
+    if not gated.any():
+        return None
+    relative = -0.691 + 10 * np.log10(power[gated].mean()) + RELATIVE_GATE
+    gated &= loudness > relative
+    return float(-0.691 + 10 * np.log10(power[gated].mean()))
+
+
+def interpolator(oversample=OVERSAMPLE, taps=INTERPOLATOR_TAPS):
+    """Windowed-sinc low-pass for zero-stuffed oversampling (unity passband gain)"""
+    n = np.arange(taps) - (taps - 1) / 2
+    return np.sinc(n / oversample) * np.kaiser(taps, 8.0)
+
+
+def true_peak(samples):
+    """Linear true peak: the sample peak of the 4x oversampled signal"""
+    channels, length = samples.shape
+    taps = interpolator()
+    peak = 0.0
+    overlap = len(taps) // OVERSAMPLE + 1
+    for start in range(0, length, FILTER_BLOCK):
+        lo = max(0, start - overlap)
+        part = samples[:, lo:start + FILTER_BLOCK + overlap]
+        stuffed = np.zeros((channels, part.shape[1] * OVERSAMPLE), dtype=np.float32)
+        stuffed[:, ::OVERSAMPLE] = part
+        # Only the block itself counts; the overlap's cut edges would ring
+        keep = slice((start - lo) * OVERSAMPLE, (start - lo + FILTER_BLOCK) * OVERSAMPLE)
+        for channel in stuffed:
+            peak = max(peak, float(np.abs(np.convolve(channel, taps, 'same')[keep]).max(initial=0.0)))
+    return max(peak, float(np.abs(samples).max(initial=0.0)))
+
+
+def speech_bounds(samples, sample_rate, threshold_db, min_speech_ms):
+    """
+    First and last sample of speech, or None when the file is silent
+
+    10 ms frames of the channel mix louder than threshold_db dBFS are
+    active; speech starts with the first run of active frames at least
+    min_speech_ms long (so clicks are ignored) and ends with the last such
+    run. Both ends are then refined to the first/last sample whose level
+    crosses the threshold inside the boundary frame and its neighbour.
+    """
+    frame = max(1, int(round(sample_rate * DETECT_FRAME_SECONDS)))
+    level = np.abs(samples).max(axis=0)
+    count = len(level) // frame
+    if count == 0:
+        return None
+    power = np.square(samples[:, :count * frame], dtype=np.float64).mean(axis=0).reshape(count, frame).mean(axis=1)
+    with np.errstate(divide='ignore'):
+        active = 10 * np.log10(power) > threshold_db
+
+    run = max(1, int(np.ceil(min_speech_ms / 1000 / DETECT_FRAME_SECONDS)))
+    if count < run:
+        return None
+    full_runs = np.flatnonzero(np.convolve(active, np.ones(run, dtype=int), 'valid') == run)
+    if not len(full_runs):
+        return None
+    first_frame, last_frame = int(full_runs[0]), int(full_runs[-1]) + run - 1
+
+    amplitude = 10 ** (threshold_db / 20)
+    lo = max(0, (first_frame - 1) * frame)
+    crossing = np.flatnonzero(level[lo:(first_frame + 1) * frame] > amplitude)
+    start = lo + int(crossing[0]) if len(crossing) else first_frame * frame
+    hi = min(len(level), (last_frame + 2) * frame)
+    crossing = np.flatnonzero(level[last_frame * frame:hi] > amplitude)
+    end = last_frame * frame + int(crossing[-1]) + 1 if len(crossing) else (last_frame + 1) * frame
+    return start, end
+
+
+def to_db(value):
+    return round(20 * float(np.log10(value)), 2) if value > 0 else None
+
+
+def analyze(samples, sample_rate, settings):
+    """
+    Loudness, peaks, speech bounds and the trim/gain a merge should apply
+
+    Returns:
+        dict: The sidecar's measurement fields
+    """
+    duration = samples.shape[1] / sample_rate
+    loudness = integrated_loudness(samples, sample_rate)
+    sample_peak = float(np.abs(samples).max(initial=0.0))
+    peak = true_peak(samples)
+    bounds = speech_bounds(samples, sample_rate, settings['silence_threshold_db'], settings['min_speech_ms'])
+
+    result = {
+        'duration': round(duration, 3),
+        'sample_rate': sample_rate,
+        'channels': samples.shape[0],
+        'integrated_lufs': round(loudness, 2) if loudness is not None else None,
+        'sample_peak_db': to_db(sample_peak),
+        'true_peak_db': to_db(peak),
+        'silent': bounds is None,
+    }
+    if bounds is None:
+        result.update({'speech_start': None, 'speech_end': None, 'speech_duration': 0.0,
+                       'leading_silence': round(duration, 3),
+                       'trailing_silence': 0.0, 'inpoint': 0.0, 'outpoint': round(duration, 3), 'gain_db': 0.0})
+    else:
+        start, end = bounds[0] / sample_rate, bounds[1] / sample_rate
+        pad = settings['pad_ms'] / 1000
+        gain = 0.0
+        if loudness is not None:
+            gain = settings['target_lufs'] - loudness
+            if peak > 0:
+                gain = min(gain, settings['max_true_peak'] - 20 * float(np.log10(peak)))
+        result.update({
+            'speech_start': round(start, 4),
+            'speech_end': round(end, 4),
+            'speech_duration': round(end - start, 4),
+            'leading_silence': round(start, 4),
+            'trailing_silence': round(duration - end, 4),
+            'inpoint': round(max(0.0, start - pad), 4),
+            'outpoint': round(min(duration, end + pad), 4),
+            'gain_db': round(gain, 2),
+        })
+    result['filter'] = (f"atrim=start={result['inpoint']}:end={result['outpoint']},asetpts=PTS-STARTPTS,"
+                        f"volume={result['gain_db']}dB")
+    return result
+
+
+def sidecar_path(path):
+    return os.path.splitext(path)[0] + SIDECAR_SUFFIX
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def read_sidecar(path, signature, settings):
+    """The sidecar's contents if it was made from this file with these settings, else None"""
+    try:
+        with open(sidecar_path(path), 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (data.get('version') != SIDECAR_VERSION or data.get('source') != signature
+            or data.get('settings') != settings):
+        return None
+    return data
+
+
+def write_sidecar(path, data):
+    """Write the sidecar atomically so a merge never reads half of one"""
+    target = sidecar_path(path)
+    write_json_atomic(target, data)
+    return target
+
+
+def analyze_job(job, result):
+    """
+    Decode and analyze one file and write its sidecar (runs in a pool process through run_job)
+
+    Fills result with status, the measurements and per-phase timings.
+    """
+    start = time.perf_counter()
+    path, settings = job['path'], job['settings']
+    result['path'] = job['name']
+    signature = file_signature(path)
+    cached = None if job['force'] else read_sidecar(path, signature, settings)
+    if cached is not None:
+        result.update({key: value for key, value in cached.items() if key not in ('version', 'source', 'settings')})
+        result.update({'status': 'cached', 'sidecar': sidecar_path(path), 'timings': {}})
+        return
+
+    samples, sample_rate = decode(path)
+    decoded = time.perf_counter()
+    measured = analyze(samples, sample_rate, settings)
+    analyzed = time.perf_counter()
+    sidecar = write_sidecar(path, dict(measured, version=SIDECAR_VERSION, source=signature, settings=settings))
+    result.update(measured)
+    result.update({'status': 'ok', 'sidecar': sidecar, 'timings': {
+        'decode': round(decoded - start, 3),
+        'analyze': round(analyzed - decoded, 3),
+        'write': round(time.perf_counter() - analyzed, 3),
+    }})
+
+
+def read_paths(args):
+    """Paths from the command line ('-' reads one per stdin line); directories expand to their audio files"""
+    paths = []
+    for arg in args.paths:
+        names = [line.strip() for line in sys.stdin if line.strip()] if arg == '-' else [arg]
+        for name in names:
+            full = os.path.join(args.root, name) if args.root and not os.path.isabs(name) else name
+            if os.path.isdir(full):
+                paths.extend((os.path.join(name, entry), os.path.join(full, entry))
+                             for entry in sorted(os.listdir(full))
+                             if entry.lower().endswith(AUDIO_EXTENSIONS))
+            else:
+                paths.append((name, full))
+    return paths
+
+
+def main():
+    metrics.configure()
+    parser = argparse.ArgumentParser(description="Measure loudness, peaks and speech bounds of many audio files")
+    parser.add_argument('paths', nargs='+', help="Audio files or directories, or '-' to read paths from stdin")
+    parser.add_argument('--root', help="Directory relative paths are resolved against")
+    parser.add_argument('--workers', type=int, default=default_workers(),
+                        help="Worker processes (default: number of CPU cores)")
+    parser.add_argument('--target-lufs', type=float, default=DEFAULT_TARGET_LUFS,
+                        help="Integrated loudness gain_db aims for")
+    parser.add_argument('--max-true-peak', type=float, default=DEFAULT_MAX_TRUE_PEAK,
+                        help="True peak (dBTP) gain_db may not exceed")
+    parser.add_argument('--silence-threshold-db', type=float, default=DEFAULT_SILENCE_THRESHOLD_DB,
+                        help="Level (dBFS) below which audio counts as silence")
+    parser.add_argument('--min-speech-ms', type=int, default=DEFAULT_MIN_SPEECH_MS,
+                        help="Shortest sound that counts as speech")
+    parser.add_argument('--pad-ms', type=int, default=DEFAULT_PAD_MS,
+                        help="Silence kept around speech by inpoint/outpoint")
+    parser.add_argument('--force', action='store_true', help="Re-analyze files whose sidecar is current")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    settings = {
+        'target_lufs': args.target_lufs,
+        'max_true_peak': args.max_true_peak,
+        'silence_threshold_db': args.silence_threshold_db,
+        'min_speech_ms': args.min_speech_ms,
+        'pad_ms': args.pad_ms,
+    }
+    jobs = [{'name': name, 'path': path, 'settings': settings, 'force': args.force}
+            for name, path in read_paths(args)]
+
+    counts = {'ok': 0, 'cached': 0, 'error': 0}
+    run_pool(analyze_job, jobs, args.workers, counts)
+
+    emit({
+        'status': 'done',
+        'total': len(jobs),
+        **counts,
+        'workers': args.workers,
+        'elapsed': round(time.perf_counter() - start, 3),
+    })
+    return 1 if counts['error'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MP3 Timeline Assembler
+Builds the final DubSync track from aligned segments by copying their MP3
+frames as-is and filling gaps with pre-built silent frames: no per-gap
+encoding, no re-encode of speech, constant memory
+
+Input (JSON array or JSONL file, or '-' for stdin), one segment per item:
+    {"start_time": 1.25, "end_time": 3.4, "audio_path": "dubsync/tts/seg_1.mp3"}
+
+Usage:
+    python assemble_mp3_timeline.py segments.json --out final.mp3 [--root DIR]
+
+Each segment starts at its start_time to within half a frame (12 ms for
+edge-tts output); when speech runs past the next start_time the next segment
+follows immediately. All segments must share MPEG version, layer, sample rate
+and channel count, otherwise nothing is written and the script exits 1.
+"""
+
+import argparse
+import json
+import mmap
+import os
+import sys
+import time
+
+from mp3_frames import (
+    constant_frames,
+    first_frame,
+    is_layer3,
+    iter_frames,
+    parse_header,
+    silent_frame,
+    vbr_tag,
+)
+from script_metrics import metrics
+from tts_cache import temp_file
+
+# Bytes copied per write when a segment is one contiguous run of frames
+COPY_CHUNK = 1 << 20
+
+# Silent frames kept pre-joined so long gaps take few writes
+SILENCE_BLOCK_FRAMES = 256
+
+
+class FormatMismatchError(ValueError):
+    """A segment's MP3 stream cannot be joined with the others"""
+
+
+def stream_format(data, pos, header):
+    """(MPEG version bits, layer bits, sample rate, channels) of the frame at pos"""
+    return (data[pos + 1] >> 3) & 0x03, (data[pos + 1] >> 1) & 0x03, header[2], header[3]
+
+
+def describe_format(fmt):
+    version = {0: 'MPEG-2.5', 2: 'MPEG-2', 3: 'MPEG-1'}[fmt[0]]
+    layer = {1: 'III', 2: 'II', 3: 'I'}[fmt[1]]
+    return f"{version} Layer {layer} {fmt[2]} Hz {'mono' if fmt[3] == 1 else 'stereo'}"
+
+
+class SilenceBank:
+    """
+    Silent frames matching the header of the first speech frame
+
+    The frame is built once per header and repeated, so a gap of any length
+    costs only writes.
+    """
+
+    def __init__(self):
+        self.blocks = {}
+
+    def block(self, header_bytes):
+        key = bytes(header_bytes)
+        block = self.blocks.get(key)
+        if block is None:
+            block = silent_frame(key) * SILENCE_BLOCK_FRAMES
+            self.blocks[key] = block
+        return block
+
+    def write(self, out, header_bytes, frames):
+        block = self.block(header_bytes)
+        frame_size = len(block) // SILENCE_BLOCK_FRAMES
+        while frames > 0:
+            count = min(frames, SILENCE_BLOCK_FRAMES)
+            out.write(block[:count * frame_size] if count < SILENCE_BLOCK_FRAMES else block)
+            frames -= count
+
+
+def read_segments(path):
+    """Segments from a JSON array or JSONL file, sorted by start_time"""
+    stream = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')
+    try:
+        text = stream.read()
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+    if text.lstrip().startswith('['):
+        segments = json.loads(text)
+    else:
+        segments = [json.loads(line) for line in text.splitlines() if line.strip()]
+    for index, segment in enumerate(segments):
+        if not isinstance(segment, dict) or 'audio_path' not in segment or 'start_time' not in segment:
+            raise ValueError(f"Segment {index} needs 'start_time' and 'audio_path'")
+    return sorted(segments, key=lambda segment: float(segment['start_time']))
+
+
+def copy_frames(data, pos, header, fmt, out, path):
+    """
+    Write every audio frame of data from the frame at pos on, checking formats
+
+    Returns:
+        int: Samples written
+    """
+    count = constant_frames(data, pos, header[0])
+    if count is not None:
+        # Identical headers throughout, so the first frame's format covers all
+        end = pos + count * header[0]
+        while pos < end:
+            chunk = min(COPY_CHUNK, end - pos)
+            out.write(data[pos:pos + chunk])
+            pos += chunk
+        return count * header[1]
+
+    samples = 0
+    for offset, frame in iter_frames(data, pos):
+        frame_fmt = stream_format(data, offset, frame)
+        if frame_fmt != fmt:
+            raise FormatMismatchError(
+                f"{path}: frame at byte {offset} is {describe_format(frame_fmt)}, expected {describe_format(fmt)}"
+            )
+        out.write(data[offset:offset + frame[0]])
+        samples += frame[1]
+    return samples
+
+
+def open_segment(path):
+    """
+    Memory-map a segment and locate its first audio frame
+
+    Returns:
+        tuple: (mmap, offset, header) - a leading Xing/Info/VBRI frame is skipped
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError(f"{path}: empty file")
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        pos, header = first_frame(data)
+        if is_layer3(data, pos) and vbr_tag(data, pos) is not None:
+            pos += header[0]
+            pos, header = next(iter_frames(data, pos), (None, None))
+            if pos is None:
+                raise ValueError("no MPEG audio frames found")
+    except ValueError as e:
+        data.close()
+        raise ValueError(f"{path}: {e}") from None
+    return data, pos, header
+
+
+def mismatched_frame(data, pos, header, fmt):
+    """
+    First frame from pos on whose stream format is not fmt
+
+    Constant-bitrate audio is checked with strided slices: identical first
+    three header bytes fix version, layer and sample rate, leaving only the
+    channel mode bits of the fourth byte to compare.
+
+    Returns:
+        tuple: (offset, format) of the first differing frame, or None when all match
+    """
+    count = constant_frames(data, pos, header[0])
+    if count is not None:
+        modes = {byte >> 6 for byte in set(data[pos + 3:pos + count * header[0]:header[0]])}
+        if all((1 if mode == 3 else 2) == fmt[3] for mode in modes):
+            return None
+    for offset, frame in iter_frames(data, pos):
+        frame_fmt = stream_format(data, offset, frame)
+        if frame_fmt != fmt:
+            return offset, frame_fmt
+    return None
+
+
+def check_formats(paths):
+    """
+    Verify every frame of every segment has the same stream format before writing
+
+    Returns:
+        tuple: (format, header bytes of the first segment's first frame)
+
+    Raises:
+        FormatMismatchError: Naming the first segment (and frame) that differs
+    """
+    fmt = header_bytes = None
+    for path in paths:
+        data, pos, header = open_segment(path)
+        with data:
+            segment_fmt = stream_format(data, pos, header)
+            if fmt is None:
+                fmt, header_bytes = segment_fmt, data[pos:pos + 4]
+            elif segment_fmt != fmt:
+                raise FormatMismatchError(
+                    f"{path} is {describe_format(segment_fmt)}, expected {describe_format(fmt)} "
+                    f"(from {paths[0]})"
+                )
+            mismatch = mismatched_frame(data, pos, header, fmt)
+            if mismatch:
+                raise FormatMismatchError(
+                    f"{path}: frame at byte {mismatch[0]} is {describe_format(mismatch[1])}, "
+                    f"expected {describe_format(fmt)} (from {paths[0]})"
+                )
+    return fmt, header_bytes
+
+
+def assemble(segments, out, root=None):
+    """
+    Write the timeline of segments to the binary file object out
+
+    Returns:
+        dict: Summary (duration, segments, silence_frames, overruns, format)
+    """
+    paths = [os.path.join(root, s['audio_path']) if root else s['audio_path'] for s in segments]
+    if not paths:
+        raise ValueError("No segments to assemble")
+    with metrics.phase('check_formats'):
+        fmt, header_bytes = check_formats(paths)
+    sample_rate = fmt[2]
+    samples_per_frame = parse_header(*header_bytes)[1]
+
+    bank = SilenceBank()
+    written = 0
+    silence_frames = 0
+    overruns = 0
+    for segment, path in zip(segments, paths):
+        gap = round(float(segment['start_time']) * sample_rate) - written
+        if gap < 0:
+            if -gap > samples_per_frame:
+                overruns += 1
+        else:
+            frames = round(gap / samples_per_frame)
+            with metrics.phase('silence'):
+                bank.write(out, header_bytes, frames)
+            silence_frames += frames
+            written += frames * samples_per_frame
+
+        data, pos, header = open_segment(path)
+        with data, metrics.phase('copy'):
+            written += copy_frames(data, pos, header, fmt, out, path)
+
+    return {
+        'duration': round(written / sample_rate, 3),
+        'segments': len(segments),
+        'silence_frames': silence_frames,
+        'overruns': overruns,
+        'format': describe_format(fmt),
+    }
+
+
+def main():
+    metrics.configure()
+    parser = argparse.ArgumentParser(description="Assemble aligned MP3 segments into one timeline")
+    parser.add_argument('segments', help="JSON/JSONL segment list, or '-' for stdin")
+    parser.add_argument('--out', required=True, help="Output MP3 path, or '-' for stdout")
+    parser.add_argument('--root', help="Directory relative audio paths are resolved against")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        segments = read_segments(args.segments)
+        if args.out == '-':
+            summary = assemble(segments, sys.stdout.buffer, root=args.root)
+            sys.stdout.buffer.flush()
+        else:
+            # Write beside the target and rename, so a failure never leaves a partial file
+            directory = os.path.dirname(os.path.abspath(args.out))
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = temp_file(directory, prefix='.timeline-', suffix='.mp3')
+            try:
+                with os.fdopen(fd, 'wb', buffering=COPY_CHUNK) as out:
+                    summary = assemble(segments, out, root=args.root)
+                os.replace(tmp_path, args.out)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    summary['output'] = args.out
+    summary['elapsed_time'] = round(time.perf_counter() - start, 3)
+    print(json.dumps(summary), file=sys.stderr if args.out == '-' else sys.stdout)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
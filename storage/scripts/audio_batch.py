@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Audio Batch Plumbing
+Shared by the batch audio scripts (stretch_audio_batch.py,
+analyze_audio_batch.py): decoding to float32 PCM, the JSONL job reader, the
+process pool that runs one job per file and the JSON result lines
+"""
+
+import json
+import os
+import subprocess
+import sys
+import time
+import wave
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from mp3_frames import first_frame
+from script_metrics import metrics
+
+
+def read_wav(path):
+    """Decode a PCM WAV file to (float32 array (channels, samples), sample rate)"""
+    with wave.open(path, 'rb') as f:
+        channels, width, sample_rate = f.getnchannels(), f.getsampwidth(), f.getframerate()
+        raw = f.readframes(f.getnframes())
+    if width == 1:
+        data = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        data = np.frombuffer(raw, dtype='<i2').astype(np.float32) / 32768
+    elif width == 4:
+        data = np.frombuffer(raw, dtype='<i4').astype(np.float32) / 2147483648
+    else:
+        raise ValueError(f"Unsupported WAV sample width: {width * 8} bits")
+    return data.reshape(-1, channels).T, sample_rate
+
+
+def audio_format(path):
+    """(sample rate, channels) of an MP3 from its first frame header, else via ffprobe"""
+    with open(path, 'rb') as f:
+        head = f.read(1 << 16)
+    try:
+        _, header = first_frame(head)
+        return header[2], header[3]
+    except ValueError:
+        pass
+
+    result = subprocess.run(
+        ['ffprobe', '-v', 'error', '-select_streams', 'a:0', '-show_entries',
+         'stream=sample_rate,channels', '-of', 'json', path],
+        capture_output=True, text=True, check=True,
+    )
+    stream = json.loads(result.stdout)['streams'][0]
+    return int(stream['sample_rate']), int(stream['channels'])
+
+
+def decode(path):
+    """Decode any audio file to (float32 array (channels, samples), sample rate)"""
+    if path.lower().endswith('.wav'):
+        return read_wav(path)
+    sample_rate, channels = audio_format(path)
+    result = subprocess.run(
+        ['ffmpeg', '-v', 'error', '-i', path, '-f', 'f32le', '-ac', str(channels), '-ar', str(sample_rate), '-'],
+        capture_output=True, check=True,
+    )
+    return np.frombuffer(result.stdout, dtype='<f4').reshape(-1, channels).T, sample_rate
+
+
+def error_message(exc):
+    """Result-line error text; a failed ffmpeg/ffprobe call reports its stderr"""
+    if isinstance(exc, subprocess.CalledProcessError):
+        stderr = exc.stderr.decode('utf-8', errors='replace') if isinstance(exc.stderr, bytes) else (exc.stderr or '')
+        return f"{exc.cmd[0]} failed: {stderr.strip() or exc.returncode}"
+    return str(exc)
+
+
+def run_job(function, job):
+    """
+    Run function(job, result) in a pool process, turning a failure into an error result
+
+    function fills the result dict in place, so whatever it recorded before
+    failing (path, id, ...) stays in the error line.
+
+    Returns:
+        dict: The result, with 'elapsed' seconds
+    """
+    start = time.perf_counter()
+    result = {}
+    try:
+        function(job, result)
+    except Exception as e:
+        result.update({'status': 'error', 'error': error_message(e)})
+    result['elapsed'] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def read_jobs(path, validate):
+    """
+    Read a JSONL manifest
+
+    Args:
+        path: Manifest file path, or '-' to read from stdin
+        validate: Called with each job dict; raises ValueError to reject it
+
+    Returns:
+        tuple: (job dicts, error result dicts for malformed lines)
+    """
+    stream = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')
+    jobs, errors = [], []
+    try:
+        for line_no, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                job = json.loads(line)
+                if not isinstance(job, dict):
+                    raise ValueError("job must be a JSON object")
+                validate(job)
+                jobs.append(job)
+            except ValueError as e:
+                errors.append({'status': 'error', 'error': f"Invalid manifest line {line_no}: {e}"})
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    return jobs, errors
+
+
+def emit(record):
+    """Write one JSON result line to stdout and flush it immediately"""
+    print(json.dumps(record, ensure_ascii=False), flush=True)
+
+
+def run_pool(function, jobs, workers, counts):
+    """
+    Run function over jobs on a process pool, emitting each result as it finishes
+
+    Args:
+        function: Module-level function(job, result), see run_job()
+        jobs: Job dicts (picklable)
+        workers: Maximum worker processes
+        counts: Dict of result counts by status, updated in place
+    """
+    if not jobs:
+        return
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(jobs)))) as pool:
+        futures = [pool.submit(run_job, function, job) for job in jobs]
+        for future in as_completed(futures):
+            result = future.result()
+            counts[result['status']] = counts.get(result['status'], 0) + 1
+            # Phases ran in the pool processes; their timings come back with the result
+            for phase, seconds in result.get('timings', {}).items():
+                metrics.add(phase, seconds)
+            emit(result)
+
+
+def default_workers():
+    """Worker processes to use by default: one per CPU core"""
+    return os.cpu_count() or 1
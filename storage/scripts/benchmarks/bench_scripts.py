@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script Benchmark Suite
+Runs the transcript, metadata and Edge TTS scripts as real subprocesses
+against the local fake services, across payload sizes and concurrency levels,
+and reports throughput, p50/p99 latency, peak RSS and process-spawn overhead
+
+Scenarios:
+    transcript        one get_youtube_transcript.py process per video
+    transcript_batch  get_youtube_transcript.py --batch --workers N
+    metadata          one get_youtube_metadata.py process per video
+    tts               one edge_tts_generate.py --text process per segment
+    tts_manifest      edge_tts_generate.py --manifest --concurrency N
+    book              book_scraper.py on an N-chapter nhasachmienphi book,
+                      --workers/--host-connections N
+
+Per-process scenarios run --runs invocations with N at a time; batch
+scenarios run one process of --batch-items items, --repeat times. Latency
+is per process, or per item for batch scenarios. Caches and the TTS duration
+log are disabled; note that a repository .env still overrides the environment.
+
+Usage:
+    python bench_scripts.py [--scenarios transcript,metadata] [--concurrency 1,4,16]
+                            [--size transcript=100,10000] [--json results.json]
+                            [--compare baseline.json --max-regression 0.25]
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import platform
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import Request, urlopen
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.dirname(BENCH_DIR)
+REDIRECT_DIR = os.path.join(BENCH_DIR, 'redirect')
+
+sys.path.insert(0, BENCH_DIR)
+
+from fake_services import REDIRECT_HOSTS  # noqa: E402
+
+TRANSCRIPT_SCRIPT = os.path.join(SCRIPTS_DIR, 'get_youtube_transcript.py')
+METADATA_SCRIPT = os.path.join(SCRIPTS_DIR, 'get_youtube_metadata.py')
+TTS_SCRIPT = os.path.join(SCRIPTS_DIR, 'edge_tts_generate.py')
+BOOK_SCRIPT = os.path.join(SCRIPTS_DIR, 'book_scraper.py')
+
+# Payload sizes per scenario and the fake services setting each one drives
+SCENARIOS = {
+    'transcript': {'sizes': (100, 1000, 10000), 'unit': 'cues', 'config': 'transcript_cues'},
+    'transcript_batch': {'sizes': (100, 1000, 10000), 'unit': 'cues', 'config': 'transcript_cues'},
+    'metadata': {'sizes': (64, 512, 1024), 'unit': 'page KiB', 'config': 'page_kb'},
+    'tts': {'sizes': (10, 50, 200), 'unit': 'words', 'config': None},
+    'tts_manifest': {'sizes': (10, 50, 200), 'unit': 'words', 'config': None},
+    'book': {'sizes': (27, 200), 'unit': 'chapters', 'config': 'book_chapters'},
+}
+
+TTS_SCENARIOS = ('tts', 'tts_manifest')
+
+SAMPLE_WORDS = ("xin", "chào", "các", "bạn", "hôm", "nay", "chúng", "ta", "sẽ", "nói", "về", "điều", "này")
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of values (None when empty)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def sample_text(words):
+    return ' '.join(SAMPLE_WORDS[i % len(SAMPLE_WORDS)] for i in range(words)) + '.'
+
+
+class Services:
+    """The fake services in their own process, so serving does not compete with measuring"""
+
+    def __init__(self, latency):
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.join(BENCH_DIR, 'fake_services.py'), '--latency-ms', str(latency * 1000)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True,
+        )
+        info = json.loads(self.process.stdout.readline() or 'null')
+        if not info:
+            raise SystemExit("Fake services failed to start")
+        self.address = info['address']
+        self.ca_file = info['ca_file']
+        self.context = ssl.create_default_context(cafile=self.ca_file)
+
+    def call(self, path, body=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        request = Request(f"https://{self.address}{path}", data=data, headers={'Content-Type': 'application/json'})
+        with urlopen(request, context=self.context, timeout=10) as response:
+            return json.loads(response.read())
+
+    def configure(self, **values):
+        return self.call('/_bench/config', values)
+
+    def stats(self):
+        return self.call('/_bench/stats')
+
+    def env(self):
+        """Environment for script processes: redirected hosts, fake credentials, no caches, metrics on"""
+        env = dict(os.environ)
+        env.update({
+            'PYTHONPATH': os.pathsep.join(filter(None, [REDIRECT_DIR, env.get('PYTHONPATH')])),
+            'BENCH_SERVICES_ADDR': self.address,
+            'BENCH_REDIRECT_HOSTS': ','.join(REDIRECT_HOSTS),
+            'BENCH_CA_FILE': self.ca_file,
+            'RAPIDAPI_KEY': 'bench-key',
+            'RAPIDAPI_HOST': REDIRECT_HOSTS[0],
+            'YOUTUBE_CACHE': 'false',
+            'TTS_CACHE': 'false',
+            'TTS_DURATION_LOG': 'false',
+            'PYTHON_DEBUG': 'false',
+            'SCRIPT_METRICS': 'true',
+        })
+        env.pop('SCRIPT_METRICS_TEXTFILE', None)
+        return env
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait(timeout=10)
+
+
+def run_process(argv, env, stdin=None):
+    """
+    Run one script process to completion
+
+    Peak RSS is the child's own VmHWM as reported by the redirect shim, or
+    wait4's figure for that child where /proc is unavailable.
+
+    Returns:
+        dict: wall seconds, peak RSS (KiB), exit code, stdout and the metrics record
+    """
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+        start = time.perf_counter()
+        process = subprocess.Popen(argv, stdin=subprocess.PIPE if stdin is not None else subprocess.DEVNULL,
+                                   stdout=out, stderr=err, env=env, cwd=SCRIPTS_DIR)
+        if stdin is not None:
+            process.stdin.write(stdin.encode('utf-8'))
+            process.stdin.close()
+        _, status, usage = os.wait4(process.pid, 0)
+        wall = time.perf_counter() - start
+        process.returncode = os.waitstatus_to_exitcode(status)
+        out.seek(0)
+        err.seek(0)
+        stdout = out.read().decode('utf-8', errors='replace')
+        stderr = err.read().decode('utf-8', errors='replace')
+
+    record = None
+    # wait4's figure includes the harness memory the child was forked with
+    rss_kb = usage.ru_maxrss
+    for line in stderr.splitlines():
+        if line.startswith('{"metrics"'):
+            record = json.loads(line)
+        elif line.startswith('{"bench_peak_rss_kb"'):
+            rss_kb = json.loads(line)['bench_peak_rss_kb']
+    return {
+        'wall': wall,
+        'rss_kb': rss_kb,
+        'returncode': process.returncode,
+        'stdout': stdout,
+        'stderr': stderr,
+        'metrics': record,
+    }
+
+
+def run_many(argvs, env, concurrency):
+    """Run the given processes with at most `concurrency` alive at once"""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        runs = list(pool.map(lambda argv: run_process(argv, env), argvs))
+    return runs, time.perf_counter() - start
+
+
+def summarize(scenario, size, concurrency, runs, wall, items, latencies, errors, stats):
+    """One result record; phases are mean seconds per process from the scripts' own metrics"""
+    phases = {}
+    for run in runs:
+        for name, phase in ((run['metrics'] or {}).get('phases') or {}).items():
+            phases[name] = phases.get(name, 0.0) + phase['seconds']
+    return {
+        'scenario': scenario,
+        'size': size,
+        'unit': SCENARIOS[scenario]['unit'],
+        'concurrency': concurrency,
+        'processes': len(runs),
+        'items': items,
+        'errors': errors,
+        'wall_seconds': round(wall, 4),
+        'throughput': round(items / wall, 3) if wall else None,
+        'p50': round(percentile(latencies, 50), 4) if latencies else None,
+        'p99': round(percentile(latencies, 99), 4) if latencies else None,
+        'peak_rss_kb': max(run['rss_kb'] for run in runs) if runs else None,
+        'phases': {name: round(seconds / len(runs), 4) for name, seconds in phases.items()},
+        'server': stats,
+    }
+
+
+def batch_latencies(runs, field):
+    """Per-item latencies and error count from the JSON lines of batch processes"""
+    latencies, errors = [], 0
+    for run in runs:
+        errors += run['returncode'] != 0 and not run['stdout'].strip()
+        for line in run['stdout'].splitlines():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('status') == 'done' or record.get('type') in ('book', 'done'):
+                continue
+            if 'error' in record:
+                errors += 1
+            elif field in record:
+                latencies.append(record[field])
+    return latencies, errors
+
+
+def bench_scenario(scenario, size, concurrency, services, args, workdir):
+    python = sys.executable
+    env = services.env()
+    items = args.batch_items
+
+    if scenario == 'transcript':
+        argvs = [[python, TRANSCRIPT_SCRIPT, f"bench{i:06d}"] for i in range(args.runs)]
+    elif scenario == 'metadata':
+        argvs = [[python, METADATA_SCRIPT, f"bench{i:06d}"] for i in range(args.runs)]
+    elif scenario == 'tts':
+        text = sample_text(size)
+        argvs = [[python, TTS_SCRIPT, '--text', text, '--out', os.path.join(workdir, f"tts_{i}.mp3"),
+                  '--no-cache', '--no-duration-log'] for i in range(args.runs)]
+    elif scenario == 'transcript_batch':
+        ids = '\n'.join(f"bench{i:06d}" for i in range(items)) + '\n'
+        runs = []
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            runs.append(run_process([python, TRANSCRIPT_SCRIPT, '--batch', '--workers', str(concurrency)],
+                                    env, stdin=ids))
+        wall = time.perf_counter() - start
+        latencies, errors = batch_latencies(runs, 'elapsed_time')
+        return runs, wall, items * len(runs), latencies, errors
+    elif scenario == 'tts_manifest':
+        manifest = os.path.join(workdir, f"manifest_{size}.jsonl")
+        text = sample_text(size)
+        with open(manifest, 'w', encoding='utf-8') as f:
+            for i in range(items):
+                f.write(json.dumps({'id': i, 'text': text, 'out': os.path.join(workdir, f"job_{i}.mp3")},
+                                   ensure_ascii=False) + '\n')
+        argv = [python, TTS_SCRIPT, '--manifest', manifest, '--concurrency', str(concurrency),
+                '--no-cache', '--no-duration-log']
+        runs, wall = run_many([argv] * args.repeat, env, 1)
+        latencies, errors = batch_latencies(runs, 'elapsed')
+        return runs, wall, items * len(runs), latencies, errors
+    elif scenario == 'book':
+        argv = [python, BOOK_SCRIPT, 'https://nhasachmienphi.com/bench-book.html',
+                '--workers', str(concurrency), '--host-connections', str(concurrency)]
+        runs, wall = run_many([argv] * args.repeat, env, 1)
+        latencies, errors = batch_latencies(runs, 'elapsed_time')
+        return runs, wall, size * len(runs), latencies, errors
+    else:
+        raise ValueError(f"Unknown scenario: {scenario}")
+
+    runs, wall = run_many(argvs, env, concurrency)
+    errors = sum(run['returncode'] != 0 for run in runs)
+    latencies = [run['wall'] for run in runs if run['returncode'] == 0]
+    return runs, wall, len(runs), latencies, errors
+
+
+def bench_spawn(services, args):
+    """
+    Process-spawn overhead: a bare interpreter, then each script exiting right
+    after its imports (no arguments, or --help for the TTS generator)
+    """
+    env = services.env()
+    python = sys.executable
+    targets = [
+        ('interpreter', [python, '-c', 'pass']),
+        ('get_youtube_transcript', [python, TRANSCRIPT_SCRIPT]),
+        ('get_youtube_metadata', [python, METADATA_SCRIPT]),
+    ]
+    if tts_available():
+        targets.append(('edge_tts_generate', [python, TTS_SCRIPT, '--help']))
+
+    results = []
+    for name, argv in targets:
+        runs = [run_process(argv, env) for _ in range(args.spawn_runs)]
+        imports = [run['metrics']['phases'].get('imports', {}).get('seconds', 0.0) for run in runs if run['metrics']]
+        results.append({
+            'target': name,
+            'runs': len(runs),
+            'p50': round(percentile([run['wall'] for run in runs], 50), 4),
+            'p99': round(percentile([run['wall'] for run in runs], 99), 4),
+            'imports_p50': round(percentile(imports, 50), 4) if imports else None,
+            'peak_rss_kb': max(run['rss_kb'] for run in runs),
+        })
+    return results
+
+
+def tts_available():
+    return all(importlib.util.find_spec(name) for name in ('edge_tts', 'aiohttp'))
+
+
+def compare(results, baseline, max_regression):
+    """
+    Print p50 and throughput changes against a baseline results file
+
+    Returns:
+        int: Number of results that regressed by more than max_regression
+    """
+    previous = {(r['scenario'], r['size'], r['concurrency']): r for r in baseline.get('results', []) if 'p50' in r}
+    regressions = 0
+    print(f"\n{'scenario':>16} {'size':>7} {'conc':>5} {'p50 change':>11} {'throughput change':>18}")
+    for result in results:
+        before = previous.get((result['scenario'], result['size'], result['concurrency']))
+        if not before or not result.get('p50') or not before.get('p50'):
+            continue
+        p50_change = result['p50'] / before['p50'] - 1
+        throughput_change = result['throughput'] / before['throughput'] - 1
+        regressed = p50_change > max_regression or throughput_change < -max_regression
+        regressions += regressed
+        print(f"{result['scenario']:>16} {result['size']:>7} {result['concurrency']:>5} "
+              f"{p50_change:>+10.1%} {throughput_change:>+17.1%}{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def parse_sizes(values):
+    sizes = {}
+    for value in values or []:
+        scenario, _, numbers = value.partition('=')
+        if scenario not in SCENARIOS or not numbers:
+            raise SystemExit(f"Invalid --size {value!r}; expected SCENARIO=N[,N...]")
+        sizes[scenario] = tuple(int(n) for n in numbers.split(',') if n)
+    return sizes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS), help="Comma-separated scenarios to run")
+    parser.add_argument('--concurrency', default='1,4,16', help="Comma-separated concurrency levels")
+    parser.add_argument('--size', action='append', metavar='SCENARIO=N,N',
+                        help="Override the payload sizes of a scenario (repeatable)")
+    parser.add_argument('--runs', type=int, default=16, help="Processes per size and level (per-process scenarios)")
+    parser.add_argument('--repeat', type=int, default=3, help="Processes per size and level (batch scenarios)")
+    parser.add_argument('--batch-items', type=int, default=32, help="Videos or segments per batch process")
+    parser.add_argument('--spawn-runs', type=int, default=10, help="Runs per spawn-overhead target")
+    parser.add_argument('--latency-ms', type=float, default=20, help="Fake services response latency")
+    parser.add_argument('--json', help="Write the results to this file")
+    parser.add_argument('--compare', help="Baseline results file to compare against")
+    parser.add_argument('--max-regression', type=float, default=0.25,
+                        help="Fractional p50/throughput change that fails --compare (default 0.25)")
+    args = parser.parse_args()
+
+    scenarios = [s for s in args.scenarios.split(',') if s]
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        raise SystemExit(f"Unknown scenario(s): {', '.join(unknown)}")
+    levels = [int(c) for c in args.concurrency.split(',') if c]
+    sizes = parse_sizes(args.size)
+
+    services = Services(args.latency_ms / 1000)
+    results = []
+    try:
+        with tempfile.TemporaryDirectory(prefix='dubsync-bench-') as workdir:
+            spawn = bench_spawn(services, args)
+            print(f"{'spawn target':>24} {'p50 s':>8} {'p99 s':>8} {'imports s':>10} {'RSS MiB':>8}")
+            for row in spawn:
+                imports = f"{row['imports_p50']:.4f}" if row['imports_p50'] is not None else 'n/a'
+                print(f"{row['target']:>24} {row['p50']:>8.4f} {row['p99']:>8.4f} {imports:>10} "
+                      f"{row['peak_rss_kb'] / 1024:>8.1f}")
+
+            print(f"\n{'scenario':>16} {'size':>7} {'conc':>5} {'items/s':>9} {'p50 s':>8} {'p99 s':>8} "
+                  f"{'RSS MiB':>8} {'conns':>6} {'errors':>7}")
+            for scenario in scenarios:
+                if scenario in TTS_SCENARIOS and not tts_available():
+                    results.append({'scenario': scenario, 'skipped': 'edge_tts/aiohttp not installed'})
+                    print(f"{scenario:>16} skipped: edge_tts/aiohttp not installed")
+                    continue
+                spec = SCENARIOS[scenario]
+                for size in sizes.get(scenario, spec['sizes']):
+                    for concurrency in levels:
+                        config = {spec['config']: size} if spec['config'] else {}
+                        services.configure(reset_stats=True, **config)
+                        runs, wall, items, latencies, errors = bench_scenario(
+                            scenario, size, concurrency, services, args, workdir)
+                        result = summarize(scenario, size, concurrency, runs, wall, items, latencies, errors,
+                                           services.stats())
+                        results.append(result)
+                        p50 = f"{result['p50']:.4f}" if result['p50'] is not None else 'n/a'
+                        p99 = f"{result['p99']:.4f}" if result['p99'] is not None else 'n/a'
+                        print(f"{scenario:>16} {size:>7} {concurrency:>5} {result['throughput']:>9.2f} {p50:>8} "
+                              f"{p99:>8} {result['peak_rss_kb'] / 1024:>8.1f} "
+                              f"{result['server']['connections']:>6} {errors:>7}")
+                        if errors and not latencies:
+                            print(f"{'':>16} first error: {(runs[0]['stdout'] or runs[0]['stderr']).strip()[:300]}")
+    finally:
+        services.close()
+
+    report = {
+        'benchmark': 'scripts',
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'latency_ms': args.latency_ms,
+        'spawn': spawn,
+        'results': results,
+    }
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.max_regression)
+        if regressions:
+            print(f"\n{regressions} result(s) regressed by more than {args.max_regression:.0%}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Transcript Pipeline Benchmark
+Compares the original multi-pass transcript formatting with the single-pass
+transcript_pipeline on synthetic RapidAPI responses, reporting wall time and
+peak RSS per input size
+
+Usage:
+    python bench_transcript_pipeline.py [--sizes 10000,50000,100000] [--repeat 3] [--json results.json]
+"""
+
+import argparse
+import html
+import json
+import os
+import subprocess
+import sys
+import time
+import unicodedata
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from transcript_pipeline import normalize_response, parse_response  # noqa: E402
+
+DEFAULT_SIZES = (10000, 50000, 100000)
+
+# Cue texts exercising HTML entities and decomposed (NFD) accents
+SAMPLE_TEXTS = (
+    "so today we&#39;re going to talk about",
+    "the &quot;best&quot; way to cafe\u0301 &amp; re\u0301sume\u0301 writing",
+    "[Music]",
+    "and that&#39;s why it matters so much",
+)
+
+
+def synthetic_response(cues):
+    """RapidAPI-shaped response body with `cues` English items"""
+    items = [
+        {
+            'text': SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)] + f" {i}",
+            'duration': 2.5,
+            'offset': round(i * 2.5, 2),
+            'lang': 'en',
+        }
+        for i in range(cues)
+    ]
+    return json.dumps(items).encode('utf-8')
+
+
+def legacy_pipeline(raw_data):
+    """The pre-pipeline implementation: decode, filter, format, normalize, dump"""
+    try:
+        data = raw_data.decode("utf-8")
+    except UnicodeDecodeError:
+        data = raw_data.decode("iso-8859-1", errors='replace')
+    response_data = json.loads(data)
+
+    formatted_transcript = []
+    current_time = 0.0
+    languages = set()
+    for item in response_data:
+        if isinstance(item, dict) and 'lang' in item:
+            languages.add(item['lang'])
+    if languages and 'en' not in languages:
+        raise Exception("no English transcript")
+    items_to_process = response_data
+    if 'en' in languages:
+        items_to_process = [item for item in response_data if item.get('lang', 'en') == 'en']
+    for item in items_to_process:
+        if isinstance(item, dict) and 'text' in item:
+            start_time = float(item.get('offset', item.get('start', current_time)))
+            duration = float(item.get('duration', 3.0))
+            raw_text = item.get('text', '')
+            if raw_text is None:
+                raw_text = ''
+            if not isinstance(raw_text, str):
+                raw_text = str(raw_text)
+            text = html.unescape(raw_text).strip()
+            formatted_transcript.append({'text': text, 'start': start_time, 'duration': duration})
+            current_time = max(current_time, start_time + duration)
+
+    normalized_transcript = []
+    for item in formatted_transcript:
+        normalized_item = {}
+        for key, value in item.items():
+            if isinstance(value, str):
+                normalized_item[key] = unicodedata.normalize('NFC', value)
+            else:
+                normalized_item[key] = value
+        normalized_transcript.append(normalized_item)
+    return json.dumps(normalized_transcript, ensure_ascii=False, indent=None).encode('utf-8')
+
+
+def single_pass_pipeline(raw_data):
+    return normalize_response(parse_response(raw_data)).to_json()
+
+
+PIPELINES = {
+    'legacy': legacy_pipeline,
+    'single_pass': single_pass_pipeline,
+}
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process in KiB (None where unsupported)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kibibytes
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def run_child(name, cues):
+    """Measure one pipeline on one input size in this (fresh) process"""
+    raw_data = synthetic_response(cues)
+    baseline = peak_rss_kb()
+    start = time.perf_counter()
+    output = PIPELINES[name](raw_data)
+    wall = time.perf_counter() - start
+    print(json.dumps({
+        'pipeline': name,
+        'cues': cues,
+        'wall_seconds': round(wall, 4),
+        'baseline_rss_kb': baseline,
+        'peak_rss_kb': peak_rss_kb(),
+        'output_bytes': len(output),
+    }))
+
+
+def measure(name, cues):
+    """Run one measurement in a subprocess so peak RSS is not shared between runs"""
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--child', name, str(cues)],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES),
+                        help="Comma-separated cue counts")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per pipeline and size (best wall time kept)")
+    parser.add_argument('--json', help="Also write the results to this file")
+    parser.add_argument('--child', nargs=2, metavar=('PIPELINE', 'CUES'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child[0], int(args.child[1]))
+        return
+
+    sizes = [int(s) for s in args.sizes.split(',') if s]
+
+    # Both pipelines must produce byte-identical output
+    sample = synthetic_response(500)
+    if legacy_pipeline(sample) != bytes(single_pass_pipeline(sample)):
+        sys.exit("Output mismatch between legacy and single-pass pipelines")
+
+    results = []
+    print(f"{'cues':>8} {'pipeline':>12} {'wall s':>9} {'peak RSS MiB':>13} {'+RSS MiB':>9}")
+    for cues in sizes:
+        for name in PIPELINES:
+            runs = [measure(name, cues) for _ in range(max(1, args.repeat))]
+            best = min(runs, key=lambda r: r['wall_seconds'])
+            results.append(best)
+            if best['peak_rss_kb'] is None:
+                rss = delta = 'n/a'
+            else:
+                rss = f"{best['peak_rss_kb'] / 1024:.1f}"
+                delta = f"{(best['peak_rss_kb'] - best['baseline_rss_kb']) / 1024:.1f}"
+            print(f"{cues:>8} {name:>12} {best['wall_seconds']:>9.4f} {rss:>13} {delta:>9}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'benchmark': 'transcript_pipeline', 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Import-Time Budget Check
+Measures what each dubsync.py subcommand costs to load in a fresh interpreter
+and fails when it exceeds its budget or pulls in a module it must not need
+
+Import time is the summed self time (python -X importtime) of every module the
+subcommand loads beyond a bare interpreter, median over --runs processes, so
+it is far less noisy than wall time; process wall time is reported alongside.
+
+Usage:
+    python check_import_budget.py [--runs 7] [--scale 1.5] [--json results.json]
+Exits 1 when any budget is exceeded.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.dirname(BENCH_DIR)
+ENTRY = os.path.join(SCRIPTS_DIR, 'dubsync.py')
+
+# Budget (milliseconds of import time) and modules each target must not load.
+# 'dispatcher' is dubsync.py itself, which must not import anything.
+BUDGETS = {
+    'dispatcher': {'budget_ms': 2, 'forbidden': ('argparse', 're', 'json')},
+    'transcript': {'budget_ms': 120, 'forbidden': ('concurrent.futures', 'asyncio', 'aiohttp', 'edge_tts', 'numpy')},
+    'metadata': {'budget_ms': 120, 'forbidden': ('concurrent.futures', 'asyncio', 'aiohttp', 'edge_tts', 'numpy')},
+    'tts': {'budget_ms': 400, 'forbidden': ('numpy', 'sqlite3', 'http.server')},
+    'book': {'budget_ms': 120, 'forbidden': ('asyncio', 'aiohttp', 'edge_tts', 'numpy', 'concurrent.futures')},
+}
+
+
+def import_times(argv):
+    """
+    Run argv under -X importtime
+
+    Returns:
+        tuple: ({module: self microseconds}, wall seconds, exit code)
+    """
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    env.pop('SCRIPT_METRICS', None)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + argv, capture_output=True, text=True, env=env,
+                            cwd=SCRIPTS_DIR)
+    wall = time.perf_counter() - start
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = int(self_us)
+    return modules, wall, result.returncode
+
+
+def target_argv(name):
+    if name == 'dispatcher':
+        return [ENTRY, '--help']
+    # Load the subcommand's module the way dubsync.py does, without running it
+    return ['-c', f"import sys; sys.path.insert(0, {SCRIPTS_DIR!r}); import dubsync; dubsync.load_command({name!r})"]
+
+
+def measure(name, baseline, runs):
+    samples, walls, loaded = [], [], set()
+    for _ in range(runs):
+        modules, wall, code = import_times(target_argv(name))
+        if code != 0:
+            return {'target': name, 'error': f"exited with {code}"}
+        extra = {module: us for module, us in modules.items() if module not in baseline}
+        samples.append(sum(extra.values()) / 1000)
+        walls.append(wall)
+        loaded |= set(extra)
+    return {
+        'target': name,
+        'import_ms': round(statistics.median(samples), 2),
+        'wall_ms': round(statistics.median(walls) * 1000, 1),
+        'modules': len(loaded),
+        'loaded': sorted(loaded),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=7, help="Processes per target (median reported)")
+    parser.add_argument('--scale', type=float, default=1.0, help="Multiply every budget, e.g. for slow CI machines")
+    parser.add_argument('--targets', default=','.join(BUDGETS), help="Comma-separated targets to check")
+    parser.add_argument('--json', help="Also write the results to this file")
+    args = parser.parse_args()
+
+    # Warm __pycache__ so every run measures cached bytecode, as in production
+    for name in BUDGETS:
+        import_times(target_argv(name))
+    baseline_runs = [import_times(['-c', 'pass']) for _ in range(max(1, args.runs))]
+    baseline = set().union(*(modules for modules, _, _ in baseline_runs))
+    baseline_wall = statistics.median(wall for _, wall, _ in baseline_runs) * 1000
+
+    print(f"bare interpreter: {baseline_wall:.1f} ms wall\n")
+    print(f"{'target':>12} {'import ms':>10} {'budget ms':>10} {'wall ms':>8} {'modules':>8}  result")
+    failures = 0
+    results = []
+    for name in [t for t in args.targets.split(',') if t]:
+        spec = BUDGETS[name]
+        result = measure(name, baseline, max(1, args.runs))
+        budget = spec['budget_ms'] * args.scale
+        problems = []
+        if 'error' in result:
+            problems.append(result['error'])
+        else:
+            if result['import_ms'] > budget:
+                problems.append(f"over budget by {result['import_ms'] - budget:.1f} ms")
+            imported = [m for m in spec['forbidden']
+                        if any(loaded == m or loaded.startswith(m + '.') for loaded in result['loaded'])]
+            if imported:
+                problems.append(f"imports {', '.join(imported)}")
+        result.update({'budget_ms': budget, 'problems': problems})
+        results.append(result)
+        failures += bool(problems)
+        if 'error' in result:
+            print(f"{name:>12} {'':>10} {budget:>10.1f} {'':>8} {'':>8}  FAIL: {problems[0]}")
+        else:
+            print(f"{name:>12} {result['import_ms']:>10.2f} {budget:>10.1f} {result['wall_ms']:>8.1f} "
+                  f"{result['modules']:>8}  {'FAIL: ' + '; '.join(problems) if problems else 'ok'}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'benchmark': 'import_budget', 'baseline_wall_ms': round(baseline_wall, 1),
+                       'results': results}, f, indent=2)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Fake Services
+Local stand-ins for the remote endpoints the Python scripts call, so they can
+be benchmarked on an offline machine:
+
+    GET  /api/transcript?videoId=ID     RapidAPI transcript (English cues)
+    GET  /watch?v=ID                    YouTube watch page
+    GET  /oembed?url=...&format=json    YouTube oEmbed
+    GET  /bench-book.html               nhasachmienphi book page
+    GET  /doc-online/bench-book-N       nhasachmienphi chapter page
+    WS   /consumer/speech/synthesize/readaloud/edge/v1
+                                        Edge TTS: canned MP3 frames plus
+                                        WordBoundary/SentenceBoundary events
+    POST /_bench/config                 change payload sizes and latency
+    GET  /_bench/stats                  requests and connections served
+
+Everything is served over TLS with a throwaway self-signed certificate for
+the real host names; redirect/sitecustomize.py points the scripts at it.
+
+Usage:
+    python fake_services.py [--port 0] [--latency-ms 20]
+Prints {"address": "127.0.0.1:PORT", "ca_file": "..."} once listening.
+"""
+
+import argparse
+import base64
+import hashlib
+import html
+import json
+import os
+import re
+import shutil
+import ssl
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_transcript_pipeline import synthetic_response  # noqa: E402
+
+# Host names the scripts connect to; the certificate covers all of them
+REDIRECT_HOSTS = (
+    'youtube-transcript3.p.rapidapi.com',
+    'www.youtube.com',
+    'speech.platform.bing.com',
+    'nhasachmienphi.com',
+)
+
+EDGE_PATH = '/consumer/speech/synthesize/readaloud/edge/v1'
+
+DEFAULT_CONFIG = {
+    'latency': 0.02,
+    'transcript_cues': 1000,
+    'page_kb': 512,
+    'frames_per_word': 10,
+    'book_chapters': 200,
+    'chapter_kb': 24,
+}
+
+# One 24 kHz mono 48 kbps MPEG-2 Layer III frame (24 ms), the format Edge returns
+EDGE_FRAME = bytes.fromhex('fff364c4') + bytes(140)
+EDGE_FRAME_TICKS = 240000
+
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+SAMPLE_SENTENCE = 'Chiffre là một tay trùm xã hội đen người Pháp, và James Bond xuất hiện để ngăn cản hắn.'
+
+SSML_TEXT_RE = re.compile(r'<prosody[^>]*>(.*?)</prosody>', re.S)
+SSML_RATE_RE = re.compile(r"rate=['\"]([+-]?\d+)%['\"]")
+
+
+def make_certificate(directory):
+    """
+    Create a self-signed certificate for REDIRECT_HOSTS, localhost and 127.0.0.1
+
+    Returns:
+        tuple: (certificate path, key path)
+    """
+    if not shutil.which('openssl'):
+        raise SystemExit("openssl is required to create the fake services certificate")
+    cert = os.path.join(directory, 'cert.pem')
+    key = os.path.join(directory, 'key.pem')
+    names = ','.join([f"DNS:{host}" for host in REDIRECT_HOSTS] + ['DNS:localhost', 'IP:127.0.0.1'])
+    subprocess.run(
+        ['openssl', 'req', '-x509', '-newkey', 'rsa:2048', '-nodes', '-days', '2',
+         '-keyout', key, '-out', cert, '-subj', '/CN=dubsync-bench',
+         '-addext', f"subjectAltName={names}"],
+        capture_output=True, check=True,
+    )
+    return cert, key
+
+
+@lru_cache(maxsize=8)
+def transcript_body(cues):
+    return synthetic_response(cues)
+
+
+@lru_cache(maxsize=8)
+def watch_page(kb):
+    """Watch page of about `kb` KiB: meta tags in the head, lengthSeconds deep in the player data"""
+    head = (
+        '<!DOCTYPE html><html><head>'
+        '<meta property="og:title" content="Benchmark video">'
+        '<meta property="og:description" content="A page served by the benchmark fake services">'
+        '<meta property="og:image" content="https://i.ytimg.com/vi/bench/maxresdefault.jpg">'
+        '</head><body><script>var ytInitialPlayerResponse = {"streamingData": ['
+    )
+    filler = '{"itag": 18, "url": "https://rr1.googlevideo.com/videoplayback?expire=1&id=bench"},'
+    size = kb * 1024
+    repeats = max(0, (size - len(head)) // len(filler))
+    split = repeats * 3 // 5
+    body = (head + filler * split + '{}], "videoDetails": {"lengthSeconds":"754"}, "more": ['
+            + filler * (repeats - split) + '{}]};</script></body></html>')
+    return body.encode('utf-8')
+
+
+@lru_cache(maxsize=8)
+def book_page(chapters):
+    """nhasachmienphi book page listing `chapters` chapters, marked up like the real site"""
+    items = ''.join(
+        f"<div class='item_ch_mora '><div class='item_ch'><a target=\"_blank\" "
+        f"href='https://nhasachmienphi.com/doc-online/bench-book-{n}'>Chương {n}</a></div></div>"
+        for n in range(1, chapters + 1))
+    return (
+        "<!DOCTYPE html><html><head><title>Benchmark Book</title></head><body>"
+        "<div class='content_page pd-20'><img src='https://nhasachmienphi.com/images/thumbnail/bench.jpg'>"
+        "<h1 class='tblue fs-20'>Benchmark Book</h1><div class='mg-t-10'>Tác giả:  DubSync</div>"
+        "<div class='mg-tb-10'>Thể loại: <a href='https://nhasachmienphi.com/category/bench'>Benchmark</a></div>"
+        f"<div class='box_chhr'><h3>Danh sách chương</h3>{items}</div>"
+        "<div class='gioi_thieu_sach'><p>A book served by the benchmark fake services to measure imports.</p></div>"
+        "</div></body></html>"
+    ).encode('utf-8')
+
+
+@lru_cache(maxsize=8)
+def chapter_page(number, kb):
+    """nhasachmienphi chapter page with about `kb` KiB of paragraphs"""
+    paragraph = '<p>' + ' '.join(SAMPLE_SENTENCE for _ in range(4)) + '</p>\n'
+    paragraphs = paragraph * max(1, kb * 1024 // len(paragraph.encode('utf-8')))
+    return (
+        "<!DOCTYPE html><html><head><title>Chương</title><script>var ads = 1;</script></head><body>"
+        "<div class='nav-top'><a href='/'>Trang chủ</a></div>"
+        f"<h2 class='mg-t-10'>Chương {number}</h2><div class='pd-lr-30'>{paragraphs}"
+        "<div class='ads_text'>Quảng cáo</div></div></body></html>"
+    ).encode('utf-8')
+
+
+def oembed_body(video_id):
+    return json.dumps({
+        'title': 'Benchmark video',
+        'author_name': 'DubSync',
+        'type': 'video',
+        'thumbnail_url': f"https://i.ytimg.com/vi/{video_id}/hqdefault.jpg",
+    }).encode('utf-8')
+
+
+def read_ws_message(rfile):
+    """
+    Read one (possibly fragmented) client websocket message
+
+    Returns:
+        tuple: (opcode, payload bytes), opcode None when the connection closed
+    """
+    opcode, payload = None, bytearray()
+    while True:
+        head = rfile.read(2)
+        if len(head) < 2:
+            return None, b''
+        fin, frame_opcode = head[0] & 0x80, head[0] & 0x0F
+        length = head[1] & 0x7F
+        if length == 126:
+            length = struct.unpack('>H', rfile.read(2))[0]
+        elif length == 127:
+            length = struct.unpack('>Q', rfile.read(8))[0]
+        mask = rfile.read(4) if head[1] & 0x80 else None
+        data = rfile.read(length)
+        if mask:
+            data = bytes(b ^ mask[i % 4] for i, b in enumerate(data))
+        if frame_opcode >= 0x8:
+            # Control frames may arrive between fragments
+            return frame_opcode, data
+        if frame_opcode:
+            opcode = frame_opcode
+        payload += data
+        if fin:
+            return opcode, bytes(payload)
+
+
+def write_ws_frame(wfile, opcode, payload):
+    """Write one unmasked server frame"""
+    length = len(payload)
+    if length < 126:
+        head = struct.pack('>BB', 0x80 | opcode, length)
+    elif length < 1 << 16:
+        head = struct.pack('>BBH', 0x80 | opcode, 126, length)
+    else:
+        head = struct.pack('>BBQ', 0x80 | opcode, 127, length)
+    wfile.write(head + payload)
+
+
+def edge_text(request_id, path, body):
+    return (f"X-RequestId:{request_id}\r\nContent-Type:application/json; charset=utf-8\r\n"
+            f"Path:{path}\r\n\r\n{json.dumps(body)}").encode('utf-8')
+
+
+def edge_audio(request_id, audio):
+    header = (f"X-RequestId:{request_id}\r\nContent-Type:audio/mpeg\r\n"
+              f"X-StreamId:{request_id}\r\nPath:audio\r\n").encode('utf-8')
+    return struct.pack('>H', len(header)) + header + audio
+
+
+def boundary_event(kind, offset, duration, text):
+    return {'Metadata': [{
+        'Type': kind,
+        'Data': {
+            'Offset': offset,
+            'Duration': duration,
+            'text': {'Text': text, 'Length': len(text), 'BoundaryType': kind},
+        },
+    }]}
+
+
+class FakeServicesHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'DubSyncBench/1.0'
+
+    def setup(self):
+        super().setup()
+        self.server.count('connections')
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, body, content_type='application/json', status=200):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        if self.path != '/_bench/config':
+            self.send_body(b'{"error": "not found"}', status=404)
+            return
+        update = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        with self.server.lock:
+            if update.pop('reset_stats', False):
+                self.server.stats = {'requests': 0, 'connections': 0}
+            self.server.config.update({k: v for k, v in update.items() if k in DEFAULT_CONFIG})
+            body = json.dumps(self.server.config).encode('utf-8')
+        self.send_body(body)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        config = self.server.config
+        if url.path == '/_bench/stats':
+            self.send_body(json.dumps(self.server.stats).encode('utf-8'))
+            return
+
+        self.server.count('requests')
+        if url.path == EDGE_PATH and self.headers.get('Upgrade', '').lower() == 'websocket':
+            self.serve_edge()
+            return
+
+        time.sleep(config['latency'])
+        if url.path == '/api/transcript':
+            if not self.headers.get('x-rapidapi-key'):
+                self.send_body(b'{"message": "You are not subscribed to this API."}', status=403)
+                return
+            self.send_body(transcript_body(config['transcript_cues']))
+        elif url.path == '/watch':
+            self.send_body(watch_page(config['page_kb']), 'text/html; charset=utf-8')
+        elif url.path == '/bench-book.html':
+            self.send_body(book_page(config['book_chapters']), 'text/html; charset=UTF-8')
+        elif url.path.startswith('/doc-online/bench-book-'):
+            number = int(url.path.rsplit('-', 1)[1])
+            self.send_body(chapter_page(number, config['chapter_kb']), 'text/html; charset=UTF-8')
+        elif url.path == '/oembed':
+            video_id = parse_qs(urlsplit(query.get('url', [''])[0]).query).get('v', ['bench'])[0]
+            self.send_body(oembed_body(video_id))
+        else:
+            self.send_body(b'{"error": "not found"}', status=404)
+
+    def serve_edge(self):
+        """Answer Edge TTS websocket turns until the client closes"""
+        accept = base64.b64encode(
+            hashlib.sha1((self.headers['Sec-WebSocket-Key'] + WS_GUID).encode('ascii')).digest())
+        self.send_response(101, 'Switching Protocols')
+        self.send_header('Upgrade', 'websocket')
+        self.send_header('Connection', 'Upgrade')
+        self.send_header('Sec-WebSocket-Accept', accept.decode('ascii'))
+        self.end_headers()
+        self.wfile.flush()
+        self.close_connection = True
+
+        boundaries = {'WordBoundary': False, 'SentenceBoundary': True}
+        while True:
+            opcode, payload = read_ws_message(self.rfile)
+            if opcode is None:
+                return
+            if opcode == 0x8:
+                write_ws_frame(self.wfile, 0x8, payload[:2])
+                self.wfile.flush()
+                return
+            if opcode == 0x9:
+                write_ws_frame(self.wfile, 0xA, payload)
+                continue
+            if opcode != 0x1:
+                continue
+
+            head, _, body = payload.decode('utf-8').partition('\r\n\r\n')
+            headers = dict(line.split(':', 1) for line in head.split('\r\n') if ':' in line)
+            if headers.get('Path') == 'speech.config':
+                options = json.loads(body)['context']['synthesis']['audio']['metadataoptions']
+                boundaries = {
+                    'WordBoundary': str(options.get('wordBoundaryEnabled')).lower() == 'true',
+                    'SentenceBoundary': str(options.get('sentenceBoundaryEnabled')).lower() == 'true',
+                }
+            elif headers.get('Path') == 'ssml':
+                self.edge_turn(headers.get('X-RequestId', ''), body, boundaries)
+
+    def edge_turn(self, request_id, ssml, boundaries):
+        config = self.server.config
+        match = SSML_TEXT_RE.search(ssml)
+        words = html.unescape(match.group(1) if match else '').split() or ['.']
+        rate = SSML_RATE_RE.search(ssml)
+        speed = 1 + int(rate.group(1)) / 100 if rate else 1.0
+        frames = max(1, round(config['frames_per_word'] / max(speed, 0.1)))
+        word_ticks = frames * EDGE_FRAME_TICKS
+
+        time.sleep(config['latency'])
+        write_ws_frame(self.wfile, 0x1, edge_text(request_id, 'turn.start', {'context': {'serviceTag': 'bench'}}))
+        if boundaries['SentenceBoundary']:
+            event = boundary_event('SentenceBoundary', 0, word_ticks * len(words), ' '.join(words))
+            write_ws_frame(self.wfile, 0x1, edge_text(request_id, 'audio.metadata', event))
+        for index, word in enumerate(words):
+            if boundaries['WordBoundary']:
+                event = boundary_event('WordBoundary', index * word_ticks, word_ticks - EDGE_FRAME_TICKS, word)
+                write_ws_frame(self.wfile, 0x1, edge_text(request_id, 'audio.metadata', event))
+            write_ws_frame(self.wfile, 0x2, edge_audio(request_id, EDGE_FRAME * frames))
+        write_ws_frame(self.wfile, 0x1, edge_text(request_id, 'turn.end', {}))
+        self.wfile.flush()
+
+
+class FakeServices(ThreadingHTTPServer):
+    """TLS server holding the mutable payload configuration and request counters"""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, context, config=None):
+        super().__init__(address, FakeServicesHandler)
+        # The handshake runs lazily in the handler thread, not in the accept loop
+        self.socket = context.wrap_socket(self.socket, server_side=True, do_handshake_on_connect=False)
+        self.config = dict(DEFAULT_CONFIG, **(config or {}))
+        self.stats = {'requests': 0, 'connections': 0}
+        self.lock = threading.Lock()
+
+    def handle_error(self, request, client_address):
+        # Clients such as the metadata fetcher hang up mid-page on purpose
+        if not isinstance(sys.exc_info()[1], (ConnectionError, ssl.SSLError, TimeoutError)):
+            super().handle_error(request, client_address)
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+
+def start(port=0, config=None, directory=None):
+    """
+    Start the fake services on a background thread
+
+    Returns:
+        tuple: (FakeServices server, CA file clients should trust)
+    """
+    directory = directory or tempfile.mkdtemp(prefix='dubsync-bench-')
+    cert, key = make_certificate(directory)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    server = FakeServices(('127.0.0.1', port), context, config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, cert
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve local stand-ins for RapidAPI, YouTube, Edge TTS and nhasachmienphi")
+    parser.add_argument('--port', type=int, default=0, help="Port to listen on (default: any free port)")
+    parser.add_argument('--latency-ms', type=float, default=DEFAULT_CONFIG['latency'] * 1000,
+                        help="Delay before every response")
+    args = parser.parse_args()
+
+    server, ca_file = start(args.port, {'latency': args.latency_ms / 1000})
+    host, port = server.server_address
+    print(json.dumps({'address': f"{host}:{port}", 'ca_file': ca_file}), flush=True)
+    try:
+        # Serve until the parent closes stdin or the process is interrupted
+        sys.stdin.read()
+    except KeyboardInterrupt:
+        pass
+    server.shutdown()
+    shutil.rmtree(os.path.dirname(ca_file), ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark redirect
+Loaded automatically by every interpreter started with this directory on
+PYTHONPATH. When BENCH_SERVICES_ADDR is set, connections to the hosts in
+BENCH_REDIRECT_HOSTS go to the fake services instead, and their throwaway
+certificate (BENCH_CA_FILE) is trusted alongside the normal CA bundle. Name
+resolution is the only thing patched, so the scripts' real HTTP, TLS and
+websocket code is what gets measured.
+
+At exit the process's own peak RSS is printed to stderr as
+{"bench_peak_rss_kb": N}; the parent's wait4 figure would include the memory
+of the harness the child was forked from.
+"""
+
+import os
+
+_ADDRESS = os.environ.get('BENCH_SERVICES_ADDR')
+
+if _ADDRESS:
+    import atexit
+    import socket
+    import ssl
+    import sys
+
+    _HOST, _PORT = _ADDRESS.rsplit(':', 1)
+    _HOSTS = {host for host in os.environ.get('BENCH_REDIRECT_HOSTS', '').split(',') if host}
+    _CA_FILE = os.environ.get('BENCH_CA_FILE')
+    _getaddrinfo = socket.getaddrinfo
+    _create_default_context = ssl.create_default_context
+
+    def getaddrinfo(host, port, *args, **kwargs):
+        name = host.decode('ascii') if isinstance(host, bytes) else host
+        if name in _HOSTS:
+            return _getaddrinfo(_HOST, int(_PORT), *args, **kwargs)
+        return _getaddrinfo(host, port, *args, **kwargs)
+
+    def create_default_context(*args, **kwargs):
+        context = _create_default_context(*args, **kwargs)
+        if _CA_FILE:
+            context.load_verify_locations(_CA_FILE)
+        return context
+
+    def report_peak_rss():
+        try:
+            with open('/proc/self/status', 'r') as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        print('{"bench_peak_rss_kb": %d}' % int(line.split()[1]), file=sys.stderr, flush=True)
+        except (OSError, ValueError):
+            pass
+
+    atexit.register(report_peak_rss)
+    socket.getaddrinfo = getaddrinfo
+    ssl.create_default_context = create_default_context
+    # http.client and urllib build their contexts through this alias
+    ssl._create_default_https_context = create_default_context
@@ -0,0 +1,467 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Book Scraper
+Imports a whole book from nhasachmienphi.com, docsach24.co or
+vietnamthuquan.eu: the book page gives the book info and chapter list, then
+the chapters are fetched concurrently and printed in chapter order
+
+Requests go over keep-alive connections pooled per host. At most
+--host-connections requests are in flight per host, request starts are
+spaced at least --host-interval seconds apart, and a 429/503 Retry-After
+pushes back every request to that host. Pages are parsed as they download
+(book_sources.py).
+
+Usage:
+    python book_scraper.py URL [--source nhasachmienphi|docsach24|vietnamthuquan]
+                           [--workers 6] [--host-connections 6] [--host-interval 0.02]
+                           [--chapters 1-10,15] [--list]
+
+Output (stdout), one JSON object per line:
+    {"type": "book", "source", "url", "title", "author", "category", "description",
+     "cover_image", "total_chapters"}
+    {"type": "chapter", "number", "title", "url", "content", "elapsed_time"}
+        ("error" instead of "content" when the chapter could not be fetched)
+    {"type": "done", "chapters", "failed", "elapsed_time"}
+With --list the book line also carries "chapters" [{number, title, url}] and
+no chapter is fetched. A book page that cannot be loaded prints
+{"type": "error", "error", "url"}. Exits 1 on any error or failed chapter.
+"""
+
+import sys
+import io
+import argparse
+import codecs
+import http.client
+import json
+import os
+import queue
+import threading
+import time
+import zlib
+from collections import deque
+from itertools import chain
+from urllib.parse import urljoin, urlsplit
+
+from book_sources import SOURCES, source_for_url
+from script_metrics import metrics
+
+# Force UTF-8 encoding for stdout/stderr on Windows
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+              'Chrome/120.0.0.0 Safari/537.36')
+
+# Chapters fetched in parallel, and the politeness limits applied per host
+DEFAULT_WORKERS = int(os.getenv('BOOK_SCRAPER_WORKERS', '6'))
+DEFAULT_HOST_CONNECTIONS = int(os.getenv('BOOK_SCRAPER_HOST_CONNECTIONS', '6'))
+DEFAULT_HOST_INTERVAL = float(os.getenv('BOOK_SCRAPER_HOST_INTERVAL', '0.02'))
+
+REQUEST_TIMEOUT = 30
+READ_SIZE = 16384
+MAX_REDIRECTS = 5
+
+# Attempts per chapter; retryable failures back off 1s, 2s, ... (or Retry-After)
+CHAPTER_ATTEMPTS = 3
+RETRY_BACKOFF = 1.0
+MAX_RETRY_AFTER = 30.0
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+REDIRECT_STATUS = (301, 302, 303, 307, 308)
+
+# Chapters fetched ahead of the next one to print, per worker
+WINDOW_PER_WORKER = 4
+
+
+class FetchError(Exception):
+    """A page answered with an error status"""
+
+    def __init__(self, url, status, retry_after=None):
+        super().__init__(f"HTTP {status} for {url}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class HostPool:
+    """
+    Keep-alive connections, cookies and politeness limits for one host
+
+    At most `size` requests are in flight at once and request starts are
+    spaced at least `interval` seconds apart. Connections are created
+    lazily and handed back after each request.
+    """
+
+    def __init__(self, scheme, netloc, size, interval, cookies=None):
+        self.scheme = scheme
+        self.netloc = netloc
+        self.interval = interval
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(max(1, size))
+        self.lock = threading.Lock()
+        self.next_start = 0.0
+        self.cookies = dict(cookies or {})
+
+    def new_connection(self):
+        if self.scheme == 'https':
+            return http.client.HTTPSConnection(self.netloc, timeout=REQUEST_TIMEOUT)
+        return http.client.HTTPConnection(self.netloc, timeout=REQUEST_TIMEOUT)
+
+    def acquire(self):
+        self.slots.acquire()
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_start)
+            self.next_start = start + self.interval
+        if start > now:
+            with metrics.phase('politeness_wait'):
+                time.sleep(start - now)
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            return self.new_connection()
+
+    def release(self, conn, reusable=True):
+        if reusable:
+            self.idle.put(conn)
+        else:
+            conn.close()
+        self.slots.release()
+
+    def back_off(self, seconds):
+        """Start no request to this host for the next `seconds`"""
+        with self.lock:
+            self.next_start = max(self.next_start, time.monotonic() + seconds)
+
+    def cookie_header(self):
+        with self.lock:
+            return '; '.join(f"{name}={value}" for name, value in self.cookies.items())
+
+    def store_cookies(self, set_cookie_headers):
+        with self.lock:
+            for header in set_cookie_headers or ():
+                name, _, value = header.split(';', 1)[0].partition('=')
+                if name.strip():
+                    self.cookies[name.strip()] = value.strip()
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class Fetcher:
+    """HTTP(S) client shared by all workers, with one HostPool per host"""
+
+    def __init__(self, host_connections, host_interval, cookies=None):
+        self.host_connections = host_connections
+        self.host_interval = host_interval
+        self.cookies = cookies or {}
+        self.pools = {}
+        self.lock = threading.Lock()
+
+    def pool(self, url):
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        with self.lock:
+            if key not in self.pools:
+                self.pools[key] = HostPool(parts.scheme, parts.netloc, self.host_connections, self.host_interval,
+                                           self.cookies)
+            return self.pools[key]
+
+    def fetch(self, method, url, parser, body=None):
+        """
+        Request url and feed the decoded response body to parser as it arrives
+
+        Redirects are followed (cookies they set are kept per host). A pooled
+        connection the server has since closed is retried once on a new one.
+
+        Raises:
+            FetchError: On an error status (after redirects)
+        """
+        for _ in range(MAX_REDIRECTS + 1):
+            pool = self.pool(url)
+            parts = urlsplit(url)
+            path = (parts.path or '/') + (f"?{parts.query}" if parts.query or url.endswith('?') else '')
+            headers = {
+                'User-Agent': USER_AGENT,
+                'Accept': 'text/html,application/xhtml+xml,*/*;q=0.8',
+                'Accept-Encoding': 'gzip, deflate',
+            }
+            cookie = pool.cookie_header()
+            if cookie:
+                headers['Cookie'] = cookie
+            if body is not None:
+                headers['Content-Type'] = 'application/x-www-form-urlencoded'
+
+            conn = pool.acquire()
+            reusable = False
+            try:
+                conn, res = self.send(pool, conn, method, path, body, headers)
+                pool.store_cookies(res.msg.get_all('Set-Cookie'))
+                location = res.getheader('Location')
+                if res.status in REDIRECT_STATUS and location:
+                    res.read()
+                    reusable = not res.will_close
+                    metrics.count('redirects')
+                    url = urljoin(url, location)
+                    if res.status == 303 or (res.status in (301, 302) and method == 'POST'):
+                        method, body = 'GET', None
+                    continue
+                if res.status >= 400:
+                    res.read()
+                    reusable = not res.will_close
+                    retry_after = res.getheader('Retry-After')
+                    raise FetchError(url, res.status,
+                                     float(retry_after) if retry_after and retry_after.isdigit() else None)
+                self.stream(res, parser)
+                reusable = not res.will_close
+                return
+            finally:
+                pool.release(conn, reusable)
+        raise http.client.HTTPException(f"Too many redirects for {url}")
+
+    def send(self, pool, conn, method, path, body, headers):
+        """Send the request and wait for the response headers, on a fresh connection if the pooled one died"""
+        try:
+            return conn, self.request(conn, method, path, body, headers)
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError,
+                http.client.CannotSendRequest, http.client.ResponseNotReady):
+            conn.close()
+        metrics.count('reconnects')
+        conn = pool.new_connection()
+        try:
+            return conn, self.request(conn, method, path, body, headers)
+        except BaseException:
+            # The caller only knows the dead pooled connection, so this one is closed here
+            conn.close()
+            raise
+
+    @staticmethod
+    def request(conn, method, path, body, headers):
+        if conn.sock is None:
+            with metrics.phase('connect'):
+                conn.connect()
+        with metrics.phase('ttfb'):
+            conn.request(method, path, body=body, headers=headers)
+            return conn.getresponse()
+
+    @staticmethod
+    def stream(res, parser):
+        """Decompress and decode the body chunk by chunk into parser"""
+        encoding = (res.getheader('Content-Encoding') or '').lower()
+        inflate = None
+        if encoding in ('gzip', 'x-gzip'):
+            inflate = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == 'deflate':
+            inflate = zlib.decompressobj()
+        charset = res.msg.get_content_charset() or 'utf-8'
+        try:
+            decoder = codecs.getincrementaldecoder(charset)(errors='replace')
+        except LookupError:
+            decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+        received = 0
+        parse_seconds = 0.0
+        start = time.perf_counter()
+        while True:
+            chunk = res.read1(READ_SIZE)
+            if not chunk:
+                break
+            received += len(chunk)
+            if inflate is not None:
+                chunk = inflate.decompress(chunk)
+            mark = time.perf_counter()
+            parser.feed(decoder.decode(chunk))
+            parse_seconds += time.perf_counter() - mark
+        # read1() leaves a fully read Content-Length response open; read() marks it
+        # done so the connection can take the next request
+        res.read()
+        tail = (inflate.flush() if inflate is not None else b'')
+        mark = time.perf_counter()
+        parser.feed(decoder.decode(tail, final=True))
+        parser.close()
+        parse_seconds += time.perf_counter() - mark
+        metrics.add('download', time.perf_counter() - start - parse_seconds)
+        metrics.add('parse', parse_seconds)
+        metrics.count('bytes_in', received)
+        metrics.count('requests')
+
+    def back_off(self, url, seconds):
+        self.pool(url).back_off(seconds)
+
+    def close(self):
+        for pool in self.pools.values():
+            pool.close()
+
+
+def fetch_chapter(fetcher, source, book_url, chapter):
+    """
+    Fetch and parse one chapter, retrying transient failures
+
+    Returns:
+        The finished chapter parser (source.chapter_parser())
+    """
+    method, url, body = source.chapter_request(chapter, book_url)
+    for attempt in range(CHAPTER_ATTEMPTS):
+        parser = source.chapter_parser()
+        try:
+            fetcher.fetch(method, url, parser, body)
+            return parser
+        except (FetchError, OSError, http.client.HTTPException) as e:
+            retryable = not isinstance(e, FetchError) or e.status in RETRYABLE_STATUS
+            if not retryable or attempt == CHAPTER_ATTEMPTS - 1:
+                raise
+            delay = RETRY_BACKOFF * 2 ** attempt
+            if isinstance(e, FetchError) and e.retry_after is not None:
+                delay = min(e.retry_after, MAX_RETRY_AFTER)
+            # The whole host waits, not just this chapter
+            fetcher.back_off(url, delay)
+            metrics.count('retries')
+
+
+def fetch_chapters(fetcher, source, book_url, chapters, workers):
+    """
+    Fetch chapters in parallel and yield them in chapter order
+
+    Only a bounded window of chapters runs ahead of the next one to yield,
+    so memory stays flat however long the book is.
+
+    Yields:
+        tuple: (chapter, parser or None, error message or None, elapsed seconds)
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    def timed_fetch(chapter):
+        start = time.time()
+        try:
+            return fetch_chapter(fetcher, source, book_url, chapter), None, time.time() - start
+        except Exception as e:
+            return None, str(e), time.time() - start
+
+    workers = max(1, workers)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        todo = iter(chapters)
+        pending = deque()
+        for chapter in todo:
+            pending.append((chapter, executor.submit(timed_fetch, chapter)))
+            if len(pending) >= workers * WINDOW_PER_WORKER:
+                break
+        while pending:
+            chapter, future = pending.popleft()
+            parser, error, elapsed = future.result()
+            next_chapter = next(todo, None)
+            if next_chapter is not None:
+                pending.append((next_chapter, executor.submit(timed_fetch, next_chapter)))
+            yield chapter, parser, error, elapsed
+
+
+def parse_chapter_spec(spec):
+    """Chapter numbers from '1-10,15'"""
+    numbers = set()
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, _, last = part.partition('-')
+        numbers.update(range(int(first), int(last or first) + 1))
+    return numbers
+
+
+def write_line(record):
+    with metrics.phase('write'):
+        line = json.dumps(record, ensure_ascii=False)
+        sys.stdout.write(line + '\n')
+        sys.stdout.flush()
+    metrics.count('bytes_out', len(line.encode('utf-8')) + 1)
+
+
+def chapter_record(chapter, parser, error, elapsed):
+    record = {'type': 'chapter', 'number': chapter['number'], 'title': chapter['title'], 'url': chapter['url']}
+    if error is None:
+        record['content'] = parser.result()
+    else:
+        record['error'] = error
+    record['elapsed_time'] = round(elapsed, 3)
+    return record
+
+
+def main():
+    metrics.configure()
+    parser = argparse.ArgumentParser(description="Import a book's info and chapter texts as JSON lines")
+    parser.add_argument('url', help="Book page URL")
+    parser.add_argument('--source', choices=sorted(SOURCES), help="Site the URL belongs to (default: from its host)")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="Chapters fetched in parallel")
+    parser.add_argument('--host-connections', type=int, default=DEFAULT_HOST_CONNECTIONS,
+                        help="Requests in flight per host")
+    parser.add_argument('--host-interval', type=float, default=DEFAULT_HOST_INTERVAL,
+                        help="Minimum seconds between request starts per host")
+    parser.add_argument('--chapters', help="Only fetch these chapter numbers, e.g. 1-10,15")
+    parser.add_argument('--list', action='store_true', help="Print the book line with its chapter list only")
+    args = parser.parse_args()
+
+    source = SOURCES[args.source] if args.source else source_for_url(args.url)
+    if source is None:
+        write_line({'type': 'error', 'error': f"Unsupported book site: {args.url}", 'url': args.url})
+        return 1
+
+    start_time = time.time()
+    fetcher = Fetcher(args.host_connections, args.host_interval, source.cookies)
+    try:
+        page = source.book_parser(args.url)
+        try:
+            with metrics.phase('book_page'):
+                fetcher.fetch('GET', args.url, page)
+        except (FetchError, OSError, http.client.HTTPException) as e:
+            write_line({'type': 'error', 'error': f"Could not load the book page: {e}", 'url': args.url})
+            return 1
+        book = page.result()
+        chapters = book.pop('chapters')
+        selected = chapters
+        if args.chapters:
+            wanted = parse_chapter_spec(args.chapters)
+            selected = [chapter for chapter in chapters if chapter['number'] in wanted]
+
+        # Lazy: nothing is fetched until the first chapter is asked for
+        results = fetch_chapters(fetcher, source, args.url, selected, args.workers)
+        if source.needs_first_chapter and chapters:
+            # Book info the chapter responses carry comes from chapter 1
+            if not args.list and selected and selected[0] is chapters[0]:
+                first = next(results)
+                results = chain([first], results)
+                info_parser = first[1]
+            else:
+                try:
+                    info_parser = fetch_chapter(fetcher, source, args.url, chapters[0])
+                except (FetchError, OSError, http.client.HTTPException):
+                    info_parser = None
+            if info_parser is not None:
+                source.complete_info(book, info_parser)
+
+        header = {'type': 'book', 'source': source.name, 'url': args.url}
+        header.update(book)
+        if args.list:
+            header['chapters'] = chapters
+            write_line(header)
+            return 0 if chapters else 1
+        write_line(header)
+
+        done = failed = 0
+        for chapter, chapter_parser, error, elapsed in results:
+            write_line(chapter_record(chapter, chapter_parser, error, elapsed))
+            done += 1
+            failed += error is not None
+        metrics.count('chapters', done)
+        metrics.count('failed', failed)
+        write_line({'type': 'done', 'chapters': done, 'failed': failed,
+                    'elapsed_time': round(time.time() - start_time, 3)})
+        return 1 if failed or not chapters else 0
+    finally:
+        fetcher.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,605 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Book Source Parsers
+Streaming HTML parsers for the book sites the audiobook importer supports
+(nhasachmienphi.com, docsach24.co, vietnamthuquan.eu): the book page gives
+the title, author, category, description, cover and chapter list, the
+chapter page gives the chapter text
+
+Parsers are fed text as it downloads and keep only what they extract, never
+the page. Extraction follows the PHP BookScrapers rule for rule, and chapter
+text is cleaned the way their cleanContent() cleans it.
+"""
+
+import re
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit
+
+# Elements that never have content or a closing tag
+VOID_TAGS = frozenset(('area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param',
+                       'source', 'track', 'wbr'))
+
+# Elements whose text is never chapter text
+SKIP_TAGS = frozenset(('script', 'style', 'nav', 'footer', 'header', 'aside'))
+
+# Classes of the ad, navigation and sharing blocks dropped from chapter text
+SKIP_CLASS_RE = re.compile(r'(?:^|[\s_-])(?:ads?|advert\w*|nav\w*|sidebar|footer|share\w*|social\w*)(?:$|[\s_-])',
+                           re.I)
+
+INLINE_AD_RE = re.compile(r'\[?\s*(?:quảng cáo|advertisement|sponsored)\s*\]?', re.I)
+MULTI_NEWLINE_RE = re.compile(r'\n\n+')
+MULTI_SPACE_RE = re.compile(r' +')
+LEADING_SPACE_RE = re.compile(r'^\s+', re.M)
+WHITESPACE_RE = re.compile(r'\s+')
+
+# "Label: value" lines on book pages
+LABEL_PATTERNS = (
+    ('author', re.compile(r'Tác\s*giả\s*:\s*([^\n]*)', re.I)),
+    ('category', re.compile(r'(?:Thể\s*loại|Chuyên\s*mục)\s*:\s*([^\n]*)', re.I)),
+)
+
+DESCRIPTION_HEADING_RE = re.compile(r'Giới\s*thiệu', re.I)
+DESCRIPTION_CLASS_RE = re.compile(r'description|intro|gioi[-_]thieu', re.I)
+COVER_CLASS_RE = re.compile(r'cover|book|sach', re.I)
+COVER_CONTAINER_RE = re.compile(r'book|cover', re.I)
+
+TUAID_RE = re.compile(r'tuaid=(\d+)')
+CHUONGID_RE = re.compile(r'chuongid=(\d+)')
+
+# vietnamthuquan chapter responses: wrapper, title/author, content, navigation
+VNTQ_SEPARATOR = '--!!tach_noi_dung!!--'
+
+
+def clean_text(text):
+    """
+    Normalize extracted text exactly as the PHP scrapers' cleanContent() does
+
+    Inline ad markers go, spaces are collapsed and every line loses its
+    leading whitespace. That per-line trim also removes blank lines, so
+    paragraphs end up one per line.
+    """
+    text = INLINE_AD_RE.sub('', text)
+    text = MULTI_NEWLINE_RE.sub('\n\n', text)
+    text = MULTI_SPACE_RE.sub(' ', text)
+    text = LEADING_SPACE_RE.sub('', text)
+    return text.strip()
+
+
+def collapse(text):
+    """Text on one line with single spaces (book titles, descriptions)"""
+    return WHITESPACE_RE.sub(' ', text).strip()
+
+
+def class_list(attrs):
+    return (attrs.get('class') or '').split()
+
+
+def has_class(*names):
+    """Selector: any of the given class names"""
+    names = frozenset(names)
+    return lambda tag, attrs: not names.isdisjoint(class_list(attrs))
+
+
+def has_id(value):
+    return lambda tag, attrs: attrs.get('id') == value
+
+
+def class_contains(tags, *words):
+    """Selector: one of tags whose class attribute contains one of words"""
+    return lambda tag, attrs: tag in tags and any(word in (attrs.get('class') or '').lower() for word in words)
+
+
+def id_contains(*words):
+    return lambda tag, attrs: any(word in (attrs.get('id') or '').lower() for word in words)
+
+
+class TextBuffer:
+    """Text collected inside one element; skip > 0 while inside a dropped block"""
+
+    __slots__ = ('parts', 'skip')
+
+    def __init__(self):
+        self.parts = []
+        self.skip = 0
+
+    def text(self):
+        return ''.join(self.parts)
+
+
+class ChapterTextParser(HTMLParser):
+    """
+    Streaming chapter text extractor
+
+    Every element a selector matches collects the text inside it, with <br>
+    as a newline, </p> as a paragraph break and script, style, navigation
+    and ad blocks left out. The longest cleaned text wins, like the DOM
+    extraction in the PHP scrapers; when no element matches, the page's
+    paragraphs are used if they add up to more than 100 bytes.
+
+    With no selectors the whole document is the text (used for fragments
+    such as vietnamthuquan chapter bodies) and only script/style are dropped.
+    """
+
+    def __init__(self, selectors=None):
+        super().__init__(convert_charrefs=True)
+        self.selectors = selectors or ()
+        self.whole = selectors is None
+        # Open elements: (tag, buffer opened by it, buffers it paused)
+        self.stack = []
+        self.candidates = []
+        self.active = []
+        self.paragraphs = TextBuffer()
+        if self.whole:
+            self.candidates.append(TextBuffer())
+            self.active.append(self.candidates[0])
+
+    def emit(self, text):
+        for buffer in self.active:
+            if not buffer.skip:
+                buffer.parts.append(text)
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_TAGS:
+            if tag == 'br':
+                self.emit('\n')
+            return
+        attrs = dict(attrs)
+        paused = ()
+        if tag in ('script', 'style') or (not self.whole and (
+                tag in SKIP_TAGS or SKIP_CLASS_RE.search(attrs.get('class') or ''))):
+            paused = tuple(self.active)
+            for buffer in paused:
+                buffer.skip += 1
+        opened = None
+        if any(selector(tag, attrs) for selector in self.selectors):
+            opened = TextBuffer()
+            self.candidates.append(opened)
+        elif tag == 'p' and not self.whole and self.paragraphs not in self.active:
+            opened = self.paragraphs
+        if opened is not None:
+            self.active.append(opened)
+        self.stack.append((tag, opened, paused))
+
+    def handle_endtag(self, tag):
+        if tag == 'p':
+            self.emit('\n\n')
+        # Close everything left open inside the element as well (unclosed <p>, <li>, ...)
+        for index in range(len(self.stack) - 1, -1, -1):
+            if self.stack[index][0] == tag:
+                break
+        else:
+            return
+        while len(self.stack) > index:
+            _, opened, paused = self.stack.pop()
+            if opened is not None:
+                self.active.remove(opened)
+            for buffer in paused:
+                buffer.skip -= 1
+
+    def handle_data(self, data):
+        self.emit(data)
+
+    def result(self):
+        """The cleaned chapter text ('' when nothing was found)"""
+        best = max((clean_text(buffer.text()) for buffer in self.candidates), key=len, default='')
+        if best:
+            return best
+        paragraphs = self.paragraphs.text()
+        if len(paragraphs.encode('utf-8')) > 100:
+            return clean_text(paragraphs)
+        return ''
+
+
+class BookPageParser(HTMLParser):
+    """
+    Streaming book page parser: common state and rules
+
+    Subclasses add the site's rules in start(); element text is collected
+    with capture(), which hands it to a callback when the element closes.
+    "Tác giả:" / "Thể loại:" labels, the <title> and the cover image are
+    handled here for every site.
+    """
+
+    # Substring of cover image URLs on this site
+    cover_hint = None
+
+    def __init__(self, url):
+        super().__init__(convert_charrefs=True)
+        self.url = url
+        self.info = {}
+        self.chapters = []
+        self.fallback_chapters = []
+        self.page_title = None
+        # Open elements as (tag, classes); text captures as (depth, parts, callback)
+        self.stack = []
+        self.captures = []
+        self.pending_label = None
+        self.covers = {}
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag not in VOID_TAGS:
+            self.stack.append((tag, class_list(attrs)))
+        if tag == 'title' and self.page_title is None:
+            self.capture(tag, self.set_page_title)
+        elif tag == 'img' and attrs.get('src'):
+            src = attrs['src']
+            if COVER_CLASS_RE.search(attrs.get('class') or ''):
+                self.offer_cover(0, src)
+            elif any(COVER_CONTAINER_RE.search(' '.join(classes)) for _, classes in self.stack):
+                self.offer_cover(1, src)
+            elif self.cover_hint and self.cover_hint in src:
+                self.offer_cover(2, src)
+        elif tag == 'meta' and attrs.get('property') == 'og:image' and attrs.get('content'):
+            self.offer_cover(3, attrs['content'])
+        self.start(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if not any(open_tag == tag for open_tag, _ in self.stack):
+            return
+        while self.stack:
+            open_tag, _ = self.stack.pop()
+            self.close_captures(len(self.stack))
+            if open_tag == tag:
+                return
+
+    def handle_data(self, data):
+        for _, parts, _ in self.captures:
+            parts.append(data)
+        if self.stack and self.stack[-1][0] in ('script', 'style'):
+            self.script(data)
+            return
+        self.labels(data)
+        self.data(data)
+
+    def close(self):
+        super().close()
+        self.close_captures(0)
+
+    def start(self, tag, attrs):
+        """Site rules for an opening tag"""
+
+    def data(self, data):
+        """Site rules for a text node outside script/style"""
+
+    def script(self, data):
+        """Site rules for script/style text"""
+
+    def capture(self, tag, callback):
+        """Collect the text of the element that just started and pass it to callback when it closes"""
+        if tag not in VOID_TAGS:
+            self.captures.append((len(self.stack), [], callback))
+
+    def close_captures(self, depth):
+        while self.captures and self.captures[-1][0] > depth:
+            _, parts, callback = self.captures.pop()
+            callback(''.join(parts))
+
+    def inside(self, class_name):
+        return any(class_name in classes for _, classes in self.stack)
+
+    def labels(self, data):
+        # A label's value is the rest of its line, or the next text (usually a link)
+        if self.pending_label:
+            value = data.strip()
+            if value:
+                self.info[self.pending_label] = collapse(value)
+                self.pending_label = None
+            return
+        for field, pattern in LABEL_PATTERNS:
+            if field in self.info:
+                continue
+            match = pattern.search(data)
+            if match:
+                value = match.group(1).strip()
+                if value:
+                    self.info[field] = collapse(value)
+                else:
+                    self.pending_label = field
+                return
+
+    def offer_cover(self, rank, src):
+        self.covers.setdefault(rank, urljoin(self.url, src.strip()))
+
+    def set_page_title(self, text):
+        self.page_title = collapse(text)
+
+    def set_title(self, text):
+        if 'title' not in self.info and text.strip():
+            self.info['title'] = collapse(text)
+
+    def add_chapter(self, chapters, href, title):
+        title = collapse(title)
+        if href and title:
+            chapters.append({'number': len(chapters) + 1, 'title': title, 'url': urljoin(self.url, href.strip())})
+
+    def book_title(self):
+        return self.info.get('title') or self.page_title
+
+    def result(self):
+        """Book info and chapter list, shaped like the PHP scrapers' scrape() result"""
+        chapters = self.chapters or self.fallback_chapters
+        return {
+            'title': self.book_title() or 'Sách không xác định',
+            'author': self.info.get('author'),
+            'category': self.info.get('category'),
+            'description': self.info.get('description'),
+            'cover_image': self.covers[min(self.covers)] if self.covers else None,
+            'chapters': chapters,
+            'total_chapters': len(chapters),
+        }
+
+
+class NhaSachMienPhiBookParser(BookPageParser):
+    """
+    nhasachmienphi.com book page
+
+    Chapters are the links in <div class='item_ch'>, falling back to any
+    doc-online link; the description is div.gioi_thieu_sach.
+    """
+
+    cover_hint = '/images/thumbnail/'
+
+    def start(self, tag, attrs):
+        if tag == 'h1' and 'title' not in self.info:
+            self.capture(tag, self.set_title)
+        elif tag == 'div' and 'description' not in self.info and DESCRIPTION_CLASS_RE.search(attrs.get('class') or ''):
+            self.capture(tag, self.set_description)
+        elif tag == 'a' and attrs.get('href'):
+            href = attrs['href']
+            if self.inside('item_ch'):
+                self.capture(tag, lambda text: self.add_chapter(self.chapters, href, text))
+            elif 'doc-online' in href:
+                self.capture(tag, lambda text: self.add_chapter(self.fallback_chapters, href, text))
+
+    def set_description(self, text):
+        text = collapse(text)
+        if len(text) > 50 and 'description' not in self.info:
+            self.info['description'] = text
+
+
+class Docsach24BookParser(BookPageParser):
+    """
+    docsach24.co book page
+
+    Chapters are the /doc-sach/ links (first occurrence of each URL); the
+    description is the first block after the "Giới thiệu" heading.
+    """
+
+    cover_hint = 'data-images'
+
+    def __init__(self, url):
+        super().__init__(url)
+        self.seen_urls = set()
+        self.description_next = False
+
+    def start(self, tag, attrs):
+        if tag == 'h1' and 'title' not in self.info:
+            self.capture(tag, self.set_title)
+        elif tag in ('div', 'p') and self.description_next:
+            self.description_next = False
+            self.capture(tag, self.set_description)
+        elif tag == 'a' and '/doc-sach/' in (attrs.get('href') or ''):
+            href = attrs['href']
+            self.capture(tag, lambda text: self.add_unique_chapter(href, text))
+
+    def data(self, data):
+        if 'description' not in self.info and DESCRIPTION_HEADING_RE.search(data):
+            self.description_next = True
+
+    def add_unique_chapter(self, href, text):
+        url = urljoin(self.url, href.strip())
+        if text.strip() and url not in self.seen_urls:
+            self.seen_urls.add(url)
+            self.add_chapter(self.chapters, url, text)
+
+    def set_description(self, text):
+        text = clean_text(text)
+        if len(text) > 50 and 'description' not in self.info:
+            self.info['description'] = text
+
+    def book_title(self):
+        if self.info.get('title') or not self.page_title:
+            return self.info.get('title')
+        return re.sub(r'\s*\|\s*Docsach24.*$', '', self.page_title, flags=re.I).strip()
+
+
+class VietNamThuQuanBookParser(BookPageParser):
+    """
+    vietnamthuquan.eu book page
+
+    Chapters are <acronym title="..."> entries whose onClick loads
+    chuongid=N of the book's tuaid; they are sorted by chuongid, renumbered
+    and given the virtual URL vntq://TUAID/CHUONGID. The author is only
+    available from a chapter response (see VietNamThuQuanSource).
+    """
+
+    def __init__(self, url):
+        super().__init__(url)
+        self.tua_id = 0
+        self.acronym = None
+        self.chapter_ids = {}
+
+    def start(self, tag, attrs):
+        values = ' '.join(value for value in attrs.values() if value)
+        self.find_ids(values)
+        if tag == 'acronym' and self.acronym is None and 'title' in attrs:
+            self.acronym = {'title': attrs['title'] or '', 'id': None}
+            self.capture(tag, self.end_acronym)
+
+    def data(self, data):
+        self.find_ids(data)
+
+    def script(self, data):
+        self.find_ids(data)
+
+    def find_ids(self, text):
+        if not self.tua_id:
+            match = TUAID_RE.search(text)
+            if match:
+                self.tua_id = int(match.group(1))
+        if self.acronym is not None and self.acronym['id'] is None:
+            match = CHUONGID_RE.search(text)
+            if match:
+                self.acronym['id'] = int(match.group(1))
+
+    def end_acronym(self, text):
+        acronym, self.acronym = self.acronym, None
+        if acronym['id'] and acronym['id'] not in self.chapter_ids:
+            self.chapter_ids[acronym['id']] = collapse(acronym['title']) or f"Chương {acronym['id']}"
+
+    def book_title(self):
+        title = self.page_title or ''
+        match = re.match(r'Mời đọc tác phẩm:\s*([^,]+)', title, re.I)
+        if match:
+            return match.group(1).strip()
+        return re.sub(r'\s*-\s*Trang Sách.*$', '', title, flags=re.I).strip() or None
+
+    def result(self):
+        self.chapters = [
+            {'number': index, 'title': self.chapter_ids[chapter_id], 'url': f"vntq://{self.tua_id}/{chapter_id}"}
+            for index, chapter_id in enumerate(sorted(self.chapter_ids), 1)
+        ] if self.tua_id else []
+        return super().result()
+
+
+class VietNamThuQuanChapterParser:
+    """
+    vietnamthuquan chapter response: parts separated by VNTQ_SEPARATOR,
+    split as they stream in; part 1 (title and author) is kept as text and
+    part 2 (the chapter body) goes through a ChapterTextParser
+    """
+
+    def __init__(self):
+        self.part = 0
+        self.pending = ''
+        self.header = []
+        self.body = ChapterTextParser()
+
+    def feed(self, text):
+        text = self.pending + text
+        while True:
+            index = text.find(VNTQ_SEPARATOR)
+            if index < 0:
+                break
+            self.route(text[:index])
+            self.part += 1
+            text = text[index + len(VNTQ_SEPARATOR):]
+        # Hold back what could be the start of a separator split across chunks
+        keep = len(VNTQ_SEPARATOR) - 1
+        self.route(text[:-keep] if len(text) > keep else '')
+        self.pending = text[-keep:] if len(text) > keep else text
+
+    def route(self, text):
+        if not text:
+            return
+        if self.part == 1:
+            self.header.append(text)
+        elif self.part == 2:
+            self.body.feed(text)
+
+    def close(self):
+        self.route(self.pending)
+        self.pending = ''
+        self.body.close()
+
+    def header_lines(self):
+        """Non-empty lines of the title/author part, tags stripped"""
+        parser = ChapterTextParser()
+        parser.feed(''.join(self.header))
+        parser.close()
+        return [line.strip() for line in parser.candidates[0].text().split('\n') if line.strip()]
+
+    def result(self):
+        # Fewer than three parts means the server did not send a chapter
+        return self.body.result() if self.part >= 2 else ''
+
+
+class BookSource:
+    """A supported site: its parsers and how its chapters are requested"""
+
+    name = None
+    hosts = ()
+    book_parser = None
+    content_selectors = ()
+    # Cookies sent to the site from the first request on
+    cookies = {}
+    # Whether complete_info() needs the first chapter before the book is reported
+    needs_first_chapter = False
+
+    def matches(self, url):
+        host = (urlsplit(url).hostname or '').lower()
+        return any(host == name or host.endswith('.' + name) for name in self.hosts)
+
+    def chapter_parser(self):
+        return ChapterTextParser(self.content_selectors)
+
+    def chapter_request(self, chapter, book_url):
+        """(method, url, form body or None) that fetches a chapter of the book at book_url"""
+        return 'GET', chapter['url'], None
+
+    def complete_info(self, book, first_chapter):
+        """Fill book info only a chapter response carries; first_chapter is its finished parser"""
+
+
+class NhaSachMienPhiSource(BookSource):
+    name = 'nhasachmienphi'
+    hosts = ('nhasachmienphi.com',)
+    book_parser = NhaSachMienPhiBookParser
+    content_selectors = (
+        has_class('pd-lr-30'),
+        has_class('box_cont'),
+        class_contains(('div', 'section', 'article'), 'chapter', 'story'),
+        id_contains('chapter', 'story'),
+    )
+
+
+class Docsach24Source(BookSource):
+    name = 'docsach24'
+    hosts = ('docsach24.co',)
+    book_parser = Docsach24BookParser
+    content_selectors = (
+        has_id('doc-content'),
+        has_id('content'),
+        has_class('doc-content', 'content-doc', 'chapter-content'),
+        class_contains(('div', 'section', 'article'), 'content'),
+    )
+
+
+class VietNamThuQuanSource(BookSource):
+    name = 'vietnamthuquan'
+    hosts = ('vietnamthuquan.eu', 'vietnamthuquan.net')
+    book_parser = VietNamThuQuanBookParser
+    # The ASP.NET site redirects in circles without it
+    cookies = {'AspxAutoDetectCookieSupport': '1'}
+    needs_first_chapter = True
+
+    def chapter_parser(self):
+        return VietNamThuQuanChapterParser()
+
+    def chapter_request(self, chapter, book_url):
+        tua_id, chapter_id = chapter['url'][len('vntq://'):].split('/')
+        base = urlsplit(book_url)
+        url = f"{base.scheme or 'http'}://{base.netloc}/truyen/chuonghoi_moi.aspx?"
+        return 'POST', url, f"tuaid={tua_id}&chuongid={chapter_id}"
+
+    def complete_info(self, book, first_chapter):
+        # The first chapter's header is "book title / author"
+        lines = first_chapter.header_lines()
+        if len(lines) >= 2 and not book.get('author'):
+            book['author'] = lines[1]
+        content = first_chapter.result()
+        if len(content) > 100 and not book.get('description'):
+            book['description'] = content[:500]
+
+
+SOURCES = {source.name: source for source in (NhaSachMienPhiSource(), Docsach24Source(), VietNamThuQuanSource())}
+
+
+def source_for_url(url):
+    """The BookSource serving url, or None"""
+    for source in SOURCES.values():
+        if source.matches(url):
+            return source
+    return None
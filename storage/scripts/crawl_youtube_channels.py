@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YouTube Channel Crawler
+Incrementally refreshes reference channels and stored videos: only entries
+whose fetch interval has elapsed are fetched, with conditional requests and
+bounded parallelism, and a JSONL delta of changed fields is printed
+
+Input (JSONL file or stdin), one entry per line:
+    {"type": "channel", "ref_channel_id": "UC...", "fetch_interval_days": 7,
+     "last_fetched_at": "2026-02-02T10:00:00+07:00", "etag": "...", "last_modified": "...",
+     "known_videos": {"VIDEO_ID": {"title": "...", "views_count": 10}}}
+    {"type": "video", "video_id": "...", "fetch_interval_days": 7, "last_fetched_at": 1770000000,
+     "etag": "...", "last_modified": "...",
+     "known": {"title": "...", "description": "...", "thumbnail_url": "...", "duration_seconds": 60}}
+Only the fields given in known / known_videos are compared; a video entry
+without "known" reports every fetched field.
+
+Output, one line per fetched entry plus a final summary line:
+    {"type": "video", "video_id": "...", "status": "changed|unchanged|not_modified|error",
+     "changed": {...}, "etag": "...", "last_modified": "...", "fetched_at": "..."}
+"""
+
+import argparse
+import json
+import re
+import sys
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+# Importing the metadata fetcher also loads .env, forces UTF-8 stdout/stderr on
+# Windows and picks up --metrics for this script
+from get_youtube_metadata import debug_print, scan_html
+from script_metrics import metrics
+
+DEFAULT_WORKERS = 8
+DEFAULT_INTERVAL_DAYS = 7
+REQUEST_TIMEOUT = 10
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+FEED_URL = 'https://www.youtube.com/feeds/videos.xml?channel_id={}'
+WATCH_URL = 'https://www.youtube.com/watch?v={}'
+
+CHANNEL_ID_RE = re.compile(r'youtube\.com/channel/(UC[\w-]+)')
+
+FEED_NS = {
+    'atom': 'http://www.w3.org/2005/Atom',
+    'yt': 'http://www.youtube.com/xml/schemas/2015',
+    'media': 'http://search.yahoo.com/mrss/',
+}
+
+
+def parse_timestamp(value):
+    """Epoch seconds from an epoch number or an ISO 8601 / 'Y-m-d H:i:s' string"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(str(value).strip().replace('Z', '+00:00')).timestamp()
+
+
+def is_stale(entry, now):
+    """
+    Whether the entry's fetch interval has elapsed
+
+    Never-fetched entries are stale, and so are entries whose last_fetched_at
+    cannot be parsed: refetching them yields a valid fetched_at to store.
+    """
+    try:
+        last_fetched = parse_timestamp(entry.get('last_fetched_at'))
+    except (ValueError, TypeError):
+        debug_print(f"DEBUG: Unparsable last_fetched_at {entry.get('last_fetched_at')!r}, refetching")
+        return True
+    if last_fetched is None:
+        return True
+    try:
+        interval_days = float(entry.get('fetch_interval_days') or DEFAULT_INTERVAL_DAYS)
+    except (ValueError, TypeError):
+        interval_days = DEFAULT_INTERVAL_DAYS
+    return now - last_fetched >= interval_days * 86400
+
+
+def conditional_get(url, etag=None, last_modified=None):
+    """
+    Open url with If-None-Match / If-Modified-Since validators
+
+    Returns:
+        response object, or None when the server answered 304 Not Modified
+    """
+    headers = {'User-Agent': USER_AGENT}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    try:
+        with metrics.phase('ttfb'):
+            return urlopen(Request(url, headers=headers), timeout=REQUEST_TIMEOUT)
+    except HTTPError as e:
+        if e.code == 304:
+            metrics.count('not_modified')
+            return None
+        raise
+
+
+def validators(response):
+    return {
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+    }
+
+
+def diff_fields(known, fetched):
+    """
+    Fields of fetched that are present in known with a different value
+
+    Fields the caller did not send are not compared, so a partial snapshot
+    (e.g. only title and views_count) only reports changes to those fields.
+    """
+    return {
+        field: value
+        for field, value in fetched.items()
+        if value is not None and field in known and known[field] != value
+    }
+
+
+def crawl_video(entry):
+    """Refresh one stored video from its watch page"""
+    video_id = entry['video_id']
+    response = conditional_get(WATCH_URL.format(video_id), entry.get('etag'), entry.get('last_modified'))
+    if response is None:
+        return {'status': 'not_modified'}
+
+    with response, metrics.phase('html_scan'):
+        found, bytes_read = scan_html(response)
+        record = validators(response)
+    metrics.count('bytes_in', bytes_read)
+    debug_print(f"DEBUG: {video_id}: scanned {bytes_read} bytes")
+
+    fetched = {
+        'title': found.get('title'),
+        'description': found.get('description'),
+        'thumbnail_url': found.get('thumbnail'),
+        'duration_seconds': int(found['duration']) if 'duration' in found else None,
+    }
+    known = entry.get('known')
+    if known is None:
+        # Nothing stored yet: every fetched field is news
+        changed = {field: value for field, value in fetched.items() if value is not None}
+    else:
+        changed = diff_fields(known, fetched)
+    record.update({'status': 'changed' if changed else 'unchanged', 'changed': changed})
+    return record
+
+
+def parse_feed(data):
+    """Video rows from a channel's Atom feed, keyed by video ID"""
+    root = ET.fromstring(data)
+    videos = {}
+    for item in root.findall('atom:entry', FEED_NS):
+        video_id = item.findtext('yt:videoId', namespaces=FEED_NS)
+        if not video_id:
+            continue
+        group = item.find('media:group', FEED_NS)
+        thumbnail = group.find('media:thumbnail', FEED_NS) if group is not None else None
+        statistics = group.find('media:community/media:statistics', FEED_NS) if group is not None else None
+        rating = group.find('media:community/media:starRating', FEED_NS) if group is not None else None
+        videos[video_id] = {
+            'title': item.findtext('atom:title', namespaces=FEED_NS),
+            'description': group.findtext('media:description', namespaces=FEED_NS) if group is not None else None,
+            'thumbnail_url': thumbnail.get('url') if thumbnail is not None else None,
+            'published_at': item.findtext('atom:published', namespaces=FEED_NS),
+            'views_count': int(statistics.get('views')) if statistics is not None and statistics.get('views') else None,
+            'likes_count': int(rating.get('count')) if rating is not None and rating.get('count') else None,
+        }
+    return videos
+
+
+def crawl_channel(entry):
+    """Refresh one reference channel from its uploads feed"""
+    channel_id = entry.get('ref_channel_id')
+    if not channel_id:
+        match = CHANNEL_ID_RE.search(entry.get('ref_channel_url') or '')
+        if not match:
+            raise ValueError("ref_channel_id (UC...) is required; handle URLs cannot be resolved offline")
+        channel_id = match.group(1)
+
+    response = conditional_get(FEED_URL.format(channel_id), entry.get('etag'), entry.get('last_modified'))
+    if response is None:
+        return {'status': 'not_modified'}
+
+    with response, metrics.phase('download'):
+        data = response.read()
+        record = validators(response)
+    metrics.count('bytes_in', len(data))
+
+    known_videos = entry.get('known_videos') or {}
+    videos = []
+    with metrics.phase('parse'):
+        feed = parse_feed(data)
+    for video_id, fetched in feed.items():
+        if video_id not in known_videos:
+            videos.append({'video_id': video_id, 'status': 'new', 'changed': {k: v for k, v in fetched.items() if v is not None}})
+            continue
+        changed = diff_fields(known_videos[video_id], fetched)
+        if changed:
+            videos.append({'video_id': video_id, 'status': 'changed', 'changed': changed})
+
+    record.update({'status': 'changed' if videos else 'unchanged', 'videos': videos})
+    return record
+
+
+def crawl_entry(entry):
+    """Fetch one stale entry and describe what changed"""
+    kind = entry.get('type', 'video')
+    record = {'type': kind}
+    for key in ('id', 'video_id', 'ref_channel_id', 'ref_channel_url'):
+        if key in entry:
+            record[key] = entry[key]
+
+    start = time.perf_counter()
+    try:
+        if kind == 'channel':
+            record.update(crawl_channel(entry))
+        elif kind == 'video':
+            if not entry.get('video_id'):
+                raise ValueError("video entries require 'video_id'")
+            record.update(crawl_video(entry))
+        else:
+            raise ValueError(f"Unknown entry type: {kind}")
+    except Exception as e:
+        record.update({'status': 'error', 'error': str(e)})
+    record['fetched_at'] = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    record['elapsed_time'] = round(time.perf_counter() - start, 3)
+    return record
+
+
+def read_entries(path):
+    """Parse the JSONL input; malformed lines are reported as errors"""
+    stream = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')
+    entries, errors = [], []
+    try:
+        for line_no, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+                if not isinstance(entry, dict):
+                    raise ValueError("entry must be a JSON object")
+                entries.append(entry)
+            except ValueError as e:
+                errors.append({'status': 'error', 'error': f"Invalid input line {line_no}: {e}"})
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    return entries, errors
+
+
+def crawl(entries, workers=DEFAULT_WORKERS, now=None):
+    """
+    Fetch the stale entries in parallel, printing one delta line per entry as it completes
+
+    Returns:
+        dict: Summary counts by status, plus skipped (still fresh) entries
+    """
+    now = time.time() if now is None else now
+    stale = [entry for entry in entries if is_stale(entry, now)]
+    summary = {'status': 'done', 'total': len(entries), 'skipped': len(entries) - len(stale)}
+    output_lock = threading.Lock()
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [executor.submit(crawl_entry, entry) for entry in stale]
+        for future in as_completed(futures):
+            record = future.result()
+            summary[record['status']] = summary.get(record['status'], 0) + 1
+            with output_lock:
+                print(json.dumps(record, ensure_ascii=False), flush=True)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental YouTube channel/video metadata crawler")
+    parser.add_argument('input', nargs='?', default='-', help="JSONL entries file, or '-' for stdin")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="Parallel requests")
+    parser.add_argument('--now', type=float, help="Reference time (epoch seconds) for staleness checks")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    entries, errors = read_entries(args.input)
+    for error in errors:
+        print(json.dumps(error, ensure_ascii=False), flush=True)
+
+    summary = crawl(entries, workers=args.workers, now=args.now)
+    if errors:
+        summary['error'] = summary.get('error', 0) + len(errors)
+    summary['elapsed_time'] = round(time.perf_counter() - start, 3)
+    print(json.dumps(summary), flush=True)
+    return 1 if summary.get('error') else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DubSync Script Entry Point
+One command for all Python scripts, which loads only the module the chosen
+subcommand needs. Modules are imported rather than run as scripts, so their
+bytecode comes from __pycache__ instead of being recompiled on every spawn.
+
+Usage:
+    python dubsync.py transcript VIDEO_ID | --batch [--workers N] [ID ...]
+    python dubsync.py metadata VIDEO_ID_OR_URL
+    python dubsync.py tts --text TEXT --out FILE [--voice V] [--rate R] | --manifest FILE | --serve
+    python dubsync.py book BOOK_URL [--workers N] [--chapters 1-10] [--list]
+    python dubsync.py COMMAND --help
+
+Each subcommand takes exactly the arguments (and --metrics) of the script it
+replaces and prints the same output.
+"""
+
+import os
+import sys
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Subcommand -> module in this directory
+COMMANDS = {
+    'transcript': 'get_youtube_transcript',
+    'metadata': 'get_youtube_metadata',
+    'tts': 'edge_tts_generate',
+    'crawl': 'crawl_youtube_channels',
+    'probe': 'probe_mp3_durations',
+    'assemble': 'assemble_mp3_timeline',
+    'stretch': 'stretch_audio_batch',
+    'analyze': 'analyze_audio_batch',
+    'predict-rate': 'predict_tts_rate',
+    'book': 'book_scraper',
+}
+
+
+def load_command(name):
+    """Import the module behind a subcommand (and nothing else)"""
+    if SCRIPTS_DIR not in sys.path:
+        sys.path.insert(0, SCRIPTS_DIR)
+    return __import__(COMMANDS[name])
+
+
+def usage():
+    return "usage: dubsync.py {" + ",".join(COMMANDS) + "} [ARGS...]"
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] in ('-h', '--help'):
+        print(usage(), file=sys.stderr if not argv else sys.stdout)
+        return 2 if not argv else 0
+    name = argv[0]
+    if name not in COMMANDS:
+        print(f"dubsync.py: unknown command '{name}'\n{usage()}", file=sys.stderr)
+        return 2
+
+    # The module sees the argv it would have had as a script; its import-time
+    # setup (metrics, .env) names itself after argv[0]
+    sys.argv = [os.path.join(SCRIPTS_DIR, COMMANDS[name] + '.py')] + argv[1:]
+    result = load_command(name).main()
+    if hasattr(result, '__await__'):
+        import asyncio
+        result = asyncio.run(result)
+    return result
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,20 +1,829 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Edge TTS Generator
+Synthesizes speech with Microsoft Edge TTS: one --text/--out pair per run, a
+whole JSONL manifest of jobs concurrently in a single process, or as a long-running
+worker (--serve) answering JSON-lines requests over stdin/stdout or a socket
+"""
+
 import argparse
 import asyncio
+import io
+import json
+import os
+import signal
+import sys
+import threading
+import time
+
+# Imported before the heavy packages so their cost shows up as the 'imports' phase
+from script_metrics import metrics
+
+import aiohttp
 import edge_tts
 
+from mp3_frames import FrameCounter
+from tts_cache import DEFAULT_CACHE_DIR, DEFAULT_MAX_MB, TtsCache, cache_key, temp_file, write_json_atomic
+from tts_duration import DurationModel, log_path_from_env
+from tts_packing import (
+    DEFAULT_PACK_CHARS,
+    DEFAULT_PACK_SEGMENTS,
+    join_texts,
+    plan_groups,
+    split_packed,
+)
+from tts_scheduler import DEFAULT_MAX_LIMIT, DEFAULT_RETRIES, AdaptiveScheduler
+
+# Force UTF-8 encoding for stdout/stderr on Windows
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
+
+# Opt-in timings (--metrics / SCRIPT_METRICS=true), reported on stderr at exit
+metrics.configure()
+
+DEFAULT_VOICE = "vi-VN-HoaiMyNeural"
+DEFAULT_RATE = "+0%"
+DEFAULT_CONCURRENCY = 4
+
+# Edge TTS reports offsets and durations in 100-nanosecond ticks
+TICKS_PER_SECOND = 10_000_000
+
+# Dropped websockets, throttling and empty responses are worth retrying;
+# older edge-tts releases lack some of these exception classes
+TRANSIENT_ERRORS = (asyncio.TimeoutError, ConnectionError, aiohttp.ClientError) + tuple(
+    getattr(edge_tts.exceptions, name)
+    for name in ('NoAudioReceived', 'WebSocketError', 'UnexpectedResponse', 'UnknownResponse')
+    if hasattr(edge_tts.exceptions, name)
+)
+
+
+# Characters of text that take about as long to synthesize as the fixed
+# connection overhead of one call
+COST_CHARS = 1000
+
+
+def is_transient(exc):
+    """Whether a failed synthesis call may succeed if simply retried"""
+    return isinstance(exc, TRANSIENT_ERRORS)
+
+
+def make_communicate(text, voice, rate):
+    """Build a Communicate that streams WordBoundary events"""
+    try:
+        return edge_tts.Communicate(text, voice, rate=rate, boundary='WordBoundary')
+    except TypeError:
+        # edge-tts < 7 has no 'boundary' option and always sends WordBoundary
+        return edge_tts.Communicate(text, voice, rate=rate)
+
+
+async def stream_audio(communicate, sinks, flush=False):
+    """
+    Write streamed audio to every sink while collecting word timings
+
+    Args:
+        communicate: edge_tts.Communicate to consume
+        sinks: Binary file objects receiving each audio chunk as it arrives
+        flush: Flush the first sink after every chunk so readers (e.g. an ffmpeg
+               pipe) can start before synthesis finishes
+
+    Returns:
+        dict: {'duration': seconds, 'words': [[offset, duration, text], ...]}
+    """
+    counter = FrameCounter()
+    words = []
+    start = time.perf_counter()
+    first_audio = None
+    async for chunk in communicate.stream():
+        if chunk['type'] == 'audio':
+            if first_audio is None:
+                # Websocket connect/TLS plus the service's time to first audio
+                first_audio = time.perf_counter()
+                metrics.add('ttfb', first_audio - start)
+            metrics.count('bytes_in', len(chunk['data']))
+            for sink in sinks:
+                sink.write(chunk['data'])
+            if flush:
+                sinks[0].flush()
+            counter.feed(chunk['data'])
+        elif chunk['type'] == 'WordBoundary':
+            words.append([
+                round(chunk['offset'] / TICKS_PER_SECOND, 3),
+                round(chunk['duration'] / TICKS_PER_SECOND, 3),
+                chunk['text'],
+            ])
+    metrics.add('stream', time.perf_counter() - (first_audio or start))
+    return {'duration': round(counter.duration, 3), 'words': words}
+
+
+async def stream_to_file(communicate, out, cache=None, key=None):
+    """
+    Stream audio into a temp file next to out and rename it onto out
+
+    out is replaced rather than rewritten in place, so whatever inode previously
+    sat at out is never written to. The cache gets its own copy before the
+    rename. On failure out is removed, as the caller expects no file then.
+    """
+    directory = os.path.dirname(os.path.abspath(out))
+    fd, tmp = temp_file(directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            info = await stream_audio(communicate, [f])
+        if cache:
+            with metrics.phase('cache_store'):
+                cache.store(key, tmp, info)
+        os.replace(tmp, out)
+        return info
+    except BaseException:
+        # Never leave a stale or truncated MP3 behind for the caller to pick up
+        if os.path.exists(out):
+            os.unlink(out)
+        raise
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+
+
+class CountingSink:
+    """Binary writer wrapper that remembers how many bytes went through it"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.written = 0
+
+    def write(self, data):
+        self.written += len(data)
+        return self.stream.write(data)
+
+    def flush(self):
+        self.stream.flush()
+
+
+async def stream_to_stdout(communicate, cache=None, key=None):
+    """Stream audio to stdout as it arrives, teeing it into the cache when enabled"""
+    stdout = CountingSink(sys.stdout.buffer)
+    tmp = None
+    try:
+        if not cache:
+            return await stream_audio(communicate, [stdout], flush=True)
+
+        cache.root.mkdir(parents=True, exist_ok=True)
+        fd, tmp = temp_file(cache.root)
+        with os.fdopen(fd, 'wb') as tee:
+            info = await stream_audio(communicate, [stdout, tee], flush=True)
+        cache.store(key, tmp, info, move=True)
+        return info
+    except Exception as e:
+        if stdout.written:
+            # The reader already consumed part of the audio; a retry would corrupt it
+            raise RuntimeError(f"Audio stream interrupted after {stdout.written} bytes: {e}") from e
+        raise
+    finally:
+        if tmp and os.path.exists(tmp):
+            os.unlink(tmp)
+
+
+async def synthesize(text, out, voice=DEFAULT_VOICE, rate=DEFAULT_RATE, cache=None, timings=None,
+                     scheduler=None, durations=None):
+    """
+    Synthesize one text into an MP3 file
+
+    Args:
+        out: Output path, or '-' to stream the audio to stdout
+        cache: Optional TtsCache consulted before calling the service
+        timings: Optional path for a JSON sidecar with the duration and word timings
+        scheduler: Optional AdaptiveScheduler that limits and retries service calls
+        durations: Optional DurationModel that learns from each fresh synthesis
+
+    Returns:
+        dict: {'cached': bool, 'duration': seconds, 'attempts': service calls made}
+    """
+    to_stdout = out == '-'
+    key = cache_key(text, voice, rate) if cache else None
+    with metrics.phase('cache_fetch'):
+        info = cache.fetch(key, sys.stdout.buffer if to_stdout else out) if cache else None
+    cached = info is not None
+    attempts = 0
+    metrics.count('characters', len(text))
+
+    if cached:
+        metrics.count('cache_hits')
+        if to_stdout:
+            sys.stdout.buffer.flush()
+    else:
+        def call():
+            # A fresh Communicate per attempt: a failed one cannot be restarted
+            communicate = make_communicate(text, voice, rate)
+            if to_stdout:
+                return stream_to_stdout(communicate, cache, key)
+            return stream_to_file(communicate, out, cache, key)
+
+        if scheduler:
+            info, attempts = await scheduler.run(call, cost=len(text) / COST_CHARS)
+        else:
+            info, attempts = await call(), 1
+        if durations:
+            durations.record(text, voice, rate, info['duration'])
+
+    if timings:
+        with metrics.phase('write_timings'):
+            write_json_atomic(timings, info)
+    return {'cached': cached, 'duration': info['duration'], 'attempts': attempts}
+
+
+def emit(record):
+    """Write one JSON result line to stdout and flush it immediately"""
+    print(json.dumps(record, ensure_ascii=False), flush=True)
+
+
+def read_manifest(path):
+    """
+    Read a JSONL manifest of synthesis jobs
+
+    Args:
+        path: Manifest file path, or '-' to read from stdin
+
+    Returns:
+        list: (index, job dict or None, parse error or None) tuples
+    """
+    stream = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')
+    jobs = []
+    try:
+        for line_no, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                job = json.loads(line)
+                if not isinstance(job, dict):
+                    raise ValueError("job must be a JSON object")
+                if not job.get('text') or not job.get('out'):
+                    raise ValueError("job requires 'text' and 'out'")
+                jobs.append((line_no, job, None))
+            except ValueError as e:
+                jobs.append((line_no, None, f"Invalid manifest line {line_no}: {e}"))
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+    return jobs
+
+
+def resolve_voice_rate(job, voice, rate, durations=None):
+    """
+    Voice and rate a job is synthesized with
+
+    Returns:
+        tuple: (voice, rate, predicted duration or None); with 'target_duration'
+               and a DurationModel the rate is predicted to fit the target
+    """
+    job_voice = job.get('voice') or voice
+    job_rate = job.get('rate') or rate
+    predicted = None
+    if job.get('target_duration') and durations:
+        job_rate, predicted = durations.pick_rate(job['text'], job_voice, float(job['target_duration']), job_rate)
+    return job_voice, job_rate, predicted
+
+
+async def run_job(job, voice=DEFAULT_VOICE, rate=DEFAULT_RATE, cache=None, scheduler=None, durations=None):
+    """
+    Synthesize one job dict and describe the outcome
+
+    Args:
+        job: Dict with 'text' and 'out', optionally 'voice', 'rate', 'timings',
+             'target_duration' (seconds; the rate is then picked to fit it) and 'id'
+        voice: Voice used when the job does not name one
+        rate: Rate used when the job does not set one
+        cache: Optional TtsCache shared by all jobs
+        scheduler: Optional AdaptiveScheduler shared by all jobs
+        durations: Optional DurationModel shared by all jobs
+
+    Returns:
+        dict: Result with status ('ok' or 'error'), bytes, audio duration and elapsed seconds
+    """
+    result = {}
+    if 'id' in job:
+        result['id'] = job['id']
+    result['out'] = job.get('out')
+
+    start = time.perf_counter()
+    try:
+        if not job.get('text') or not job.get('out'):
+            raise ValueError("job requires 'text' and 'out'")
+        if job['out'] == '-':
+            raise ValueError("jobs cannot stream to stdout; it carries the result lines")
+        job_voice, job_rate, predicted = resolve_voice_rate(job, voice, rate, durations)
+        if predicted is not None:
+            result.update({'rate': job_rate, 'predicted_duration': round(predicted, 3)})
+        info = await synthesize(
+            job['text'],
+            job['out'],
+            voice=job_voice,
+            rate=job_rate,
+            cache=cache,
+            timings=job.get('timings'),
+            scheduler=scheduler,
+            durations=durations,
+        )
+        result.update({
+            'status': 'ok',
+            'cached': info['cached'],
+            'attempts': info['attempts'],
+            'duration': info['duration'],
+            'bytes': os.path.getsize(job['out']),
+            'elapsed': round(time.perf_counter() - start, 3),
+        })
+    except Exception as e:
+        result.update({
+            'status': 'error',
+            'error': str(e) or type(e).__name__,
+            'bytes': 0,
+            'elapsed': round(time.perf_counter() - start, 3),
+        })
+    return result
+
+
+async def run_manifest_job(index, job, error, args, predicted=None):
+    """Synthesize one manifest job through the shared scheduler and report it"""
+    if error:
+        result = {'index': index}
+        if job is not None and 'id' in job:
+            result['id'] = job['id']
+        result.update({'status': 'error', 'error': error, 'bytes': 0, 'elapsed': 0.0})
+        emit(result)
+        return False
+
+    result = dict({'index': index}, **await run_job(
+        job, voice=args.voice, rate=args.rate, cache=args.cache, scheduler=args.scheduler,
+        durations=args.durations))
+    if predicted is not None:
+        result.update({'rate': job['rate'], 'predicted_duration': round(predicted, 3)})
+
+    emit(result)
+    return result['status'] == 'ok'
+
+
+async def synthesize_packed(text, voice, rate, scheduler):
+    """Synthesize a packed request into memory; returns (audio bytes, info, attempts)"""
+    async def call():
+        buffer = io.BytesIO()
+        info = await stream_audio(make_communicate(text, voice, rate), [buffer])
+        return buffer.getvalue(), info
+
+    (audio, info), attempts = await scheduler.run(call, cost=len(text) / COST_CHARS)
+    return audio, info, attempts
+
+
+def write_file_atomic(path, data):
+    """Write bytes to path via a temporary file so readers never see a partial file"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = temp_file(directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+async def run_manifest_pack(entries, voice, rate, args):
+    """
+    Synthesize consecutive short jobs sharing a voice and rate as one request
+
+    Jobs already in the cache are answered from it; the rest are joined, sent
+    once, and cut back into their own files by word boundary timings. A piece
+    carries half of the pauses around it, so it differs from the audio of a
+    request of its own: pieces are cached under a 'packed' key variant, which
+    only packed runs look up, after the standalone key. Result
+    lines keep the per-job shape, with 'packed' giving the request's size. If
+    the audio cannot be split reliably, the jobs are synthesized one by one.
+
+    Args:
+        entries: (index, job, predicted duration or None) tuples
+
+    Returns:
+        list: Whether each job succeeded
+    """
+    start = time.perf_counter()
+    oks = []
+    pending = []
+    for index, job, predicted in entries:
+        keys = [cache_key(job['text'], voice, rate), cache_key(job['text'], voice, rate, variant='packed')]
+        info = args.cache.fetch(keys, job['out']) if args.cache else None
+        if info is None:
+            pending.append((index, job, predicted))
+            continue
+        if job.get('timings'):
+            write_json_atomic(job['timings'], info)
+        emit(pack_result(index, job, predicted, rate, {
+            'status': 'ok', 'cached': True, 'attempts': 0, 'duration': info['duration'],
+            'bytes': os.path.getsize(job['out']), 'elapsed': round(time.perf_counter() - start, 3),
+        }))
+        oks.append(True)
+
+    pieces = None
+    if len(pending) > 1:
+        text, spans = join_texts([job['text'] for _, job, _ in pending])
+        try:
+            audio, info, attempts = await synthesize_packed(text, voice, rate, args.scheduler)
+            pieces = split_packed(audio, info['words'], text, spans)
+        except Exception as e:
+            print(f"Packing {len(pending)} segments failed ({e}); synthesizing them one by one",
+                  file=sys.stderr, flush=True)
+
+    if pieces is None:
+        # Nothing to pack, or packing failed: fall back to one request per job
+        singles = []
+        for index, job, predicted in pending:
+            single = dict(job, voice=voice, rate=rate)
+            single.pop('target_duration', None)
+            singles.append(run_manifest_job(index, single, None, args, predicted=predicted))
+        oks.extend(await asyncio.gather(*singles))
+        return oks
+
+    for (index, job, predicted), piece in zip(pending, pieces):
+        try:
+            write_file_atomic(job['out'], piece['audio'])
+            info = {'duration': piece['duration'], 'words': piece['words']}
+            if args.cache:
+                args.cache.store(cache_key(job['text'], voice, rate, variant='packed'), job['out'], info)
+            args.durations.record(job['text'], voice, rate, info['duration'])
+            if job.get('timings'):
+                write_json_atomic(job['timings'], info)
+            result = {
+                'status': 'ok', 'cached': False, 'attempts': attempts, 'duration': info['duration'],
+                'bytes': len(piece['audio']), 'packed': len(pending),
+            }
+        except Exception as e:
+            result = {'status': 'error', 'error': str(e) or type(e).__name__, 'bytes': 0}
+        result['elapsed'] = round(time.perf_counter() - start, 3)
+        emit(pack_result(index, job, predicted, rate, result))
+        oks.append(result['status'] == 'ok')
+    return oks
+
+
+def pack_result(index, job, predicted, rate, fields):
+    """Result line of a job handled by run_manifest_pack, shaped like run_job's"""
+    result = {'index': index}
+    if 'id' in job:
+        result['id'] = job['id']
+    result['out'] = job['out']
+    if predicted is not None:
+        result.update({'rate': rate, 'predicted_duration': round(predicted, 3)})
+    result.update(fields)
+    return result
+
+
+async def run_manifest_packed(jobs, args):
+    """Run a manifest with consecutive short jobs of the same voice and rate packed together"""
+    items = []
+    resolved = []
+    for index, job, error in jobs:
+        key = predicted = None
+        # Invalid jobs stay on their own so run_job reports them
+        if not error and job['out'] != '-':
+            try:
+                voice, rate, predicted = resolve_voice_rate(job, args.voice, args.rate, args.durations)
+                key = (voice, rate)
+            except ValueError:
+                pass
+        items.append((key, job['text'] if job else ''))
+        resolved.append(predicted)
+
+    async def run_group(group):
+        if len(group) == 1:
+            index, job, error = jobs[group[0]]
+            return [await run_manifest_job(index, job, error, args)]
+        voice, rate = items[group[0]][0]
+        entries = [(jobs[i][0], jobs[i][1], resolved[i]) for i in group]
+        return await run_manifest_pack(entries, voice, rate, args)
+
+    groups = plan_groups(items, max_chars=args.pack_chars, max_segments=args.pack_segments)
+    results = await asyncio.gather(*[run_group(group) for group in groups])
+    return [ok for group in results for ok in group]
+
+
+async def run_manifest(args):
+    """
+    Synthesize every job of a manifest concurrently
+
+    Each finished job prints one JSON line (status, bytes, elapsed) as soon as it
+    completes, followed by a final summary line once all jobs are done.
+
+    Returns:
+        int: Process exit code (0 when every job succeeded)
+    """
+    start = time.perf_counter()
+    try:
+        jobs = read_manifest(args.manifest)
+    except (OSError, UnicodeDecodeError) as e:
+        emit({'status': 'error', 'error': f"Cannot read manifest {args.manifest}: {e}",
+              'elapsed': round(time.perf_counter() - start, 3)})
+        return 1
+
+    if args.pack:
+        results = await run_manifest_packed(jobs, args)
+    else:
+        results = await asyncio.gather(*[
+            run_manifest_job(index, job, error, args)
+            for index, job, error in jobs
+        ])
+
+    ok_count = sum(1 for ok in results if ok)
+    summary = {
+        'status': 'done',
+        'total': len(results),
+        'ok': ok_count,
+        'failed': len(results) - ok_count,
+        'elapsed': round(time.perf_counter() - start, 3),
+    }
+    if args.cache:
+        summary['cache'] = args.cache.stats()
+    summary['scheduler'] = args.scheduler.stats()
+    emit(summary)
+    return 0 if ok_count == len(results) else 1
+
+
+class TtsWorker:
+    """
+    Warm synthesis worker shared by every connection of a --serve process
+
+    Requests are JSON objects, one per line. 'cmd' defaults to 'synthesize'
+    (fields as in a manifest job); 'health', 'stats' and 'shutdown' are control
+    commands. Every request gets exactly one JSON response line echoing its 'id'.
+    """
+
+    def __init__(self, scheduler, voice=DEFAULT_VOICE, rate=DEFAULT_RATE, cache=None, durations=None):
+        self.scheduler = scheduler
+        self.voice = voice
+        self.rate = rate
+        self.cache = cache
+        self.durations = durations
+        self.started_at = time.time()
+        self.draining = False
+        self.stopped = asyncio.Event()
+        self.tasks = set()
+        self.stats = {
+            'requests': 0,
+            'ok': 0,
+            'failed': 0,
+            'rejected': 0,
+            'bytes': 0,
+            'synth_seconds': 0.0,
+            'connections': 0,
+        }
+
+    def snapshot(self):
+        """Current counters plus derived in-flight/latency figures"""
+        done = self.stats['ok'] + self.stats['failed']
+        snapshot = dict(
+            self.stats,
+            synth_seconds=round(self.stats['synth_seconds'], 3),
+            in_flight=len(self.tasks),
+            avg_elapsed=round(self.stats['synth_seconds'] / done, 3) if done else 0.0,
+            uptime=round(time.time() - self.started_at, 3),
+        )
+        if self.cache:
+            snapshot['cache'] = self.cache.stats()
+        snapshot['scheduler'] = self.scheduler.stats()
+        return snapshot
+
+    def handle_line(self, line, send):
+        """
+        Dispatch one request line
+
+        Control commands are answered immediately; synthesis runs as a task so
+        many requests from the same connection are multiplexed on the loop.
+        """
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+        except ValueError as e:
+            send({'status': 'error', 'error': f"Invalid request: {e}"})
+            return
+
+        cmd = request.get('cmd', 'synthesize')
+        reply = {'id': request['id']} if 'id' in request else {}
+
+        if cmd == 'health':
+            send(dict(reply, status='ok', draining=self.draining, pid=os.getpid(), in_flight=len(self.tasks)))
+        elif cmd == 'stats':
+            send(dict(reply, status='ok', stats=self.snapshot()))
+        elif cmd == 'shutdown':
+            send(dict(reply, status='ok', draining=True))
+            self.drain()
+        elif cmd != 'synthesize':
+            send(dict(reply, status='error', error=f"Unknown cmd: {cmd}"))
+        elif self.draining:
+            self.stats['rejected'] += 1
+            send(dict(reply, status='error', error='worker is draining'))
+        else:
+            self.stats['requests'] += 1
+            task = asyncio.ensure_future(self.synthesize(request, send))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def synthesize(self, request, send):
+        result = await run_job(request, voice=self.voice, rate=self.rate, cache=self.cache,
+                               scheduler=self.scheduler, durations=self.durations)
+        self.stats['ok' if result['status'] == 'ok' else 'failed'] += 1
+        self.stats['bytes'] += result['bytes']
+        self.stats['synth_seconds'] += result['elapsed']
+        send(result)
+
+    def drain(self):
+        """Stop accepting synthesis requests and exit once in-flight ones finish"""
+        if self.draining:
+            return
+        self.draining = True
+        asyncio.ensure_future(self._finish_drain())
+
+    async def _finish_drain(self):
+        while self.tasks:
+            await asyncio.gather(*list(self.tasks), return_exceptions=True)
+        self.stopped.set()
+
+
+def install_drain_handlers(worker):
+    """Drain the worker on SIGTERM/SIGINT where the platform supports it"""
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, worker.drain)
+        except (NotImplementedError, RuntimeError):
+            # Windows event loops have no signal handler support
+            pass
+
+
+async def serve_stdio(worker):
+    """Serve requests read from stdin, answering on stdout"""
+    loop = asyncio.get_running_loop()
+    lines = asyncio.Queue()
+
+    # A daemon thread keeps a blocking stdin read from holding up shutdown
+    def reader():
+        for line in sys.stdin:
+            loop.call_soon_threadsafe(lines.put_nowait, line)
+        loop.call_soon_threadsafe(lines.put_nowait, None)
+
+    threading.Thread(target=reader, daemon=True).start()
+    worker.stats['connections'] += 1
+
+    async def pump():
+        while True:
+            line = await lines.get()
+            if line is None:
+                worker.drain()
+                return
+            if line.strip():
+                worker.handle_line(line, emit)
+
+    pump_task = asyncio.ensure_future(pump())
+    await worker.stopped.wait()
+    pump_task.cancel()
+
+
+async def serve_socket(worker, socket_path=None, port=None):
+    """Serve requests over a Unix domain socket or a localhost TCP port"""
+    writers = set()
+
+    async def on_connect(reader, writer):
+        worker.stats['connections'] += 1
+        writers.add(writer)
+
+        def send(record):
+            if not writer.is_closing():
+                writer.write((json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8'))
+
+        pending = set()
+        try:
+            while not worker.stopped.is_set():
+                line = await reader.readline()
+                if not line:
+                    break
+                if line.strip():
+                    before = set(worker.tasks)
+                    worker.handle_line(line.decode('utf-8'), send)
+                    pending |= worker.tasks - before
+                    await writer.drain()
+            # Let this client's outstanding requests answer before hanging up
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writers.discard(writer)
+            writer.close()
+
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        server = await asyncio.start_unix_server(on_connect, path=socket_path)
+    else:
+        server = await asyncio.start_server(on_connect, host='127.0.0.1', port=port)
+
+    print(f"Edge TTS worker listening on {socket_path or f'127.0.0.1:{port}'}", file=sys.stderr, flush=True)
+    try:
+        await worker.stopped.wait()
+    finally:
+        server.close()
+        # Idle clients would otherwise keep wait_closed() pending
+        for writer in list(writers):
+            writer.close()
+        await server.wait_closed()
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+
+async def run_server(args):
+    """Run the --serve worker until it is drained"""
+    worker = TtsWorker(args.scheduler, voice=args.voice, rate=args.rate, cache=args.cache,
+                       durations=args.durations)
+    install_drain_handlers(worker)
+    if args.socket or args.port:
+        await serve_socket(worker, socket_path=args.socket, port=args.port)
+    else:
+        await serve_stdio(worker)
+    print(json.dumps(dict(worker.snapshot(), status='stopped')), file=sys.stderr, flush=True)
+    return 0
+
 
 async def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument("--text", required=True)
-    parser.add_argument("--out", required=True)
-    parser.add_argument("--voice", default="vi-VN-HoaiMyNeural")
-    parser.add_argument("--rate", default="+0%", help="Speaking rate, e.g. -20%% for slower, +20%% for faster")
+    parser.add_argument("--text")
+    parser.add_argument("--out", help="Output MP3 path, or '-' to stream the audio to stdout")
+    parser.add_argument("--timings", help="Write a JSON sidecar with the exact duration and word timings")
+    parser.add_argument("--manifest",
+                        help="JSONL file of {text, out, voice, rate, target_duration, timings} jobs, or '-' for stdin")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help="Initial number of concurrent service calls; adapts to latency and errors")
+    parser.add_argument("--max-concurrency", type=int, default=DEFAULT_MAX_LIMIT,
+                        help="Upper bound for the adaptive number of concurrent service calls")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES,
+                        help="Retries with jittered backoff for dropped or throttled calls")
+    parser.add_argument("--pack", action="store_true",
+                        help="Synthesize consecutive short manifest jobs of the same voice and rate as one request")
+    parser.add_argument("--pack-chars", type=int, default=DEFAULT_PACK_CHARS,
+                        help="Maximum characters of text per packed request")
+    parser.add_argument("--pack-segments", type=int, default=DEFAULT_PACK_SEGMENTS,
+                        help="Maximum jobs per packed request")
+    parser.add_argument("--serve", action="store_true",
+                        help="Run as a long-lived worker answering JSON-lines requests")
+    parser.add_argument("--socket", help="Unix socket path for --serve (default: stdin/stdout)")
+    parser.add_argument("--port", type=int, help="Localhost TCP port for --serve (default: stdin/stdout)")
+    parser.add_argument("--voice", default=DEFAULT_VOICE)
+    parser.add_argument("--rate", default=DEFAULT_RATE, help="Speaking rate, e.g. -20%% for slower, +20%% for faster")
+    parser.add_argument("--target-duration", type=float,
+                        help="Seconds the speech should fill; the rate is predicted to fit it")
+    parser.add_argument("--cache-dir", default=os.getenv('TTS_CACHE_DIR', str(DEFAULT_CACHE_DIR)),
+                        help="Directory of the content-addressed audio cache")
+    parser.add_argument("--cache-max-mb", type=int, default=int(os.getenv('TTS_CACHE_MAX_MB', DEFAULT_MAX_MB)),
+                        help="Evict least recently used audio once the cache exceeds this size")
+    parser.add_argument("--no-cache", action="store_true", default=os.getenv('TTS_CACHE', 'true').lower() == 'false',
+                        help="Always call the service, bypassing the audio cache")
+    parser.add_argument("--duration-log", default=log_path_from_env(),
+                        help="JSONL log the duration model learns from (TTS_DURATION_LOG=false disables it)")
+    parser.add_argument("--no-duration-log", action="store_true", help="Do not read or extend the duration log")
     args = parser.parse_args()
 
-    communicate = edge_tts.Communicate(args.text, args.voice, rate=args.rate)
-    await communicate.save(args.out)
-    print(f"Audio saved to {args.out}")
+    args.cache = None
+    if not args.no_cache:
+        args.cache = TtsCache(args.cache_dir, max_bytes=args.cache_max_mb * 1024 * 1024)
+    args.durations = DurationModel(None if args.no_duration_log else args.duration_log)
+    args.scheduler = AdaptiveScheduler(
+        initial=args.concurrency,
+        max_limit=max(args.concurrency, args.max_concurrency),
+        retries=args.retries,
+        is_transient=is_transient,
+    )
+
+    if args.serve:
+        return await run_server(args)
+
+    if args.manifest:
+        return await run_manifest(args)
+
+    if not args.text or not args.out:
+        parser.error("--text and --out are required unless --manifest or --serve is given")
+
+    rate = args.rate
+    if args.target_duration:
+        rate, _ = args.durations.pick_rate(args.text, args.voice, args.target_duration, rate)
+
+    info = await synthesize(args.text, args.out, voice=args.voice, rate=rate, cache=args.cache,
+                            timings=args.timings, scheduler=args.scheduler, durations=args.durations)
+    # Keep stdout clean for the audio itself when streaming
+    report = sys.stderr if args.out == '-' else sys.stdout
+    destination = 'stdout' if args.out == '-' else args.out
+    print(f"Audio {'copied from cache' if info['cached'] else 'saved'} to {destination}", file=report)
+    if args.target_duration:
+        print(f"Rate: {rate}", file=report)
+    print(f"Duration: {info['duration']:.3f}", file=report)
+    return 0
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    sys.exit(asyncio.run(main()))
@@ -9,30 +9,27 @@ import sys
 import io
 import json
 import os
-from pathlib import Path
-from urllib.request import urlopen
-from urllib.parse import urlencode
+import codecs
+import threading
+import queue
+from urllib.request import Request, urlopen
 import re
 
+from script_env import load_env
+from script_metrics import metrics
+from youtube_cache import ResponseCache, cache_enabled
+
 # Force UTF-8 encoding for stdout/stderr on Windows
 if sys.platform == 'win32':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
 
-# Load environment variables from .env file
-def load_env():
-    """Load environment variables from .env file"""
-    env_file = Path(__file__).parent.parent.parent / '.env'
-    if env_file.exists():
-        with open(env_file, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#') and '=' in line:
-                    key, value = line.split('=', 1)
-                    os.environ[key.strip()] = value.strip().strip('"\'')
-
-# Load environment variables
-load_env()
+# Opt-in timings (--metrics / SCRIPT_METRICS=true), reported on stderr at exit
+metrics.configure()
+
+# Load environment variables (parsed once per process)
+with metrics.phase('env'):
+    load_env()
 
 # Debug mode - set to False to disable debug output
 DEBUG_MODE = os.getenv('PYTHON_DEBUG', 'false').lower() == 'true'
@@ -42,19 +39,73 @@ def debug_print(message):
     if DEBUG_MODE:
         print(message, file=sys.stderr)
 
+# URL formats a video ID can be extracted from
+VIDEO_ID_PATTERNS = (
+    re.compile(r'(?:youtube\.com\/watch\?v=|youtu\.be\/)([^&\n?#]+)'),
+    re.compile(r'youtube\.com\/embed\/([^&\n?#]+)'),
+)
+
 def extract_video_id(url):
     """Extract video ID from various YouTube URL formats"""
-    patterns = [
-        r'(?:youtube\.com\/watch\?v=|youtu\.be\/)([^&\n?#]+)',
-        r'youtube\.com\/embed\/([^&\n?#]+)',
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, url)
+    for pattern in VIDEO_ID_PATTERNS:
+        match = pattern.search(url)
         if match:
             return match.group(1)
     return None
 
+# Watch-page fields and the patterns that extract them
+HTML_PATTERNS = {
+    'title': re.compile(r'<meta\s+property="og:title"\s+content="([^"]*)"'),
+    'description': re.compile(r'<meta\s+property="og:description"\s+content="([^"]*)"'),
+    'thumbnail': re.compile(r'<meta\s+property="og:image"\s+content="([^"]*)"'),
+    'duration': re.compile(r'"lengthSeconds":"(\d+)"'),
+}
+
+# Bytes read from the watch page per step
+HTML_CHUNK_SIZE = 16384
+
+# Text kept from the previous chunk so a match split across chunks is still
+# found; longer than any meta tag the patterns match
+HTML_OVERLAP = 4096
+
+def format_duration(duration_seconds):
+    """Format seconds as H:MM:SS, or M:SS under an hour"""
+    hours = duration_seconds // 3600
+    minutes = (duration_seconds % 3600) // 60
+    seconds = duration_seconds % 60
+    
+    if hours > 0:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+def scan_html(response, chunk_size=HTML_CHUNK_SIZE):
+    """
+    Incrementally match HTML_PATTERNS against a streamed page
+
+    Reads the response chunk by chunk and stops as soon as every field has
+    been found, so most of a >1 MB watch page is never downloaded.
+
+    Returns:
+        tuple: (dict of field -> first captured group, bytes read)
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    found = {}
+    carry = ''
+    bytes_read = 0
+    while len(found) < len(HTML_PATTERNS):
+        chunk = response.read(chunk_size)
+        if not chunk:
+            break
+        bytes_read += len(chunk)
+        window = carry + decoder.decode(chunk)
+        for field, pattern in HTML_PATTERNS.items():
+            if field not in found:
+                match = pattern.search(window)
+                if match:
+                    found[field] = match.group(1)
+        carry = window[-HTML_OVERLAP:]
+    return found, bytes_read
+
 def get_metadata_from_html(video_id):
     """
     Extract metadata from YouTube video page HTML
@@ -64,48 +115,28 @@ def get_metadata_from_html(video_id):
         url = f"https://www.youtube.com/watch?v={video_id}"
         
         # Fetch the page with a user agent to avoid being blocked
-        from urllib.request import Request
         req = Request(url, headers={
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         })
         
-        with urlopen(req, timeout=10) as response:
-            html_content = response.read().decode('utf-8')
+        # Leaving the with-block closes the connection, even mid-page
+        with metrics.phase('html_ttfb'):
+            response = urlopen(req, timeout=10)
+        with response, metrics.phase('html_scan'):
+            found, bytes_read = scan_html(response)
+        metrics.count('bytes_in', bytes_read)
+        debug_print(f"DEBUG: Scanned {bytes_read} bytes of watch page, found {sorted(found)}")
         
         metadata = {
-            'title': None,
-            'description': None,
+            'title': found.get('title'),
+            'description': found.get('description'),
             'duration': None,
-            'thumbnail': None
+            'thumbnail': found.get('thumbnail')
         }
         
-        # Extract title from og:title meta tag
-        title_match = re.search(r'<meta\s+property="og:title"\s+content="([^"]*)"', html_content)
-        if title_match:
-            metadata['title'] = title_match.group(1)
-        
-        # Extract description from og:description meta tag
-        desc_match = re.search(r'<meta\s+property="og:description"\s+content="([^"]*)"', html_content)
-        if desc_match:
-            metadata['description'] = desc_match.group(1)
-        
-        # Extract thumbnail from og:image meta tag
-        thumb_match = re.search(r'<meta\s+property="og:image"\s+content="([^"]*)"', html_content)
-        if thumb_match:
-            metadata['thumbnail'] = thumb_match.group(1)
-        
-        # Try to extract duration from videoDetails in initial data
-        duration_match = re.search(r'"lengthSeconds":"(\d+)"', html_content)
-        if duration_match:
-            duration_seconds = int(duration_match.group(1))
-            hours = duration_seconds // 3600
-            minutes = (duration_seconds % 3600) // 60
-            seconds = duration_seconds % 60
-            
-            if hours > 0:
-                metadata['duration'] = f"{hours}:{minutes:02d}:{seconds:02d}"
-            else:
-                metadata['duration'] = f"{minutes}:{seconds:02d}"
+        # Duration comes from videoDetails in initial data
+        if 'duration' in found:
+            metadata['duration'] = format_duration(int(found['duration']))
         
         return metadata
         
@@ -118,8 +149,13 @@ def get_metadata_from_oembed(video_id):
     """
     try:
         url = f"https://www.youtube.com/oembed?url=https://www.youtube.com/watch?v={video_id}&format=json"
-        with urlopen(url, timeout=10) as response:
-            data = json.loads(response.read().decode('utf-8'))
+        with metrics.phase('oembed_ttfb'):
+            response = urlopen(url, timeout=10)
+        with response, metrics.phase('oembed_read'):
+            body = response.read()
+        metrics.count('bytes_in', len(body))
+        with metrics.phase('parse'):
+            data = json.loads(body.decode('utf-8'))
 
         return {
             'title': data.get('title'),
@@ -130,6 +166,48 @@ def get_metadata_from_oembed(video_id):
     except Exception as e:
         raise Exception(f"Failed to fetch metadata from oEmbed: {str(e)}")
 
+def fetch_metadata_concurrently(video_id):
+    """
+    Query oEmbed and the watch page at the same time and merge the results
+
+    Watch-page values win over oEmbed ones, as before. When the page alone
+    yields every field the oEmbed request is not waited for. Daemon threads
+    are used so an abandoned request never delays process exit.
+
+    Returns:
+        dict: title, description, duration and thumbnail (None when unknown)
+    """
+    metadata = {
+        'title': None,
+        'description': None,
+        'duration': None,
+        'thumbnail': None
+    }
+    results = queue.Queue()
+
+    def run(source, fetch):
+        try:
+            results.put((source, fetch(video_id), None))
+        except Exception as e:
+            results.put((source, None, e))
+
+    for source, fetch in (('oembed', get_metadata_from_oembed), ('html', get_metadata_from_html)):
+        threading.Thread(target=run, args=(source, fetch), daemon=True).start()
+
+    collected = {}
+    while len(collected) < 2:
+        source, data, error = results.get()
+        if error:
+            debug_print(f"DEBUG: {'oEmbed' if source == 'oembed' else 'HTML metadata'} failed: {str(error)}")
+        collected[source] = data or {}
+        if source == 'html' and data and all(data.values()):
+            break
+
+    # Try oEmbed first for title/thumbnail, then HTML for description/duration and richer data
+    for source in ('oembed', 'html'):
+        metadata.update({k: v for k, v in collected.get(source, {}).items() if v})
+    return metadata
+
 def get_metadata(video_id_or_url):
     """
     Get metadata for a YouTube video
@@ -157,25 +235,26 @@ def get_metadata(video_id_or_url):
             'thumbnail': None
         }
 
-        # Try oEmbed first for title/thumbnail
-        try:
-            oembed = get_metadata_from_oembed(video_id)
-            metadata.update({k: v for k, v in oembed.items() if v})
-        except Exception as e:
-            debug_print(f"DEBUG: oEmbed failed: {str(e)}")
+        def fetch():
+            with metrics.phase('fetch'):
+                metadata.update(fetch_metadata_concurrently(video_id))
+            debug_print(f"DEBUG: Successfully fetched metadata")
+            return json.dumps(metadata, ensure_ascii=False, indent=None)
 
-        # Try HTML parsing for description/duration and richer data
-        try:
-            html_meta = get_metadata_from_html(video_id)
-            metadata.update({k: v for k, v in html_meta.items() if v})
-        except Exception as e:
-            debug_print(f"DEBUG: HTML metadata failed: {str(e)}")
-        
-        debug_print(f"DEBUG: Successfully fetched metadata")
+        if cache_enabled():
+            # Both sources failing yields no title; don't cache that as a result
+            json_output = ResponseCache().get_or_fetch(
+                'metadata', video_id, fetch, cacheable=lambda payload: bool(metadata['title'])
+            )
+        else:
+            json_output = fetch().encode('utf-8')
         
-        # Output as JSON
-        json_output = json.dumps(metadata, ensure_ascii=False, indent=None)
-        print(json_output)
+        # Output as JSON; cached bytes are written unchanged
+        with metrics.phase('write'):
+            sys.stdout.flush()
+            sys.stdout.buffer.write(json_output + b'\n')
+            sys.stdout.buffer.flush()
+        metrics.count('bytes_out', len(json_output) + 1)
         
     except Exception as e:
         # Return default metadata instead of failing hard
@@ -190,13 +269,17 @@ def get_metadata(video_id_or_url):
         print(json.dumps(error_data))
         sys.exit(0)
 
-if __name__ == '__main__':
+def main():
     if len(sys.argv) < 2:
         error = json.dumps({'error': 'Video ID or URL required'})
         print(error)
-        sys.exit(1)
+        return 1
     
     video_id_or_url = sys.argv[1]
     debug_print(f"DEBUG: Python script started for: {video_id_or_url}")
     get_metadata(video_id_or_url)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
 
@@ -2,7 +2,14 @@
 # -*- coding: utf-8 -*-
 """
 YouTube Transcript Fetcher - Using RapidAPI
-Fetches transcript with timestamps from YouTube videos via RapidAPI
+Fetches transcript with timestamps from YouTube videos via RapidAPI, for one
+video or (--batch) many videos in parallel over pooled keep-alive connections
+
+With --segment the cues are cleaned and grouped into ready-to-dub segments
+({"text", "start_time", "end_time", "duration"}) the way
+TranscriptSegmentationService does, instead of being printed one by one:
+    get_youtube_transcript.py [--segment [--gap 0.5] [--max-words 80]
+        [--max-duration 15] [--sentence-words 20] [--entries]] VIDEO_ID
 """
 
 import sys
@@ -11,29 +18,26 @@ import json
 import time
 import http.client
 import os
-from pathlib import Path
-import html
-import re
+import queue
+import threading
+
+from script_env import load_env
+from script_metrics import metrics
+from transcript_pipeline import (NoEnglishTranscriptError, clean_transcript, normalize_response, parse_response,
+                                 segment_transcript, transcript_from_json)
+from youtube_cache import ResponseCache, cache_enabled
 
 # Force UTF-8 encoding for stdout/stderr on Windows
 if sys.platform == 'win32':
     sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
     sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
 
-# Load environment variables from .env file
-def load_env():
-    """Load environment variables from .env file"""
-    env_file = Path(__file__).parent.parent.parent / '.env'
-    if env_file.exists():
-        with open(env_file, 'r') as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#') and '=' in line:
-                    key, value = line.split('=', 1)
-                    os.environ[key.strip()] = value.strip().strip('"\'')
-
-# Load environment variables
-load_env()
+# Opt-in timings (--metrics / SCRIPT_METRICS=true), reported on stderr at exit
+metrics.configure()
+
+# Load environment variables (parsed once per process)
+with metrics.phase('env'):
+    load_env()
 
 # Debug mode - set to False to disable debug output
 DEBUG_MODE = os.getenv('PYTHON_DEBUG', 'false').lower() == 'true'
@@ -43,242 +47,221 @@ def debug_print(message):
     if DEBUG_MODE:
         print(message)
 
-def contains_arabic(text):
-    """Check if text contains Arabic characters"""
-    if not text:
-        return False
-    return re.search(r'[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF]', text) is not None
-
 # RapidAPI Configuration from environment variables
 RAPIDAPI_HOST = os.getenv('RAPIDAPI_HOST', 'youtube-transcript3.p.rapidapi.com')
 RAPIDAPI_KEY = os.getenv('RAPIDAPI_KEY')
 
-# Validate API credentials
-if not RAPIDAPI_KEY:
-    print(json.dumps({'error': 'RAPIDAPI_KEY not set in environment variables'}))
-    sys.exit(1)
-if not RAPIDAPI_HOST:
-    print(json.dumps({'error': 'RAPIDAPI_HOST not set in environment variables'}))
-    sys.exit(1)
-# Validate API key is set
-if not RAPIDAPI_KEY:
-    raise Exception("RAPIDAPI_KEY not found in environment variables. Please set it in .env file.")
-if not RAPIDAPI_HOST:
-    raise Exception("RAPIDAPI_HOST not found in environment variables. Please set it in .env file.")
-
-def get_transcript_from_rapidapi(video_id):
+# Parallel fetches (and keep-alive connections) used by --batch
+DEFAULT_BATCH_WORKERS = int(os.getenv('TRANSCRIPT_BATCH_WORKERS', '4'))
+
+def new_connection():
+    """Open a keep-alive HTTPS connection to RapidAPI (30 second timeout)"""
+    return http.client.HTTPSConnection(RAPIDAPI_HOST, timeout=30)
+
+class ConnectionPool:
+    """
+    Small thread-safe pool of keep-alive RapidAPI connections
+
+    Connections are created lazily up to `size` and handed back after each
+    request, so a batch pays one TLS handshake per worker instead of per video.
+    """
+
+    def __init__(self, size):
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(max(1, size))
+
+    def acquire(self):
+        self.slots.acquire()
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            return new_connection()
+
+    def release(self, conn, reusable=True):
+        if reusable:
+            self.idle.put(conn)
+        else:
+            conn.close()
+        self.slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+def request_transcript(conn, video_id):
+    """
+    Send the transcript request on conn and read the full response
+
+    A connection that sat idle in the pool may have been closed by the server;
+    that request is retried once on a fresh connection.
+
+    Returns:
+        tuple: (connection used, status code, raw response bytes)
+    """
+    headers = {
+        'x-rapidapi-key': RAPIDAPI_KEY,
+        'x-rapidapi-host': RAPIDAPI_HOST
+    }
+    for attempt in range(2):
+        try:
+            if conn.sock is None:
+                # TCP connect plus TLS handshake
+                with metrics.phase('connect'):
+                    conn.connect()
+            # Make request to RapidAPI - get available transcripts
+            # Note: RapidAPI will return available transcripts, we'll filter for English
+            with metrics.phase('ttfb'):
+                conn.request("GET", f"/api/transcript?videoId={video_id}", headers=headers)
+                res = conn.getresponse()
+            # Read the whole body so the connection can be reused
+            with metrics.phase('download'):
+                raw_data = res.read()
+            metrics.count('bytes_in', len(raw_data))
+            return conn, res.status, raw_data
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError,
+                http.client.CannotSendRequest, http.client.ResponseNotReady):
+            conn.close()
+            if attempt:
+                raise
+            debug_print("DEBUG: Pooled connection was closed, reconnecting")
+            metrics.count('retries')
+            conn = new_connection()
+
+def get_transcript_from_rapidapi(video_id, pool=None):
     """
     Fetch transcript from RapidAPI
     Prioritizes English (en) transcript if available
     
     Args:
         video_id: YouTube video ID
+        pool: Optional ConnectionPool to borrow a keep-alive connection from
         
     Returns:
-        list: Formatted transcript with timing
+        CompactTranscript: Formatted, NFC-normalized transcript with timing
     """
     try:
-        # Set connection timeout to 30 seconds
-        conn = http.client.HTTPSConnection(RAPIDAPI_HOST, timeout=30)
-        
-        headers = {
-            'x-rapidapi-key': RAPIDAPI_KEY,
-            'x-rapidapi-host': RAPIDAPI_HOST
-        }
-        
-        # Make request to RapidAPI - get available transcripts
-        # Note: RapidAPI will return available transcripts, we'll filter for English
-        conn.request("GET", f"/api/transcript?videoId={video_id}", headers=headers)
-        
-        res = conn.getresponse()
-        # Properly decode UTF-8 with error handling
-        raw_data = res.read()
-        # Try UTF-8 first, fallback to ISO-8859-1
-        try:
-            data = raw_data.decode("utf-8")
-        except UnicodeDecodeError:
-            print("DEBUG: UTF-8 decode failed, trying ISO-8859-1")
-            data = raw_data.decode("iso-8859-1", errors='replace')
-        
-        # DEBUG: Print raw response
-        debug_print(f"DEBUG: RapidAPI Status: {res.status}")
+        if pool:
+            conn = pool.acquire()
+            reusable = False
+            try:
+                conn, status, raw_data = request_transcript(conn, video_id)
+                reusable = True
+            finally:
+                pool.release(conn, reusable)
+        else:
+            conn = new_connection()
+            try:
+                conn, status, raw_data = request_transcript(conn, video_id)
+            finally:
+                conn.close()
+
+        debug_print(f"DEBUG: RapidAPI Status: {status}")
         debug_print(f"DEBUG: Requested language: English (en)")
-        debug_print(f"DEBUG: RapidAPI Raw Response (first 500 chars): {data[:500]}")
-        
-        if res.status != 200:
-            raise Exception(f"RapidAPI returned status {res.status}: {data}")
-        
-        # Parse response
-        response_data = json.loads(data)
-        
-        # DEBUG: Print parsed response structure
-        debug_print(f"DEBUG: Response type: {type(response_data)}")
-        if isinstance(response_data, dict):
-            debug_print(f"DEBUG: Response keys: {list(response_data.keys())}")
-            # Check if response has language info
-            if 'lang' in response_data:
-                debug_print(f"DEBUG: Response language: {response_data.get('lang')}")
-        elif isinstance(response_data, list) and len(response_data) > 0:
-            debug_print(f"DEBUG: First item keys: {list(response_data[0].keys()) if isinstance(response_data[0], dict) else 'N/A'}")
-            if isinstance(response_data[0], dict) and 'lang' in response_data[0]:
-                debug_print(f"DEBUG: First item language: {response_data[0].get('lang')}")
-        
-        # Check if API returned success
-        if isinstance(response_data, dict) and 'error' in response_data:
-            raise Exception(f"RapidAPI error: {response_data.get('error')}")
-        
-        # Format response data
-        formatted_transcript = []
-        current_time = 0.0
-        languages = set()  # Initialize as empty set to avoid "int is not iterable" error
+        debug_print(f"DEBUG: RapidAPI Raw Response (first 500 bytes): {raw_data[:500]!r}")
         
-        if isinstance(response_data, list):
-            # If response is already a list of transcript items
-            debug_print(f"DEBUG: Processing list response with {len(response_data)} items")
-            
-            # Check if all items have language codes - filter for English if mixed
-            languages = set()
-            for item in response_data:
-                if isinstance(item, dict) and 'lang' in item:
-                    languages.add(item['lang'])
-            
-            debug_print(f"DEBUG: Languages in response: {languages}")
-            
-            # Only accept English transcripts - reject if no English available
-            if languages and 'en' not in languages:
-                raise Exception(f"Chỉ hỗ trợ transcript tiếng Anh. Video này có: {', '.join(languages)}")
-            
-            # Filter for English only
-            items_to_process = response_data
-            if 'en' in languages:
-                debug_print(f"DEBUG: Filtering for English only")
-                items_to_process = [item for item in response_data if item.get('lang', 'en') == 'en']
-                debug_print(f"DEBUG: Filtered to {len(items_to_process)} English items")
-            
-            # If no items after filtering, reject
-            if not items_to_process:
-                raise Exception("Không tìm thấy transcript tiếng Anh")
-            
-            for idx, item in enumerate(items_to_process):
-                if isinstance(item, dict) and 'text' in item:
-                    # Check language if available
-                    lang = item.get('lang', 'unknown')
-                    if idx == 0:
-                        debug_print(f"DEBUG: First item language code: {lang}")
-                    
-                    # RapidAPI uses 'offset' instead of 'start'
-                    start_time = float(item.get('offset', item.get('start', current_time)))
-                    duration = float(item.get('duration', 3.0))
-                    
-                    # Decode HTML entities (&#39; -> ', &quot; -> ", etc.)
-                    raw_text = item.get('text', '')
-                    if raw_text is None:
-                        raw_text = ''
-                    if not isinstance(raw_text, str):
-                        raw_text = str(raw_text)
-                    text = html.unescape(raw_text).strip()
-                    
-                    # DEBUG: Print first few items
-                    if idx < 3:
-                        debug_print(f"DEBUG: Item {idx}: lang={lang}, text='{text[:50]}...', start={start_time}, duration={duration}")
-                    
-                    formatted_transcript.append({
-                        'text': text,
-                        'start': start_time,
-                        'duration': duration
-                    })
-                    
-                    # Track current time for next segment
-                    current_time = max(current_time, start_time + duration)
-        elif isinstance(response_data, dict):
-            # If response is nested (e.g., under 'transcript' key)
-            transcript_data = response_data.get('transcript', response_data.get('subtitles', []))
-            debug_print(f"DEBUG: Processing nested response, found {len(transcript_data) if isinstance(transcript_data, list) else 0} items")
-            if isinstance(transcript_data, list) and len(transcript_data) > 0:
-                # Check if all items have language codes - filter for English if mixed
-                languages = set()
-                for item in transcript_data:
-                    if isinstance(item, dict) and 'lang' in item:
-                        languages.add(item['lang'])
-                
-                debug_print(f"DEBUG: Languages in nested response: {languages}")
-                
-                # Only accept English transcripts - reject if no English available
-                if languages and 'en' not in languages:
-                    raise Exception(f"Chỉ hỗ trợ transcript tiếng Anh. Video này có: {', '.join(languages)}")
-                
-                # Filter for English only
-                items_to_process = transcript_data
-                if 'en' in languages:
-                    debug_print(f"DEBUG: Filtering for English only")
-                    items_to_process = [item for item in transcript_data if item.get('lang', 'en') == 'en']
-                    debug_print(f"DEBUG: Filtered to {len(items_to_process)} English items")
-                
-                # If no items after filtering, reject
-                if not items_to_process:
-                    raise Exception("Không tìm thấy transcript tiếng Anh")
-                
-                for idx, item in enumerate(items_to_process):
-                    if isinstance(item, dict) and 'text' in item:
-                        # Check language if available
-                        lang = item.get('lang', 'unknown')
-                        if idx == 0:
-                            debug_print(f"DEBUG: First item language code: {lang}")
-                        
-                        # RapidAPI uses 'offset' instead of 'start'
-                        start_time = float(item.get('offset', item.get('start', current_time)))
-                        duration = float(item.get('duration', 3.0))
-                        
-                        # Decode HTML entities (&#39; -> ', &quot; -> ", etc.)
-                        raw_text = item.get('text', '')
-                        if raw_text is None:
-                            raw_text = ''
-                        if not isinstance(raw_text, str):
-                            raw_text = str(raw_text)
-                        text = html.unescape(raw_text).strip()
-                        
-                        # DEBUG: Print first few items
-                        if idx < 3:
-                            debug_print(f"DEBUG: Item {idx}: lang={lang}, text='{text[:50]}...', start={start_time}, duration={duration}")
-                        
-                        formatted_transcript.append({
-                            'text': text,
-                            'start': start_time,
-                            'duration': duration
-                        })
-                        
-                        # Track current time for next segment
-                        current_time = max(current_time, start_time + duration)
-            else:
-                debug_print(f"DEBUG: Response is dict but no valid transcript_data found")
-                raise Exception(f"Unexpected response format from RapidAPI - found dict but no transcript data. Keys: {list(response_data.keys())}")
+        if status != 200:
+            raise Exception(f"RapidAPI returned status {status}: {raw_data.decode('utf-8', errors='replace')}")
         
-        if not formatted_transcript:
-            raise Exception("No transcript data found in API response")
-
-        # If language info is missing, enforce English by rejecting Arabic script
-        # Only do this if languages set is not initialized (meaning we didn't check language codes)
-        if isinstance(languages, set) and len(languages) == 0:
-            sample_text = " ".join([item.get('text', '') for item in formatted_transcript[:10]])
-            if contains_arabic(sample_text):
-                raise Exception("Chỉ hỗ trợ transcript tiếng Anh. Transcript hiện tại có ký tự Ả Rập")
+        # Parse straight from bytes, then filter/unescape/normalize in one pass
+        with metrics.phase('parse'):
+            response_data = parse_response(raw_data)
+        del raw_data
+        with metrics.phase('normalize'):
+            formatted_transcript = normalize_response(response_data, debug_print)
+        del response_data
         
         debug_print(f"DEBUG: Total segments formatted: {len(formatted_transcript)}")
-        debug_print(f"DEBUG: First segment: {formatted_transcript[0] if formatted_transcript else 'None'}")
-        debug_print(f"DEBUG: Last segment: {formatted_transcript[-1] if formatted_transcript else 'None'}")
+        debug_print(f"DEBUG: First segment: {formatted_transcript[0]}")
+        debug_print(f"DEBUG: Last segment: {formatted_transcript[-1]}")
         
         return formatted_transcript
         
+    except NoEnglishTranscriptError as e:
+        raise NoEnglishTranscriptError(f"RapidAPI fetch failed: {str(e)}")
     except Exception as e:
         raise Exception(f"RapidAPI fetch failed: {str(e)}")
 
-def get_transcript(video_id, timeout=50):
+def fetch_transcript(video_id, pool=None):
+    """
+    Fetch and NFC-normalize the transcript of one video
+
+    Args:
+        video_id: YouTube video ID
+        pool: Optional ConnectionPool shared by batch workers
+
+    Returns:
+        CompactTranscript: Transcript cues with text, start and duration
+    """
+    start_time = time.time()
+    debug_print(f"DEBUG: Starting to fetch transcript for video: {video_id} using RapidAPI")
+
+    # Fetch from RapidAPI
+    transcript = get_transcript_from_rapidapi(video_id, pool)
+
+    elapsed = time.time() - start_time
+    debug_print(f"DEBUG: Fetched {len(transcript)} segments in {elapsed:.2f}s from RapidAPI")
+    return transcript
+
+def load_transcript_json(video_id, pool=None, cache=None, segment=None):
+    """
+    Serialized transcript JSON for a video, served from the cache when fresh
+
+    Args:
+        video_id: YouTube video ID
+        pool: Optional ConnectionPool shared by batch workers
+        cache: Optional ResponseCache; concurrent processes fetch each video once
+        segment: Optional segment_transcript() keyword arguments; when given the
+            segments are returned instead of the cues (the cache keeps the cues)
+
+    Returns:
+        bytes: UTF-8 JSON array of transcript items or segments (bytearray when freshly fetched)
+    """
+    fetched = []
+
+    def fetch():
+        transcript = fetch_transcript(video_id, pool)
+        fetched.append(transcript)
+        with metrics.phase('serialize'):
+            return transcript.to_json()
+
+    if cache is None and segment is not None:
+        payload = None
+        fetched.append(fetch_transcript(video_id, pool))
+    elif cache is None:
+        return fetch()
+    else:
+        payload = cache.get_or_fetch('transcript', video_id, fetch, negative=(NoEnglishTranscriptError,))
+    if segment is None:
+        return payload
+
+    # Reuse the transcript just fetched; only cache hits are parsed back
+    transcript = fetched[0] if fetched else transcript_from_json(payload)
+    with metrics.phase('segment'):
+        segments = segment_transcript(clean_transcript(transcript), **segment)
+    metrics.count('segments', len(segments))
+    with metrics.phase('serialize'):
+        return json.dumps(segments, ensure_ascii=False).encode('utf-8')
+
+def write_raw(payload):
+    """Write already-encoded JSON bytes to stdout as one line"""
+    with metrics.phase('write'):
+        sys.stdout.flush()
+        sys.stdout.buffer.write(payload)
+        sys.stdout.buffer.write(b'\n')
+        sys.stdout.buffer.flush()
+    metrics.count('bytes_out', len(payload) + 1)
+
+def get_transcript(video_id, timeout=50, segment=None):
     """
     Fetch transcript for a YouTube video using RapidAPI
     
     Args:
         video_id: YouTube video ID
         timeout: Maximum time to wait (seconds)
+        segment: Optional segment_transcript() keyword arguments (--segment)
         
     Returns:
         JSON string of transcript with timestamps
@@ -286,32 +269,9 @@ def get_transcript(video_id, timeout=50):
     start_time = time.time()
     
     try:
-        debug_print(f"DEBUG: Starting to fetch transcript for video: {video_id} using RapidAPI")
-        
-        # Fetch from RapidAPI
-        formatted_transcript = get_transcript_from_rapidapi(video_id)
-        
-        elapsed = time.time() - start_time
-        debug_print(f"DEBUG: Fetched {len(formatted_transcript)} segments in {elapsed:.2f}s from RapidAPI")
-        
-        # Normalize unicode characters before output
-        import unicodedata
-        normalized_transcript = []
-        for item in formatted_transcript:
-            normalized_item = {}
-            for key, value in item.items():
-                if isinstance(value, str):
-                    # Normalize to NFC form (standard canonical form)
-                    normalized_value = unicodedata.normalize('NFC', value)
-                    normalized_item[key] = normalized_value
-                else:
-                    normalized_item[key] = value
-            normalized_transcript.append(normalized_item)
-        
-        # Output as JSON with proper encoding
-        # Ensure all output is UTF-8 encoded and safe
-        json_output = json.dumps(normalized_transcript, ensure_ascii=False, indent=None)
-        print(json_output)
+        cache = ResponseCache() if cache_enabled() else None
+        # Output as JSON with proper encoding; cached bytes are written unchanged
+        write_raw(load_transcript_json(video_id, cache=cache, segment=segment))
         
     except Exception as e:
         error_data = {
@@ -322,13 +282,141 @@ def get_transcript(video_id, timeout=50):
         print(json.dumps(error_data))
         sys.exit(1)
 
-if __name__ == '__main__':
-    if len(sys.argv) < 2:
+def get_transcripts_batch(video_ids, workers=DEFAULT_BATCH_WORKERS, segment=None):
+    """
+    Fetch transcripts for many videos in parallel
+
+    Prints one JSON line per video as soon as it completes (in completion
+    order): {"video_id", "transcript", "elapsed_time"} on success ("segments"
+    instead of "transcript" with --segment) or {"video_id", "error",
+    "elapsed_time"} on failure.
+
+    Args:
+        video_ids: Iterable of YouTube video IDs
+        workers: Number of parallel fetches (and pooled connections)
+        segment: Optional segment_transcript() keyword arguments (--segment)
+
+    Returns:
+        int: Number of videos that failed
+    """
+    # Only batches need the executor; single fetches skip importing it
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    pool = ConnectionPool(workers)
+    cache = ResponseCache() if cache_enabled() else None
+    output_lock = threading.Lock()
+    failed = 0
+    key = b', "segments": ' if segment is not None else b', "transcript": '
+
+    def fetch_one(video_id):
+        start_time = time.time()
+        try:
+            payload = load_transcript_json(video_id, pool, cache, segment)
+            # Splice the serialized transcript in rather than re-encoding it
+            line = b''.join([
+                b'{"video_id": ', json.dumps(video_id).encode('utf-8'),
+                key, payload,
+                b', "elapsed_time": ', str(round(time.time() - start_time, 3)).encode('ascii'),
+                b'}',
+            ])
+            return line, True
+        except Exception as e:
+            record = {'video_id': video_id, 'error': str(e), 'elapsed_time': round(time.time() - start_time, 3)}
+            return json.dumps(record, ensure_ascii=False).encode('utf-8'), False
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = [executor.submit(fetch_one, video_id) for video_id in video_ids]
+            for future in as_completed(futures):
+                line, ok = future.result()
+                if not ok:
+                    failed += 1
+                with output_lock:
+                    write_raw(line)
+    finally:
+        pool.close()
+    return failed
+
+def read_video_ids(args):
+    """Video IDs from the command line, or one per line from stdin when none (or '-') are given"""
+    if args and args != ['-']:
+        return args
+    return [line.strip() for line in sys.stdin if line.strip()]
+
+def parse_segment_options(args):
+    """
+    Pull --segment and its threshold options out of args
+
+    Returns:
+        tuple: (segment_transcript() keyword arguments, or None without --segment; remaining args)
+    """
+    options = {'--gap': ('gap', float), '--max-words': ('max_words', int),
+               '--max-duration': ('max_duration', float), '--sentence-words': ('sentence_words', int)}
+    segment, remaining = {}, []
+    enabled = False
+    index = 0
+    while index < len(args):
+        arg = args[index]
+        if arg == '--segment':
+            enabled = True
+        elif arg == '--entries':
+            segment['entries'] = True
+        elif arg in options and index + 1 < len(args):
+            name, convert = options[arg]
+            segment[name] = convert(args[index + 1])
+            index += 1
+        else:
+            remaining.append(arg)
+        index += 1
+    return (segment if enabled else None), remaining
+
+def credentials_error():
+    """JSON error line when the RapidAPI credentials are missing, else None"""
+    if not RAPIDAPI_KEY:
+        return json.dumps({'error': 'RAPIDAPI_KEY not set in environment variables'})
+    if not RAPIDAPI_HOST:
+        return json.dumps({'error': 'RAPIDAPI_HOST not set in environment variables'})
+    return None
+
+def main():
+    try:
+        segment, args = parse_segment_options(sys.argv[1:])
+    except ValueError as e:
+        print(json.dumps({'error': f"Invalid segment option: {e}"}))
+        return 1
+
+    if not args:
         error = json.dumps({'error': 'Video ID required'})
         print(error)
-        sys.exit(1)
+        return 1
+
+    # Validated here rather than at import, so importing this module never exits
+    error = credentials_error()
+    if error:
+        print(error)
+        return 1
+
+    if args[0] == '--batch':
+        # Usage: get_youtube_transcript.py [--segment ...] --batch [--workers N] [ID ...]
+        batch_args = args[1:]
+        workers = DEFAULT_BATCH_WORKERS
+        if batch_args and batch_args[0] == '--workers':
+            try:
+                workers = int(batch_args[1])
+                if workers < 1:
+                    raise ValueError
+            except (IndexError, ValueError):
+                print(json.dumps({'error': f"--workers requires a positive integer, got {' '.join(batch_args[1:2]) or 'nothing'}"}))
+                return 1
+            batch_args = batch_args[2:]
+        video_ids = list(dict.fromkeys(read_video_ids(batch_args)))
+        debug_print(f"DEBUG: Batch of {len(video_ids)} videos with {workers} workers")
+        return 1 if get_transcripts_batch(video_ids, workers, segment) else 0
     
-    video_id = sys.argv[1]
+    video_id = args[0]
     debug_print(f"DEBUG: Python script started for video {video_id} using RapidAPI")
-    get_transcript(video_id)
+    get_transcript(video_id, segment=segment)
+    return 0
 
+if __name__ == '__main__':
+    sys.exit(main())
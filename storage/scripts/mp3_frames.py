@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MP3 Frame Parser
+Reads MPEG audio frame headers (and Xing/Info/VBRI tags) to measure exact
+durations without decoding
+"""
+
+import mmap
+import os
+import struct
+
+# Bitrates in kbps indexed by [version is MPEG-1][layer][bitrate index]
+_BITRATES = {
+    True: {
+        1: (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+        2: (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+        3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    },
+    False: {
+        1: (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+        2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+        3: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    },
+}
+
+# Sample rates indexed by version bits (0 = MPEG-2.5, 2 = MPEG-2, 3 = MPEG-1)
+_SAMPLE_RATES = {
+    0: (11025, 12000, 8000),
+    2: (22050, 24000, 16000),
+    3: (44100, 48000, 32000),
+}
+
+# Layer bits -> layer number
+_LAYERS = {1: 3, 2: 2, 3: 1}
+
+HEADER_SIZE = 4
+
+
+def parse_header(b0, b1, b2, b3):
+    """
+    Decode a 4-byte MPEG audio frame header
+
+    Returns:
+        tuple: (frame_length, samples_per_frame, sample_rate, channels) or
+               None when the bytes are not a valid frame header
+    """
+    if b0 != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+    version = (b1 >> 3) & 0x03
+    layer = _LAYERS.get((b1 >> 1) & 0x03)
+    bitrate_index = b2 >> 4
+    rate_index = (b2 >> 2) & 0x03
+    if version == 1 or layer is None or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    mpeg1 = version == 3
+    bitrate = _BITRATES[mpeg1][layer][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    padding = (b2 >> 1) & 0x01
+    channels = 1 if (b3 >> 6) == 3 else 2
+
+    if layer == 1:
+        return (12 * bitrate // sample_rate + padding) * 4, 384, sample_rate, channels
+    if layer == 3 and not mpeg1:
+        return 72 * bitrate // sample_rate + padding, 576, sample_rate, channels
+    return 144 * bitrate // sample_rate + padding, 1152, sample_rate, channels
+
+
+def id3v2_size(data):
+    """Length of a leading ID3v2 tag in data, or 0 when there is none"""
+    if len(data) < 10 or data[:3] != b'ID3':
+        return 0
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+class FrameCounter:
+    """
+    Incrementally count MP3 frames from a byte stream
+
+    Feed audio chunks as they arrive; duration is the exact sum of samples in
+    every complete frame seen so far divided by the sample rate.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.frames = 0
+        self.samples = 0
+        self.sample_rate = 0
+        self.skip = None
+
+    def feed(self, data):
+        buffer = self.buffer
+        buffer.extend(data)
+
+        if self.skip is None:
+            if len(buffer) < 10:
+                return
+            self.skip = id3v2_size(buffer)
+        if self.skip:
+            dropped = min(self.skip, len(buffer))
+            del buffer[:dropped]
+            self.skip -= dropped
+            if self.skip:
+                return
+
+        pos = 0
+        end = len(buffer)
+        while pos + HEADER_SIZE <= end:
+            header = parse_header(buffer[pos], buffer[pos + 1], buffer[pos + 2], buffer[pos + 3])
+            if header is None:
+                # Resynchronise on the next possible frame sync byte
+                pos += 1
+                continue
+            length, samples, sample_rate, _ = header
+            if pos + length > end:
+                break
+            self.frames += 1
+            self.samples += samples
+            self.sample_rate = sample_rate
+            pos += length
+        del buffer[:pos]
+
+    @property
+    def duration(self):
+        return self.samples / self.sample_rate if self.sample_rate else 0.0
+
+
+def side_info_size(version, channels):
+    """Bytes of Layer III side information following the frame header"""
+    if version == 3:
+        return 17 if channels == 1 else 32
+    return 9 if channels == 1 else 17
+
+
+def vbr_tag(data, pos):
+    """
+    Locate a Xing/Info or VBRI tag in the Layer III frame at pos
+
+    Such a frame carries no audio and must not be counted or copied.
+
+    Returns:
+        tuple: (tag name, tag offset), or None when the frame has no tag
+    """
+    version = (data[pos + 1] >> 3) & 0x03
+    channels = 1 if (data[pos + 3] >> 6) == 3 else 2
+    crc = 0 if data[pos + 1] & 0x01 else 2
+    xing = pos + HEADER_SIZE + crc + side_info_size(version, channels)
+    name = bytes(data[xing:xing + 4])
+    if name in (b'Xing', b'Info'):
+        return name, xing
+    vbri = pos + HEADER_SIZE + 32
+    if data[vbri:vbri + 4] == b'VBRI':
+        return b'VBRI', vbri
+    return None
+
+
+def read_vbr_frames(data, pos):
+    """
+    Frame count from a Xing/Info or VBRI tag in the frame at pos
+
+    Returns:
+        int: Number of audio frames the tag declares, or None without a usable tag
+    """
+    tag = vbr_tag(data, pos)
+    if tag is None:
+        return None
+    name, offset = tag
+    if name == b'VBRI':
+        return struct.unpack('>I', data[offset + 14:offset + 18])[0]
+    flags = struct.unpack('>I', data[offset + 4:offset + 8])[0]
+    if flags & 0x01:
+        return struct.unpack('>I', data[offset + 8:offset + 12])[0]
+    return None
+
+
+def is_layer3(data, pos):
+    """Whether the frame header at pos is MPEG Layer III"""
+    return _LAYERS.get((data[pos + 1] >> 1) & 0x03) == 3
+
+
+def iter_frames(data, pos=0):
+    """
+    Yield (offset, header) for every complete frame in data from pos on
+
+    header is the parse_header() tuple; junk and a trailing ID3v1 tag between
+    or after frames are skipped by resynchronising on the next sync byte.
+    """
+    size = len(data)
+    while pos + HEADER_SIZE <= size:
+        header = parse_header(data[pos], data[pos + 1], data[pos + 2], data[pos + 3])
+        if header is None:
+            next_sync = data.find(b'\xff', pos + 1)
+            if next_sync < 0:
+                return
+            pos = next_sync
+            continue
+        if pos + header[0] > size:
+            return
+        yield pos, header
+        pos += header[0]
+
+
+def first_frame(data):
+    """
+    Offset and header of the first complete frame after any ID3v2 tag
+
+    Raises:
+        ValueError: When data holds no MPEG audio frame
+    """
+    for pos, header in iter_frames(data, id3v2_size(data[:10])):
+        return pos, header
+    raise ValueError("no MPEG audio frames found")
+
+
+def silent_frame(header):
+    """
+    A Layer III frame that decodes to silence, shaped like the given header
+
+    The 4 header bytes keep version, bitrate, sample rate and channel mode
+    (so a constant-bitrate stream stays constant) with CRC and padding off;
+    zeroed side information means no main data and zero gain.
+    """
+    b0, b1, b2, b3 = header[:4]
+    frame_header = bytes((b0, b1 | 0x01, b2 & ~0x02, b3))
+    length = parse_header(*frame_header)[0]
+    return frame_header + bytes(length - HEADER_SIZE)
+
+
+def constant_frames(data, pos, length):
+    """
+    Frame count when the audio from pos on is back-to-back identical-size frames
+
+    Compares the first three header bytes of every frame slot with strided
+    slices, so a constant-bitrate file (like edge-tts output) is verified
+    without a per-frame Python loop. A trailing ID3v1 tag and an incomplete
+    last frame are ignored, as in the frame scan.
+
+    Returns:
+        int: Number of frames, or None when any frame differs (fall back to a scan)
+    """
+    end = len(data)
+    if end - pos >= 128 and data[end - 128:end - 125] == b'TAG':
+        end -= 128
+    count = (end - pos) // length
+    if not count:
+        return None
+    stop = pos + count * length
+    for offset in range(3):
+        if data[pos + offset:stop:length] != data[pos + offset:pos + offset + 1] * count:
+            return None
+    return count
+
+
+def probe_buffer(data):
+    """
+    Measure MP3 audio held in a bytes-like object (e.g. an mmap)
+
+    A Xing/Info/VBRI tag in the first frame gives the frame count directly,
+    and constant-bitrate audio is counted with strided header comparisons;
+    otherwise every frame header is visited by hopping frame lengths, which
+    touches only four bytes per frame.
+
+    Returns:
+        dict: duration (seconds), frames, sample_rate, channels, bitrate
+              (average bits per second) and method ('tag', 'cbr' or 'scan')
+    """
+    pos, first = first_frame(data)
+    length, samples, sample_rate, channels = first
+    tagged = None
+    if is_layer3(data, pos) and vbr_tag(data, pos) is not None:
+        tagged = read_vbr_frames(data, pos)
+        # The tag frame itself is silent padding, not audio
+        pos += length
+    if tagged is not None:
+        audio_bytes = len(data) - pos
+        duration = tagged * samples / sample_rate
+        return {
+            'duration': round(duration, 6),
+            'frames': tagged,
+            'sample_rate': sample_rate,
+            'channels': channels,
+            'bitrate': int(audio_bytes * 8 / duration) if duration else 0,
+            'method': 'tag',
+        }
+
+    frames = constant_frames(data, pos, length)
+    if frames is not None:
+        duration = frames * samples / sample_rate
+        return {
+            'duration': round(duration, 6),
+            'frames': frames,
+            'sample_rate': sample_rate,
+            'channels': channels,
+            'bitrate': int(frames * length * 8 / duration),
+            'method': 'cbr',
+        }
+
+    frames = 0
+    total_samples = 0
+    audio_bytes = 0
+    for _, header in iter_frames(data, pos):
+        frames += 1
+        total_samples += header[1]
+        audio_bytes += header[0]
+
+    duration = total_samples / sample_rate
+    return {
+        'duration': round(duration, 6),
+        'frames': frames,
+        'sample_rate': sample_rate,
+        'channels': channels,
+        'bitrate': int(audio_bytes * 8 / duration) if duration else 0,
+        'method': 'scan',
+    }
+
+
+def probe_file(path):
+    """Measure an MP3 file through a read-only memory map (see probe_buffer)"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError("empty file")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return probe_buffer(data)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TTS Rate Predictor
+Picks the Edge TTS rate per segment so the first synthesis fits its slot,
+and backfills the duration model from audio that already exists
+
+Usage:
+    python predict_tts_rate.py [FILE|-]            # predict
+    python predict_tts_rate.py --learn [FILE|-]    # learn from existing audio
+    python predict_tts_rate.py --stats
+
+Predict input, one JSON object per line:
+    {"id": 1, "text": "...", "target_duration": 2.4, "voice": "vi-VN-HoaiMyNeural", "rate": "+0%"}
+Output:
+    {"id": 1, "rate": "+12%", "predicted_duration": 2.41, "natural_duration": 2.7}
+
+Learn input lines carry 'text', 'voice', 'rate' and either 'duration' or an
+MP3 'audio_path' (measured from its frame headers).
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from mp3_frames import probe_file
+from script_metrics import metrics
+from tts_duration import DurationModel, log_path_from_env
+
+DEFAULT_VOICE = "vi-VN-HoaiMyNeural"
+DEFAULT_TOLERANCE = 0.05
+
+
+def read_lines(path):
+    """(line number, JSON object or error message) for every non-empty input line"""
+    stream = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8')
+    try:
+        for line_no, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+                if not isinstance(item, dict):
+                    raise ValueError("line must be a JSON object")
+                yield line_no, item
+            except ValueError as e:
+                yield line_no, f"Invalid input line {line_no}: {e}"
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def predict(model, item, tolerance):
+    voice = item.get('voice') or DEFAULT_VOICE
+    rate, predicted = model.pick_rate(
+        item['text'], voice, float(item['target_duration']), item.get('rate') or '+0%', tolerance)
+    return {
+        'rate': rate,
+        'predicted_duration': round(predicted, 3),
+        'natural_duration': round(model.predict(item['text'], voice), 3),
+    }
+
+
+def learn(model, item, root):
+    duration = item.get('duration')
+    if duration is None:
+        path = item['audio_path']
+        duration = probe_file(os.path.join(root, path) if root else path)['duration']
+    model.record(item['text'], item.get('voice') or DEFAULT_VOICE, item.get('rate') or '+0%', float(duration))
+    return {'duration': round(float(duration), 3)}
+
+
+def main():
+    metrics.configure()
+    parser = argparse.ArgumentParser(description="Predict TTS rates from the learned duration model")
+    parser.add_argument('input', nargs='?', default='-', help="JSONL input file, or '-' for stdin")
+    parser.add_argument('--learn', action='store_true', help="Record existing audio durations instead of predicting")
+    parser.add_argument('--stats', action='store_true', help="Print observation counts and weights per voice")
+    parser.add_argument('--root', help="Directory relative audio paths are resolved against (--learn)")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Keep the given rate when its prediction is within this fraction of the target")
+    parser.add_argument('--duration-log', default=log_path_from_env(),
+                        help="JSONL log the duration model learns from (TTS_DURATION_LOG=false disables it)")
+    args = parser.parse_args()
+
+    model = DurationModel(args.duration_log)
+    with metrics.phase('load_model'):
+        model.load()
+    if args.stats:
+        print(json.dumps(model.stats(), ensure_ascii=False, indent=2))
+        return 0
+
+    failed = 0
+    for line_no, item in read_lines(args.input):
+        if isinstance(item, str):
+            result = {'status': 'error', 'error': item}
+        else:
+            result = {'id': item['id']} if 'id' in item else {}
+            try:
+                result.update(learn(model, item, args.root) if args.learn else predict(model, item, args.tolerance))
+                result['status'] = 'ok'
+            except (KeyError, ValueError, OSError) as e:
+                message = f"missing field {e}" if isinstance(e, KeyError) else str(e)
+                result.update({'status': 'error', 'error': message})
+        failed += result['status'] == 'error'
+        print(json.dumps(result, ensure_ascii=False), flush=True)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+MP3 Duration Probe
+Measures many MP3 files in one process by reading frame headers (and
+Xing/Info/VBRI tags) through memory maps, instead of one ffprobe per file
+
+Usage:
+    python probe_mp3_durations.py [--root DIR] [--details] PATH [PATH ...]
+    python probe_mp3_durations.py [--root DIR] [--details] - < paths.txt
+
+Output (stdout), a single JSON object keyed by the paths as given:
+    {"segments/1.mp3": 2.352, "segments/2.mp3": 1.728, "missing.mp3": null}
+
+With --details each value is {"duration", "frames", "sample_rate", "channels",
+"bitrate", "method"} or {"error": "..."}. Exits 1 when any file failed.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from mp3_frames import probe_file
+from script_metrics import metrics
+
+
+def read_paths(args):
+    """Paths from the command line, with '-' reading one path per stdin line"""
+    paths = []
+    for path in args.paths:
+        if path == '-':
+            paths.extend(line.strip() for line in sys.stdin if line.strip())
+        else:
+            paths.append(path)
+    return paths
+
+
+def probe_paths(paths, root=None, details=False):
+    """
+    Probe every path, resolving relative paths against root
+
+    Returns:
+        tuple: (results dict keyed by path, number of failures)
+    """
+    results = {}
+    failed = 0
+    for path in paths:
+        full_path = os.path.join(root, path) if root else path
+        try:
+            info = probe_file(full_path)
+            results[path] = info if details else info['duration']
+        except (OSError, ValueError) as e:
+            failed += 1
+            print(f"Error: {path}: {e}", file=sys.stderr)
+            results[path] = {'error': str(e)} if details else None
+    return results, failed
+
+
+def main():
+    metrics.configure()
+    parser = argparse.ArgumentParser(description="Probe MP3 durations from frame headers")
+    parser.add_argument('paths', nargs='+', help="MP3 files, or '-' to read paths from stdin")
+    parser.add_argument('--root', help="Directory relative paths are resolved against")
+    parser.add_argument('--details', action='store_true',
+                        help="Report frames, sample rate, channels, bitrate and method per file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    paths = read_paths(args)
+    with metrics.phase('probe'):
+        results, failed = probe_paths(paths, root=args.root, details=args.details)
+    metrics.count('files', len(paths))
+    metrics.count('failed', failed)
+    with metrics.phase('write'):
+        print(json.dumps(results, ensure_ascii=False))
+    print(f"Probed {len(paths)} files ({failed} failed) in {time.perf_counter() - start:.3f}s", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
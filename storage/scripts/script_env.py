@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script Environment
+Loads the Laravel .env into os.environ, once per process however many of the
+scripts are imported into it
+"""
+
+import os
+from functools import lru_cache
+
+ENV_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), '.env')
+
+
+@lru_cache(maxsize=None)
+def load_env():
+    """
+    Load environment variables from the project .env file
+
+    Values from the file override the inherited environment, as they always
+    have. The file is read on the first call only.
+
+    Returns:
+        dict: The variables read from the file (empty when there is none)
+    """
+    values = {}
+    try:
+        with open(ENV_FILE, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith('#') and '=' in line:
+                    key, value = line.split('=', 1)
+                    values[key.strip()] = value.strip().strip('"\'')
+    except FileNotFoundError:
+        return values
+    os.environ.update(values)
+    return values
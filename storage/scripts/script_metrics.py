@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Script Metrics
+Opt-in phase timings and counters shared by the Python scripts
+
+Enable with --metrics on any script's command line or SCRIPT_METRICS=true.
+At exit one JSON line goes to stderr:
+    {"metrics": "get_youtube_transcript", "pid": 123, "total": 0.912,
+     "phases": {"interpreter_start": {"seconds": 0.031, "count": 1}, "imports": ..., "connect": ...},
+     "counters": {"bytes_in": 48213, "bytes_out": 40111, "retries": 0}}
+
+--metrics-textfile=PATH (or SCRIPT_METRICS_TEXTFILE) also writes the run in
+Prometheus text format for the node_exporter textfile collector; a directory
+gets one <script>.prom file per script.
+"""
+
+import atexit
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+LOADED_AT = time.perf_counter()
+LOADED_WALL = time.time()
+
+PROMETHEUS_PREFIX = 'python_script'
+
+
+def process_start_time():
+    """Wall-clock time this process was started (Linux only), or None"""
+    try:
+        with open('/proc/self/stat', 'r') as f:
+            # Fields after the parenthesised command name start at field 3; starttime is field 22
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime', 'r') as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - uptime + start_ticks / os.sysconf('SC_CLK_TCK')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def prometheus_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    """
+    Process-wide phase timer and counter set
+
+    Every method is a cheap no-op until enable() is called, so scripts can be
+    instrumented unconditionally. Safe to use from worker threads.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.configured = False
+        self.script = None
+        self.textfile = None
+        self.lock = threading.Lock()
+        self.phases = {}
+        self.counters = {}
+        self.last_mark = LOADED_AT
+
+    def configure(self, script=None, argv=None):
+        """
+        Enable metrics when requested by --metrics / SCRIPT_METRICS=true
+
+        The --metrics and --metrics-textfile=PATH options are removed from argv
+        (sys.argv by default) so the script's own argument parsing never sees them.
+        Only the first call counts, so a script importing another instrumented
+        script is reported under its own name (argv[0] by default).
+        """
+        if self.configured:
+            return self.enabled
+        self.configured = True
+        argv = sys.argv if argv is None else argv
+        script = script or Path(argv[0]).stem or 'python'
+        enabled = os.getenv('SCRIPT_METRICS', 'false').lower() == 'true'
+        textfile = os.getenv('SCRIPT_METRICS_TEXTFILE') or None
+        for arg in list(argv[1:]):
+            if arg == '--metrics':
+                enabled = True
+                argv.remove(arg)
+            elif arg.startswith('--metrics-textfile='):
+                enabled = True
+                textfile = arg.split('=', 1)[1]
+                argv.remove(arg)
+        if enabled:
+            self.enable(script, textfile)
+        self.mark('imports')
+        return self.enabled
+
+    def enable(self, script, textfile=None):
+        if self.enabled:
+            return
+        self.enabled = True
+        self.script = script
+        self.textfile = textfile
+        started = process_start_time()
+        if started is not None:
+            self.phases['interpreter_start'] = [max(0.0, LOADED_WALL - started), 1]
+        atexit.register(self.report)
+
+    def add(self, name, seconds):
+        """Add externally measured seconds to a phase"""
+        if not self.enabled:
+            return
+        with self.lock:
+            phase = self.phases.setdefault(name, [0.0, 0])
+            phase[0] += seconds
+            phase[1] += 1
+
+    @contextmanager
+    def phase(self, name):
+        """Time the enclosed block as (one more occurrence of) a phase"""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def mark(self, name):
+        """Record the time since the previous mark (or since startup) as a phase"""
+        now = time.perf_counter()
+        self.add(name, now - self.last_mark)
+        self.last_mark = now
+
+    def count(self, name, value=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'metrics': self.script,
+                'pid': os.getpid(),
+                'total': round(time.perf_counter() - LOADED_AT + self.phases.get('interpreter_start', [0.0])[0], 4),
+                'phases': {
+                    name: {'seconds': round(seconds, 4), 'count': count}
+                    for name, (seconds, count) in self.phases.items()
+                },
+                'counters': dict(self.counters),
+            }
+
+    def report(self):
+        """Print the JSON line on stderr and write the Prometheus textfile if configured"""
+        record = self.snapshot()
+        try:
+            print(json.dumps(record), file=sys.stderr, flush=True)
+        except (OSError, ValueError):
+            # stderr may already be closed at interpreter exit
+            pass
+        if self.textfile:
+            try:
+                self.write_textfile(record)
+            except OSError as e:
+                print(f"Failed to write metrics textfile: {e}", file=sys.stderr)
+
+    def write_textfile(self, record):
+        path = Path(self.textfile)
+        if path.is_dir():
+            path = path / f"{self.script}.prom"
+        script = prometheus_label(self.script)
+        lines = [
+            f"# HELP {PROMETHEUS_PREFIX}_phase_seconds Seconds spent per phase in the last run",
+            f"# TYPE {PROMETHEUS_PREFIX}_phase_seconds gauge",
+        ]
+        for name, phase in record['phases'].items():
+            lines.append(f'{PROMETHEUS_PREFIX}_phase_seconds{{script="{script}",phase="{prometheus_label(name)}"}} '
+                         f'{phase["seconds"]}')
+        lines += [
+            f"# HELP {PROMETHEUS_PREFIX}_phase_count Occurrences per phase in the last run",
+            f"# TYPE {PROMETHEUS_PREFIX}_phase_count gauge",
+        ]
+        for name, phase in record['phases'].items():
+            lines.append(f'{PROMETHEUS_PREFIX}_phase_count{{script="{script}",phase="{prometheus_label(name)}"}} '
+                         f'{phase["count"]}')
+        lines += [
+            f"# HELP {PROMETHEUS_PREFIX}_counter Counters (bytes, retries, cache hits) of the last run",
+            f"# TYPE {PROMETHEUS_PREFIX}_counter gauge",
+        ]
+        for name, value in record['counters'].items():
+            lines.append(f'{PROMETHEUS_PREFIX}_counter{{script="{script}",name="{prometheus_label(name)}"}} {value}')
+        lines += [
+            f"# HELP {PROMETHEUS_PREFIX}_duration_seconds Wall time of the last run",
+            f"# TYPE {PROMETHEUS_PREFIX}_duration_seconds gauge",
+            f'{PROMETHEUS_PREFIX}_duration_seconds{{script="{script}"}} {record["total"]}',
+            f"# HELP {PROMETHEUS_PREFIX}_last_run_timestamp_seconds When the last run finished",
+            f"# TYPE {PROMETHEUS_PREFIX}_last_run_timestamp_seconds gauge",
+            f'{PROMETHEUS_PREFIX}_last_run_timestamp_seconds{{script="{script}"}} {round(time.time(), 3)}',
+        ]
+
+        # The collector may read at any moment; never let it see a half-written file
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix='.metrics-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write("\n".join(lines) + "\n")
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
+# Shared by every module of a script
+metrics = Metrics()
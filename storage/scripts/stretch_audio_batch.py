@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Batch Audio Time-Stretcher
+Changes the tempo of many DubSync segments in one invocation: each file is
+decoded once, stretched with WSOLA in NumPy and encoded once, with the jobs
+spread over a process pool sized to the machine's cores
+
+Manifest (JSONL file or stdin), one job per line:
+    {"id": 7, "path": "/abs/segment_7.mp3", "ratio": 1.23, "out": "/abs/segment_7_aligned.mp3"}
+
+'ratio' is the speed ratio (actual / target duration, as in
+AudioAlignmentService); 'target_duration' (seconds) may be given instead and
+is measured against the decoded audio. 'out' defaults to '<name>_aligned.<ext>'.
+The tempo is clamped to 0.5-2.0 like ffmpeg's atempo.
+
+Output: one JSON line per job as it finishes, with per-phase timings, then a
+summary line. WAV files are read and written directly; other formats go
+through one ffmpeg pipe each way.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+import wave
+
+import numpy as np
+
+from audio_batch import decode, default_workers, emit, read_jobs, run_pool
+from script_metrics import metrics
+
+MIN_TEMPO = 0.5
+MAX_TEMPO = 2.0
+
+# Jobs within this distance of tempo 1.0 are left untouched
+TEMPO_EPSILON = 0.01
+
+# WSOLA analysis frame; 30 ms suits speech
+FRAME_SECONDS = 0.03
+
+
+def wsola(samples, tempo, sample_rate):
+    """
+    Time-stretch audio with waveform-similarity overlap-add
+
+    Frames of the input are taken every hop * tempo samples and overlap-added
+    every hop samples; each frame's start is shifted by up to half a hop to the
+    position most similar to the natural continuation of the previous frame,
+    which keeps pitch and avoids phasing.
+
+    Args:
+        samples: float32 array shaped (channels, samples)
+        tempo: Playback speed factor (>1 shortens the audio)
+        sample_rate: Samples per second
+
+    Returns:
+        numpy.ndarray: float32 array shaped (channels, round(samples / tempo))
+    """
+    channels, length = samples.shape
+    frame = max(2, int(sample_rate * FRAME_SECONDS) // 2 * 2)
+    hop = frame // 2
+    tolerance = hop // 2
+    window = np.hanning(frame + 1)[:frame].astype(np.float32)
+
+    out_length = int(round(length / tempo))
+    frames = out_length // hop + 2
+    pad = frame + tolerance
+    last_start = pad + int(round((frames - 1) * hop * tempo)) + tolerance + hop + frame
+    padded = np.zeros((channels, last_start + frame), dtype=np.float32)
+    padded[:, pad:pad + length] = samples
+    # Similarity is measured on the channel mix; all channels share each shift
+    mix = padded.mean(axis=0)
+
+    out = np.zeros((channels, frames * hop + frame), dtype=np.float32)
+    weight = np.zeros(frames * hop + frame, dtype=np.float32)
+    previous = pad
+    for k in range(frames):
+        nominal = pad + int(round(k * hop * tempo))
+        if k == 0:
+            start = nominal
+        else:
+            natural = mix[previous + hop:previous + hop + frame]
+            region = mix[nominal - tolerance:nominal + tolerance + frame]
+            start = nominal - tolerance + int(np.argmax(np.correlate(region, natural, 'valid')))
+        out[:, k * hop:k * hop + frame] += window * padded[:, start:start + frame]
+        weight[k * hop:k * hop + frame] += window
+        previous = start
+
+    out = out[:, :out_length]
+    weight = weight[:out_length]
+    np.divide(out, weight, out=out, where=weight > 1e-3)
+    return out
+
+
+def write_wav(path, samples, sample_rate):
+    """Encode float32 (channels, samples) audio as 16-bit PCM WAV"""
+    pcm = (np.clip(samples.T, -1.0, 1.0) * 32767).astype('<i2')
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(samples.shape[0])
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(pcm.tobytes())
+
+
+def encode(path, samples, sample_rate):
+    """Encode float32 (channels, samples) audio; the format follows the extension"""
+    if path.lower().endswith('.wav'):
+        write_wav(path, samples, sample_rate)
+        return
+    subprocess.run(
+        ['ffmpeg', '-v', 'error', '-f', 'f32le', '-ar', str(sample_rate), '-ac', str(samples.shape[0]),
+         '-i', '-', '-y', path],
+        input=np.ascontiguousarray(samples.T, dtype='<f4').tobytes(), capture_output=True, check=True,
+    )
+
+
+def aligned_path(path):
+    root, ext = os.path.splitext(path)
+    return f"{root}_aligned{ext or '.mp3'}"
+
+
+def stretch_job(job, result):
+    """
+    Decode, stretch and encode one job (runs in a pool process through run_job)
+
+    Fills result with status, tempo, durations and per-phase timings.
+    """
+    start = time.perf_counter()
+    path = job['path']
+    out = job.get('out') or aligned_path(path)
+    result.update({'path': path, 'out': out})
+    if 'id' in job:
+        result['id'] = job['id']
+
+    samples, sample_rate = decode(path)
+    decoded = time.perf_counter()
+    input_duration = samples.shape[1] / sample_rate
+
+    if job.get('target_duration'):
+        ratio = input_duration / float(job['target_duration'])
+    else:
+        ratio = float(job['ratio'])
+    tempo = max(MIN_TEMPO, min(MAX_TEMPO, ratio))
+    result.update({'ratio': round(ratio, 4), 'tempo': round(tempo, 4), 'input_duration': round(input_duration, 3)})
+
+    if abs(tempo - 1.0) < TEMPO_EPSILON:
+        result.update({'status': 'unchanged', 'out': path, 'output_duration': round(input_duration, 3)})
+        result['timings'] = {'decode': round(decoded - start, 3)}
+        return
+    stretched = wsola(samples, tempo, sample_rate)
+    processed = time.perf_counter()
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    encode(out, stretched, sample_rate)
+    result.update({'status': 'ok', 'output_duration': round(stretched.shape[1] / sample_rate, 3)})
+    result['timings'] = {
+        'decode': round(decoded - start, 3),
+        'stretch': round(processed - decoded, 3),
+        'encode': round(time.perf_counter() - processed, 3),
+    }
+
+
+def validate_job(job):
+    if not job.get('path') or ('ratio' not in job and not job.get('target_duration')):
+        raise ValueError("job requires 'path' and 'ratio' or 'target_duration'")
+
+
+def main():
+    metrics.configure()
+    parser = argparse.ArgumentParser(description="Time-stretch many audio segments in parallel")
+    parser.add_argument('manifest', nargs='?', default='-', help="JSONL jobs file, or '-' for stdin")
+    parser.add_argument('--workers', type=int, default=default_workers(),
+                        help="Worker processes (default: number of CPU cores)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    jobs, errors = read_jobs(args.manifest, validate_job)
+    for error in errors:
+        emit(error)
+
+    counts = {'ok': 0, 'unchanged': 0, 'error': len(errors)}
+    run_pool(stretch_job, jobs, args.workers, counts)
+
+    emit({
+        'status': 'done',
+        'total': len(jobs) + len(errors),
+        **counts,
+        'workers': args.workers,
+        'elapsed': round(time.perf_counter() - start, 3),
+    })
+    return 1 if counts['error'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for assemble_mp3_timeline: format checks and the written output file
+
+Run from storage/scripts:
+    python -m unittest discover tests
+"""
+
+import json
+import os
+import stat
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import assemble_mp3_timeline  # noqa: E402
+from assemble_mp3_timeline import FormatMismatchError, check_formats  # noqa: E402
+from tts_cache import FILE_MODE  # noqa: E402
+
+# MPEG-2 Layer III, 48 kbps, 24 kHz: mono and stereo frames of the same length
+FRAME = bytes.fromhex('fff364c4') + bytes(140)
+STEREO_FRAME = bytes.fromhex('fff36404') + bytes(140)
+# Same format at 64 kbps: a variable-bitrate stream
+FRAME_64K = bytes.fromhex('fff384c4') + bytes(188)
+
+
+class CheckFormatsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def segment(self, name, data):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_matching_segments(self):
+        paths = [self.segment('a.mp3', FRAME * 10), self.segment('b.mp3', FRAME_64K + FRAME * 3)]
+        fmt, header_bytes = check_formats(paths)
+        self.assertEqual(fmt, (2, 1, 24000, 1))
+        self.assertEqual(header_bytes, FRAME[:4])
+
+    def test_first_frame_mismatch(self):
+        paths = [self.segment('a.mp3', FRAME * 10), self.segment('b.mp3', STEREO_FRAME * 10)]
+        with self.assertRaisesRegex(FormatMismatchError, 'b.mp3 is MPEG-2 Layer III 24000 Hz stereo'):
+            check_formats(paths)
+
+    def test_channel_change_inside_a_constant_bitrate_segment(self):
+        paths = [self.segment('a.mp3', FRAME * 10), self.segment('b.mp3', FRAME * 5 + STEREO_FRAME * 5)]
+        with self.assertRaisesRegex(FormatMismatchError, f'frame at byte {len(FRAME) * 5} is .* stereo'):
+            check_formats(paths)
+
+    def test_channel_change_inside_a_variable_bitrate_segment(self):
+        data = FRAME_64K + FRAME * 4 + STEREO_FRAME
+        paths = [self.segment('a.mp3', data)]
+        with self.assertRaisesRegex(FormatMismatchError, f'frame at byte {len(data) - len(STEREO_FRAME)}'):
+            check_formats(paths)
+
+
+class MainTest(unittest.TestCase):
+
+    def test_output_gets_the_usual_file_mode(self):
+        with tempfile.TemporaryDirectory() as root:
+            with open(os.path.join(root, 'a.mp3'), 'wb') as f:
+                f.write(FRAME * 10)
+            manifest = os.path.join(root, 'segments.json')
+            with open(manifest, 'w', encoding='utf-8') as f:
+                json.dump([{'start_time': 0.5, 'audio_path': 'a.mp3'}], f)
+            out = os.path.join(root, 'final.mp3')
+            argv = ['assemble_mp3_timeline.py', manifest, '--out', out, '--root', root]
+            with mock.patch.object(sys, 'argv', argv), mock.patch('sys.stdout'):
+                self.assertEqual(assemble_mp3_timeline.main(), 0)
+            self.assertEqual(stat.S_IMODE(os.stat(out).st_mode), FILE_MODE)
+            self.assertEqual(sorted(os.listdir(root)), ['a.mp3', 'final.mp3', 'segments.json'])
+
+
+if __name__ == '__main__':
+    unittest.main()
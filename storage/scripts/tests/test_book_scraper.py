@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for book_scraper and book_sources: the saved nhasachmienphi.com page
+and connection handling on a failed retry
+
+Run from storage/scripts:
+    python -m unittest discover tests
+"""
+
+import http.client
+import os
+import sys
+import unittest
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPTS_DIR)
+
+from book_scraper import Fetcher  # noqa: E402
+from book_sources import NhaSachMienPhiSource, source_for_url  # noqa: E402
+
+SAMPLE = os.path.join(SCRIPTS_DIR, '..', '..', 'nhasachmienphi_sample.html')
+BOOK_URL = 'https://nhasachmienphi.com/diep-vien-007-song-bac-hoang-gia.html'
+
+
+class NhaSachMienPhiSampleTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open(SAMPLE, 'r', encoding='utf-8') as f:
+            html = f.read()
+        source = source_for_url(BOOK_URL)
+        parser = source.book_parser(BOOK_URL)
+        # Small chunks, as the page arrives from the network
+        for start in range(0, len(html), 997):
+            parser.feed(html[start:start + 997])
+        parser.close()
+        cls.source = source
+        cls.book = parser.result()
+
+    def test_source(self):
+        self.assertIsInstance(self.source, NhaSachMienPhiSource)
+
+    def test_book_info(self):
+        self.assertEqual(self.book['title'], 'Điệp Viên 007 – Sòng Bạc Hoàng Gia')
+        self.assertEqual(self.book['author'], 'Ian Fleming')
+        self.assertEqual(self.book['category'], 'Phiêu Lưu - Mạo Hiểm')
+        self.assertTrue(self.book['description'].startswith('Dịch giả: Khắc Vinh Chiffre là một tay trùm'))
+        self.assertEqual(self.book['cover_image'],
+                         'https://nhasachmienphi.com/images/thumbnail/nhasachmienphi-diep-vien-007-song-bac-hoang-gia.jpg')
+
+    def test_chapters(self):
+        self.assertEqual(self.book['total_chapters'], 27)
+        self.assertEqual(len(self.book['chapters']), 27)
+        for number, chapter in enumerate(self.book['chapters'], 1):
+            self.assertEqual(chapter, {
+                'number': number,
+                'title': f'Chương {number}',
+                'url': f'https://nhasachmienphi.com/doc-online/diep-vien-007-song-bac-hoang-gia-{212666 + number}',
+            })
+
+
+class FakeConnection:
+
+    def __init__(self, error):
+        self.sock = object()
+        self.error = error
+        self.closed = False
+
+    def request(self, *args, **kwargs):
+        raise self.error
+
+    def close(self):
+        self.closed = True
+
+
+class FakePool:
+
+    def __init__(self, error):
+        self.error = error
+        self.created = []
+
+    def new_connection(self):
+        conn = FakeConnection(self.error)
+        self.created.append(conn)
+        return conn
+
+
+class SendTest(unittest.TestCase):
+
+    def test_failed_retry_closes_the_new_connection(self):
+        pooled = FakeConnection(http.client.RemoteDisconnected('closed by the server'))
+        pool = FakePool(TimeoutError('timed out'))
+        with self.assertRaises(TimeoutError):
+            Fetcher(1, 0).send(pool, pooled, 'GET', '/', None, {})
+        self.assertTrue(pooled.closed)
+        self.assertEqual(len(pool.created), 1)
+        self.assertTrue(pool.created[0].closed)
+
+
+if __name__ == '__main__':
+    unittest.main()
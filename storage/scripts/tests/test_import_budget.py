@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for the dubsync.py import budget: runs benchmarks/check_import_budget.py
+
+Targets whose optional dependencies are not installed are skipped.
+
+Run from storage/scripts:
+    python -m unittest discover tests
+"""
+
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CHECK = os.path.join(SCRIPTS_DIR, 'benchmarks', 'check_import_budget.py')
+
+# Test runners are noisier than a quiet benchmark machine
+SCALE = 1.5
+
+
+def installed(*modules):
+    return all(importlib.util.find_spec(module) for module in modules)
+
+
+class ImportBudgetTest(unittest.TestCase):
+
+    def check(self, targets):
+        with tempfile.TemporaryDirectory() as tmp:
+            results_path = os.path.join(tmp, 'results.json')
+            subprocess.run(
+                [sys.executable, CHECK, '--runs', '3', '--scale', str(SCALE),
+                 '--targets', ','.join(targets), '--json', results_path],
+                capture_output=True, cwd=SCRIPTS_DIR,
+            )
+            with open(results_path, 'r', encoding='utf-8') as f:
+                results = json.load(f)['results']
+        self.assertEqual([result['target'] for result in results], targets)
+        for result in results:
+            with self.subTest(target=result['target']):
+                self.assertEqual(result['problems'], [])
+
+    def test_standard_library_targets(self):
+        self.check(['dispatcher', 'transcript', 'metadata', 'book'])
+
+    @unittest.skipUnless(installed('edge_tts', 'aiohttp'), "edge_tts and aiohttp are not installed")
+    def test_tts(self):
+        self.check(['tts'])
+
+
+if __name__ == '__main__':
+    unittest.main()
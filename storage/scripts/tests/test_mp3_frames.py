@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for mp3_frames: frame headers, VBR tags and damaged input
+
+Run from storage/scripts:
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mp3_frames import FrameCounter, first_frame, iter_frames, parse_header, probe_buffer, silent_frame  # noqa: E402
+
+# MPEG-2 Layer III, 48 kbps, 24 kHz, mono, no CRC: the format edge-tts returns.
+# 144 bytes and 576 samples (24 ms) per frame.
+HEADER = bytes.fromhex('fff364c4')
+FRAME = HEADER + bytes(140)
+FRAME_SECONDS = 0.024
+
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz, stereo: 417 bytes, 1152 samples
+MPEG1_HEADER = bytes.fromhex('fffb9000')
+
+
+def vbr_frame(name=b'Xing', frames=None):
+    """A Layer III tag frame shaped like FRAME, declaring `frames` audio frames"""
+    body = bytearray(len(FRAME) - 4)
+    # Mono MPEG-2 side information is 9 bytes, the tag follows it
+    body[9:13] = name
+    if frames is not None:
+        body[13:17] = (1).to_bytes(4, 'big')
+        body[17:21] = frames.to_bytes(4, 'big')
+    return HEADER + bytes(body)
+
+
+def id3v2(payload_size):
+    """An ID3v2.4 tag header plus payload_size bytes of padding"""
+    size = bytes((payload_size >> 21 & 0x7F, payload_size >> 14 & 0x7F, payload_size >> 7 & 0x7F, payload_size & 0x7F))
+    return b'ID3\x04\x00\x00' + size + bytes(payload_size)
+
+
+class ParseHeaderTest(unittest.TestCase):
+
+    def test_edge_tts_format(self):
+        self.assertEqual(parse_header(*HEADER), (144, 576, 24000, 1))
+
+    def test_mpeg1_stereo(self):
+        self.assertEqual(parse_header(*MPEG1_HEADER), (417, 1152, 44100, 2))
+
+    def test_padding_adds_a_byte(self):
+        self.assertEqual(parse_header(0xFF, 0xF3, 0x66, 0xC4)[0], 145)
+
+    def test_rejects_invalid_headers(self):
+        for header in (
+            b'\x00\xf3\x64\xc4',  # no sync byte
+            b'\xff\x03\x64\xc4',  # incomplete sync
+            b'\xff\xeb\x64\xc4',  # reserved version
+            b'\xff\xf1\x64\xc4',  # reserved layer
+            b'\xff\xf3\x04\xc4',  # free-format bitrate
+            b'\xff\xf3\xf4\xc4',  # bad bitrate index
+            b'\xff\xf3\x6c\xc4',  # reserved sample rate
+        ):
+            with self.subTest(header=header.hex()):
+                self.assertIsNone(parse_header(*header))
+
+
+class IterFramesTest(unittest.TestCase):
+
+    def test_resynchronises_after_garbage(self):
+        data = FRAME * 2 + b'\x00\xffjunk\xff\xff' + FRAME * 3
+        offsets = [pos for pos, _ in iter_frames(data)]
+        self.assertEqual(len(offsets), 5)
+        self.assertEqual(offsets[2], len(FRAME) * 2 + 8)
+
+    def test_stops_before_a_truncated_frame(self):
+        self.assertEqual(len(list(iter_frames(FRAME * 3 + FRAME[:100]))), 3)
+
+    def test_false_sync_at_the_end_is_ignored(self):
+        self.assertEqual(len(list(iter_frames(FRAME + b'\xff\xf3'))), 1)
+
+    def test_first_frame_skips_id3v2(self):
+        pos, header = first_frame(id3v2(300) + FRAME)
+        self.assertEqual(pos, 310)
+        self.assertEqual(header, (144, 576, 24000, 1))
+
+    def test_first_frame_rejects_non_audio(self):
+        for data in (b'', FRAME[:4], FRAME[:143], bytes(range(256)) * 4, b'\xff' * 1000):
+            with self.subTest(size=len(data)):
+                with self.assertRaises(ValueError):
+                    first_frame(data)
+
+
+class ProbeBufferTest(unittest.TestCase):
+
+    def test_constant_bitrate(self):
+        info = probe_buffer(FRAME * 100)
+        self.assertEqual(info['method'], 'cbr')
+        self.assertEqual(info['frames'], 100)
+        self.assertAlmostEqual(info['duration'], 100 * FRAME_SECONDS)
+        self.assertEqual(info['bitrate'], 48000)
+
+    def test_truncated_last_frame_is_not_counted(self):
+        info = probe_buffer(FRAME * 10 + FRAME[:50])
+        self.assertEqual(info['frames'], 10)
+
+    def test_trailing_id3v1_tag_is_ignored(self):
+        info = probe_buffer(FRAME * 10 + b'TAG' + bytes(125))
+        self.assertEqual(info['method'], 'cbr')
+        self.assertEqual(info['frames'], 10)
+
+    def test_garbage_between_frames_falls_back_to_a_scan(self):
+        info = probe_buffer(FRAME * 3 + b'\x00\xffjunk' + FRAME * 4)
+        self.assertEqual(info['method'], 'scan')
+        self.assertEqual(info['frames'], 7)
+
+    def test_xing_frame_count_is_trusted(self):
+        info = probe_buffer(vbr_frame(b'Xing', 100) + FRAME * 3)
+        self.assertEqual(info['method'], 'tag')
+        self.assertEqual(info['frames'], 100)
+        self.assertAlmostEqual(info['duration'], 100 * FRAME_SECONDS)
+
+    def test_info_tag_frame_is_not_audio(self):
+        info = probe_buffer(vbr_frame(b'Info', 5) + FRAME * 5)
+        self.assertEqual(info['method'], 'tag')
+        self.assertEqual(info['frames'], 5)
+
+    def test_tag_without_frame_count_counts_the_frames(self):
+        # The tag frame itself must not be counted as audio
+        info = probe_buffer(vbr_frame(b'Info') + FRAME * 4)
+        self.assertEqual(info['method'], 'cbr')
+        self.assertEqual(info['frames'], 4)
+
+    def test_empty_xing_tag(self):
+        info = probe_buffer(vbr_frame(b'Xing', 0))
+        self.assertEqual(info['duration'], 0)
+        self.assertEqual(info['bitrate'], 0)
+
+
+class FrameCounterTest(unittest.TestCase):
+
+    def test_counts_across_arbitrary_chunks(self):
+        data = id3v2(20) + FRAME * 5
+        counter = FrameCounter()
+        for start in range(0, len(data), 7):
+            counter.feed(data[start:start + 7])
+        self.assertEqual(counter.frames, 5)
+        self.assertAlmostEqual(counter.duration, 5 * FRAME_SECONDS)
+
+    def test_partial_frame_waits_for_more_data(self):
+        counter = FrameCounter()
+        counter.feed(FRAME * 2 + FRAME[:60])
+        self.assertEqual(counter.frames, 2)
+        counter.feed(FRAME[60:])
+        self.assertEqual(counter.frames, 3)
+
+    def test_garbage_only(self):
+        counter = FrameCounter()
+        counter.feed(b'not an mp3 at all' * 10)
+        self.assertEqual(counter.frames, 0)
+        self.assertEqual(counter.duration, 0.0)
+
+
+class SilentFrameTest(unittest.TestCase):
+
+    def test_matches_the_stream_format(self):
+        padded_crc = bytes((0xFF, 0xF2, 0x66, 0xC4))
+        frame = silent_frame(padded_crc)
+        self.assertEqual(parse_header(*frame[:4]), (144, 576, 24000, 1))
+        self.assertEqual(len(frame), 144)
+        self.assertEqual(frame[4:], bytes(140))
+
+
+if __name__ == '__main__':
+    unittest.main()
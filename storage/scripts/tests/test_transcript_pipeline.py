@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for transcript_pipeline: language filtering, JSON serialization and
+segmentation against a port of the PHP loop
+
+Run from storage/scripts:
+    python -m unittest discover tests
+"""
+
+import json
+import math
+import os
+import random
+import re
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transcript_pipeline import (  # noqa: E402
+    SERIALIZE_BLOCK,
+    WORD_RE,
+    CompactTranscript,
+    NoEnglishTranscriptError,
+    normalize_items,
+    segment_transcript,
+    transcript_from_json,
+)
+
+WORDS = ['the', 'quick', "don't", 'well-known', 'fox', 'jumps', 'over', 'a', 'lazy', 'dog', '42', 'x2']
+
+
+def php_segment(cues):
+    """
+    TranscriptSegmentationService::segment, statement by statement
+
+    Args:
+        cues: (text, start, duration) tuples of a cleaned transcript
+
+    Returns:
+        list: Segments with 'entries', as the PHP service returns them
+    """
+    segments = []
+    current, text, segment_start, segment_duration, word_count = [], '', 0, 0, 0
+    previous_end = last_start = last_duration = None
+
+    def finalize(last_index):
+        next_start = cues[last_index + 1][1] if last_index + 1 < len(cues) else None
+        end = min(previous_end, next_start) if next_start is not None else previous_end
+        segments.append({'text': text, 'start_time': segment_start, 'end_time': end,
+                         'duration': max(0, end - segment_start), 'entries': current})
+
+    for index, (cue_text, start, duration) in enumerate(cues):
+        has_gap = previous_end is not None and start - previous_end > 0.5
+        if has_gap and current:
+            finalize(index - 1)
+            current, text, segment_duration, word_count = [], '', 0, 0
+            segment_start = start
+
+        current.append({'text': cue_text, 'start': start, 'duration': duration})
+        text += (' ' if text else '') + cue_text
+        segment_duration += duration
+        last_start, last_duration = start, duration
+        word_count += len(WORD_RE.findall(cue_text))
+        previous_end = start + duration
+
+        if (re.search(r'[.!?]$', cue_text) and word_count >= 20) or word_count >= 80 or segment_duration >= 15:
+            finalize(index)
+            current, text, segment_duration, word_count = [], '', 0, 0
+            if index + 1 < len(cues):
+                segment_start = cues[index + 1][1]
+
+    if current:
+        end = last_start + last_duration
+        segments.append({'text': text, 'start_time': segment_start, 'end_time': end,
+                         'duration': max(0, end - segment_start), 'entries': current})
+    return segments
+
+
+def compact(cues):
+    transcript = CompactTranscript()
+    for cue in cues:
+        transcript.append(*cue)
+    return transcript
+
+
+def words(count, end=''):
+    return ' '.join(['word'] * count) + end
+
+
+class NormalizeItemsTest(unittest.TestCase):
+
+    def test_keeps_english_cues_only(self):
+        transcript = normalize_items([
+            {'text': 'Hello &amp; welcome', 'offset': '1.5', 'duration': 2, 'lang': 'en'},
+            {'text': 'Xin chào', 'offset': 1.5, 'duration': 2, 'lang': 'vi'},
+            {'text': ' Cafe\u0301 ', 'start': 4.0, 'lang': 'en'},
+        ])
+        self.assertEqual([transcript[i] for i in range(len(transcript))], [
+            {'text': 'Hello & welcome', 'start': 1.5, 'duration': 2.0},
+            {'text': 'Café', 'start': 4.0, 'duration': 3.0},
+        ])
+
+    def test_rejects_a_transcript_without_english_cues(self):
+        with self.assertRaisesRegex(NoEnglishTranscriptError, 'vi'):
+            normalize_items([{'text': 'Xin chào', 'offset': 0, 'duration': 1, 'lang': 'vi'}])
+
+    def test_rejects_arabic_without_language_tags(self):
+        with self.assertRaises(NoEnglishTranscriptError):
+            normalize_items([{'text': 'مرحبا', 'offset': 0, 'duration': 1}])
+
+
+class ToJsonTest(unittest.TestCase):
+
+    def assertMatchesJsonDumps(self, cues):
+        transcript = compact(cues)
+        expected = json.dumps([transcript[i] for i in range(len(transcript))], ensure_ascii=False)
+        self.assertEqual(bytes(transcript.to_json()), expected.encode('utf-8'))
+
+    def test_empty(self):
+        self.assertMatchesJsonDumps([])
+
+    def test_escapes_and_non_bmp_characters(self):
+        self.assertMatchesJsonDumps([
+            ('emoji \U0001F600 and \U00010348', 0.0, 1.0),
+            ('controls \x00\x01\x1f\x7f \t\n\r\b\f', 1.0, 1.0),
+            ('quotes " and \\ backslash, / slash, \u2028 separator', 2.0, 1.0),
+        ])
+
+    def test_special_floats(self):
+        self.assertMatchesJsonDumps([
+            ('nan', math.nan, 1.0), ('inf', math.inf, -math.inf), ('tiny', 1e-7, 5e-324),
+            ('large', 1e16, 123456789.123456789), ('negative zero', -0.0, 0.1 + 0.2),
+        ])
+
+    def test_more_than_one_block(self):
+        cues = [(f'cue {i} é', i * 0.1, 0.1) for i in range(SERIALIZE_BLOCK * 2 + 3)]
+        self.assertMatchesJsonDumps(cues)
+        self.assertMatchesJsonDumps(cues[:SERIALIZE_BLOCK])
+        self.assertMatchesJsonDumps(cues[:SERIALIZE_BLOCK + 1])
+
+    def test_round_trip(self):
+        transcript = compact([('one', 0.5, 1.25), ('two \U0001F600', 2.0, 0.75)])
+        restored = transcript_from_json(transcript.to_json())
+        self.assertEqual(bytes(restored.to_json()), bytes(transcript.to_json()))
+
+
+class SegmentTranscriptTest(unittest.TestCase):
+
+    def assertMatchesPhp(self, cues):
+        self.assertEqual(segment_transcript(compact(cues), entries=True), php_segment(cues))
+
+    def test_empty(self):
+        self.assertEqual(segment_transcript(CompactTranscript()), [])
+
+    def test_gap_of_exactly_half_a_second_does_not_split(self):
+        cues = [('one', 1.0, 0.5), ('two', 2.0, 0.5), ('three', 3.25, 0.5)]
+        self.assertMatchesPhp(cues)
+        segments = segment_transcript(compact(cues))
+        # 1.5 -> 2.0 is exactly the threshold; 2.5 -> 3.25 is over it
+        self.assertEqual([segment['text'] for segment in segments], ['one two', 'three'])
+        self.assertEqual(segments[0]['start_time'], 0.0)
+        self.assertEqual(segments[0]['end_time'], 2.5)
+        self.assertEqual(segments[1]['start_time'], 3.25)
+
+    def test_sentence_end_before_sentence_words_does_not_split(self):
+        cues = [(words(5, '.'), 0.0, 1.0), (words(10, '?'), 1.0, 1.0), (words(5, '!'), 2.0, 1.0),
+                (words(3, '.'), 3.0, 1.0)]
+        self.assertMatchesPhp(cues)
+        segments = segment_transcript(compact(cues))
+        # The sentence end is only honoured at the cue that reaches 20 words
+        self.assertEqual([len(WORD_RE.findall(segment['text'])) for segment in segments], [20, 3])
+        self.assertEqual(segments[0]['end_time'], 3.0)
+
+    def test_word_and_duration_limits(self):
+        self.assertMatchesPhp([(words(30), 0.0, 1.0), (words(50), 1.0, 1.0), (words(1), 2.0, 1.0)])
+        self.assertMatchesPhp([('a', 0.0, 7.5), ('b', 7.5, 7.5), ('c', 15.0, 1.0)])
+
+    def test_overlapping_and_negative_starts(self):
+        self.assertMatchesPhp([('one', 0.0, 3.0), ('two', 1.0, 1.0), ('three', 2.25, 1.0), ('four', 4.0, 1.0)])
+        self.assertMatchesPhp([('one', -2.0, 1.0), ('two', -0.5, 1.0), ('three', -3.0, 1.0), ('four', 5.0, 1.0)])
+        self.assertMatchesPhp([(words(20, '.'), 0.0, 2.0), ('next', -1.0, 0.5), ('after', 0.0, 0.5)])
+
+    def test_random_transcripts_match_php(self):
+        rng = random.Random(20260418)
+        for case in range(500):
+            cues = []
+            start = rng.choice((-1.0, 0.0, 2.0))
+            for _ in range(rng.randrange(60)):
+                text = ' '.join(rng.choice(WORDS) for _ in range(rng.randrange(1, 9)))
+                text += rng.choice(('', '', '.', '?', '!'))
+                # Multiples of 0.25 keep the sums exact, as they are in both implementations
+                duration = rng.randrange(17) * 0.25
+                cues.append((text, start, duration))
+                start += duration + rng.choice((-2.0, -0.5, 0.0, 0.0, 0.25, 0.5, 0.75, 3.0))
+            with self.subTest(case=case):
+                self.assertMatchesPhp(cues)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for tts_duration: the log location setting and log compaction
+
+Run from storage/scripts:
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tts_duration  # noqa: E402
+from tts_duration import DEFAULT_LOG_PATH, DurationModel, log_path_from_env  # noqa: E402
+
+VOICE = 'vi-VN-HoaiMyNeural'
+TEXTS = ['Xin chào các bạn.', 'Hôm nay, trời đẹp quá!', 'Năm 2024 có 366 ngày.', 'Tạm biệt']
+
+
+class LogPathFromEnvTest(unittest.TestCase):
+
+    def test_default(self):
+        with mock.patch.dict(os.environ, clear=True):
+            self.assertEqual(log_path_from_env(), str(DEFAULT_LOG_PATH))
+
+    def test_false_disables_the_log(self):
+        for value in ('false', 'FALSE', ' False ', ''):
+            with self.subTest(value=value), mock.patch.dict(os.environ, {'TTS_DURATION_LOG': value}):
+                self.assertIsNone(log_path_from_env())
+
+    def test_custom_path(self):
+        with mock.patch.dict(os.environ, {'TTS_DURATION_LOG': '/tmp/durations.jsonl'}):
+            self.assertEqual(log_path_from_env(), '/tmp/durations.jsonl')
+
+
+class CompactionTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name) / 'durations.jsonl'
+
+    def record(self, count):
+        model = DurationModel(self.path)
+        for i in range(count):
+            text = TEXTS[i % len(TEXTS)]
+            model.record(text, VOICE if i % 3 else 'vi-VN-NamMinhNeural', f"{i % 20 - 5:+d}%", 0.8 + (i % 7) * 0.1)
+
+    def test_long_log_is_compacted_without_changing_the_fit(self):
+        with mock.patch.object(tts_duration, 'COMPACT_LINES', 50):
+            self.record(80)
+            full = DurationModel(self.path)
+            expected = [full.predict(text, VOICE) for text in TEXTS]
+            self.assertEqual(len(self.path.read_text().splitlines()), 2)
+
+            compacted = DurationModel(self.path)
+            for text, seconds in zip(TEXTS, expected):
+                self.assertAlmostEqual(compacted.predict(text, VOICE), seconds, places=9)
+            self.assertEqual(compacted.stats()[VOICE]['observations'], full.stats()[VOICE]['observations'])
+
+    def test_lines_appended_after_compaction_are_replayed(self):
+        with mock.patch.object(tts_duration, 'COMPACT_LINES', 50):
+            self.record(60)
+            DurationModel(self.path).load()
+            self.record(4)
+            self.assertEqual(len(self.path.read_text().splitlines()), 6)
+            self.assertEqual(sum(voice['observations'] for voice in DurationModel(self.path).stats().values()), 64)
+
+    def test_short_log_is_left_alone(self):
+        self.record(10)
+        before = self.path.read_bytes()
+        DurationModel(self.path).load()
+        self.assertEqual(self.path.read_bytes(), before)
+
+
+if __name__ == '__main__':
+    unittest.main()
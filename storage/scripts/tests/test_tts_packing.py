@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for tts_packing: grouping, joining and cutting packed audio
+
+Run from storage/scripts:
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mp3_frames import iter_frames  # noqa: E402
+from tts_packing import PackSplitError, join_texts, plan_groups, split_packed  # noqa: E402
+
+# Edge TTS output format: 144-byte frames of 24 ms
+FRAME = bytes.fromhex('fff364c4') + bytes(140)
+FRAME_SECONDS = 0.024
+
+KEY = ('vi-VN-HoaiMyNeural', '+0%')
+
+
+def audio(seconds):
+    return FRAME * round(seconds / FRAME_SECONDS)
+
+
+class PlanGroupsTest(unittest.TestCase):
+
+    def test_groups_consecutive_items_with_the_same_key(self):
+        items = [(KEY, 'a'), (KEY, 'b'), (None, 'c'), (KEY, 'd'), (('other', '+0%'), 'e'), (('other', '+0%'), 'f')]
+        self.assertEqual(plan_groups(items), [[0, 1], [2], [3], [4, 5]])
+
+    def test_long_items_stay_alone(self):
+        items = [(KEY, 'a'), (KEY, 'x' * 400), (KEY, 'b')]
+        self.assertEqual(plan_groups(items, short_chars=300), [[0], [1], [2]])
+
+    def test_limits_split_groups(self):
+        items = [(KEY, 'abcd')] * 5
+        self.assertEqual(plan_groups(items, max_segments=2), [[0, 1], [2, 3], [4]])
+        self.assertEqual(plan_groups(items, max_chars=10), [[0, 1], [2, 3], [4]])
+
+
+class JoinTextsTest(unittest.TestCase):
+
+    def test_adds_missing_full_stops_and_tracks_spans(self):
+        text, spans = join_texts(['  Xin chào ', 'Bạn khỏe không?', 'Tạm biệt'])
+        self.assertEqual(text, 'Xin chào.\nBạn khỏe không?\nTạm biệt.')
+        self.assertEqual([text[start:end] for start, end in spans], ['Xin chào.', 'Bạn khỏe không?', 'Tạm biệt.'])
+
+
+class SplitPackedTest(unittest.TestCase):
+
+    def split(self, texts, words, seconds=1.2):
+        text, spans = join_texts(texts)
+        return split_packed(audio(seconds), words, text, spans)
+
+    def test_cuts_in_the_middle_of_the_pause(self):
+        pieces = self.split(['one two', 'three'], [[0.0, 0.1, 'one'], [0.12, 0.1, 'two'], [0.6, 0.2, 'three']])
+        # Pause from 0.22 to 0.6: the cut lands on the frame boundary nearest 0.41
+        self.assertEqual([piece['duration'] for piece in pieces], [0.408, 0.792])
+        self.assertEqual(pieces[0]['words'], [[0.0, 0.1, 'one'], [0.12, 0.1, 'two']])
+        self.assertEqual(pieces[1]['words'], [[0.192, 0.2, 'three']])
+
+    def test_pieces_are_whole_frames_covering_the_audio(self):
+        pieces = self.split(['one two', 'three'], [[0.0, 0.1, 'one'], [0.12, 0.1, 'two'], [0.6, 0.2, 'three']])
+        self.assertEqual(b''.join(piece['audio'] for piece in pieces), audio(1.2))
+        for piece in pieces:
+            self.assertEqual(len(piece['audio']) % len(FRAME), 0)
+            self.assertEqual(len(list(iter_frames(piece['audio']))), len(piece['audio']) // len(FRAME))
+
+    def test_no_pause_between_segments(self):
+        # The next segment starts mid-frame right where the previous one ends
+        pieces = self.split(['one two', 'three'], [[0.0, 0.1, 'one'], [0.1, 0.2, 'two'], [0.3, 0.2, 'three']])
+        self.assertEqual(sum(piece['duration'] for piece in pieces), 1.2)
+        self.assertEqual(pieces[1]['words'][0][0], 0.0)
+        for piece in pieces:
+            self.assertTrue(all(word[0] >= 0 for word in piece['words']))
+
+    def test_segment_without_word_boundaries_is_rejected(self):
+        # Digits are spoken as words, so '12' never matches a boundary event
+        with self.assertRaises(PackSplitError):
+            self.split(['12', 'done'], [[0.0, 0.2, 'twelve'], [0.5, 0.1, 'done']])
+
+    def test_missing_boundaries_for_the_last_segment_are_rejected(self):
+        with self.assertRaises(PackSplitError):
+            self.split(['one two', 'three'], [[0.0, 0.1, 'one'], [0.12, 0.1, 'two']])
+
+    def test_unmatched_words_are_skipped(self):
+        pieces = self.split(['chapter 12', 'done'],
+                            [[0.0, 0.1, 'chapter'], [0.1, 0.1, 'twelve'], [0.5, 0.1, 'done']])
+        self.assertEqual([len(piece['words']) for piece in pieces], [1, 1])
+
+    def test_repeated_words_go_to_their_own_segment(self):
+        pieces = self.split(['the end', 'the end'],
+                            [[0.0, 0.1, 'the'], [0.1, 0.1, 'end'], [0.6, 0.1, 'the'], [0.7, 0.1, 'end']])
+        self.assertEqual([len(piece['words']) for piece in pieces], [2, 2])
+        self.assertEqual(pieces[1]['words'][0][0], 0.192)
+
+    def test_audio_shorter_than_the_timings_is_rejected(self):
+        with self.assertRaises(PackSplitError):
+            self.split(['one two', 'three'], [[0.0, 0.1, 'one'], [0.12, 0.1, 'two'], [0.6, 0.2, 'three']],
+                       seconds=0.12)
+
+    def test_garbage_between_frames_is_dropped(self):
+        text, spans = join_texts(['one', 'two'])
+        data = audio(0.48) + b'\x00junk' + audio(0.48)
+        pieces = split_packed(data, [[0.0, 0.1, 'one'], [0.6, 0.1, 'two']], text, spans)
+        self.assertEqual(b''.join(piece['audio'] for piece in pieces), audio(0.96))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for tts_scheduler: AIMD limit changes, bounds and retry backoff, with
+the clock, sleep and random source replaced
+
+Run from storage/scripts:
+    python -m unittest discover tests
+"""
+
+import asyncio
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts_scheduler import AdaptiveScheduler  # noqa: E402
+
+
+class Throttled(Exception):
+    pass
+
+
+class FakeClock:
+    """Monotonic clock that only moves when told to"""
+
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class MaxRandom:
+    """uniform() that records its bounds and returns the upper one"""
+
+    def __init__(self):
+        self.bounds = []
+
+    def uniform(self, low, high):
+        self.bounds.append((low, high))
+        return high
+
+
+class AdaptiveSchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        self.rng = MaxRandom()
+        self.sleeps = []
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+
+    def scheduler(self, **kwargs):
+        return AdaptiveScheduler(is_transient=lambda exc: isinstance(exc, Throttled), rng=self.rng,
+                                 sleep=self.sleep, clock=self.clock, **kwargs)
+
+    def call(self, latency=1.0, fail=0):
+        """A call() taking `latency` clock seconds that is throttled on its first `fail` attempts"""
+        attempts = []
+
+        async def attempt():
+            attempts.append(None)
+            self.clock.now += latency
+            if len(attempts) <= fail:
+                raise Throttled()
+            return 'audio'
+        return attempt
+
+    def succeed(self, scheduler, times=1, latency=1.0):
+        for _ in range(times):
+            asyncio.run(scheduler.run(self.call(latency)))
+
+    def throttle(self, scheduler):
+        """One throttled call past the cooldown, without retries"""
+        self.clock.now += 10
+        with self.assertRaises(Throttled):
+            asyncio.run(scheduler.run(self.call(fail=1)))
+
+    def test_success_grows_the_limit_additively(self):
+        scheduler = self.scheduler(initial=4)
+        self.succeed(scheduler)
+        self.assertEqual(scheduler.limit, 4.25)
+        # About +1 per `limit` successes
+        self.succeed(scheduler, times=3)
+        expected = 4.25
+        for _ in range(3):
+            expected += 1 / expected
+        self.assertEqual(scheduler.limit, expected)
+
+    def test_throttling_halves_the_limit(self):
+        scheduler = self.scheduler(initial=8, retries=0)
+        self.throttle(scheduler)
+        self.assertEqual(scheduler.limit, 4.0)
+        self.assertEqual(scheduler.stats()['decreases'], 1)
+
+    def test_failures_within_the_cooldown_count_once(self):
+        scheduler = self.scheduler(initial=8, retries=0)
+        self.throttle(scheduler)
+        with self.assertRaises(Throttled):
+            asyncio.run(scheduler.run(self.call(latency=0.0, fail=1)))
+        self.assertEqual(scheduler.limit, 4.0)
+
+    def test_latency_spike_halves_the_limit(self):
+        scheduler = self.scheduler(initial=8)
+        self.succeed(scheduler, latency=1.0)
+        self.clock.now += 10
+        self.succeed(scheduler, latency=3.0)
+        self.assertEqual(scheduler.limit, 8.125 / 2)
+
+    def test_floor(self):
+        scheduler = self.scheduler(initial=4, min_limit=2, retries=0)
+        for _ in range(5):
+            self.throttle(scheduler)
+        self.assertEqual(scheduler.limit, 2.0)
+
+    def test_ceiling(self):
+        scheduler = self.scheduler(initial=4, max_limit=6)
+        self.succeed(scheduler, times=50)
+        self.assertEqual(scheduler.limit, 6.0)
+
+    def test_initial_limit_is_clamped(self):
+        self.assertEqual(self.scheduler(initial=50, max_limit=10).limit, 10.0)
+        self.assertEqual(self.scheduler(initial=0, min_limit=3).limit, 3.0)
+
+    def test_backoff_stays_within_the_capped_exponential(self):
+        scheduler = self.scheduler(backoff_base=0.5, backoff_cap=5.0)
+        for attempt in range(1, 8):
+            delay = scheduler.backoff(attempt)
+            self.assertEqual(self.rng.bounds[-1], (0, min(5.0, 0.5 * 2 ** attempt)))
+            self.assertLessEqual(delay, 5.0)
+
+    def test_retries_sleep_the_backoff(self):
+        scheduler = self.scheduler(retries=3, backoff_base=0.5, backoff_cap=3.0)
+        result, attempts = asyncio.run(scheduler.run(self.call(latency=0.0, fail=3)))
+        self.assertEqual((result, attempts), ('audio', 4))
+        self.assertEqual(self.sleeps, [1.0, 2.0, 3.0])
+        self.assertEqual(scheduler.stats()['retries'], 3)
+
+    def test_gives_up_after_the_retries(self):
+        scheduler = self.scheduler(retries=2)
+        with self.assertRaises(Throttled):
+            asyncio.run(scheduler.run(self.call(fail=5)))
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertEqual(scheduler.stats()['failed'], 1)
+        self.assertEqual(scheduler.stats()['in_flight'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests for youtube_cache: TTLs, expiry purging, negative caching and
+single-flight fetches
+
+Run from storage/scripts:
+    python -m unittest discover tests
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import youtube_cache  # noqa: E402
+from youtube_cache import DAY, STATUS_ERROR, STATUS_OK, CachedError, ResponseCache  # noqa: E402
+
+
+class NoTranscript(Exception):
+    pass
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache = ResponseCache(tmp.name)
+        self.now = 1_000_000.0
+        patcher = mock.patch.object(youtube_cache, 'time', SimpleNamespace(time=lambda: self.now))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def rows(self):
+        return self.cache.connection().execute('SELECT kind, video_id FROM responses ORDER BY video_id').fetchall()
+
+    def test_put_and_get(self):
+        self.assertIsNone(self.cache.get('transcript', 'abc'))
+        self.cache.put('transcript', 'abc', '[{"text": "hé"}]')
+        self.assertEqual(self.cache.get('transcript', 'abc'), (STATUS_OK, '[{"text": "hé"}]'.encode('utf-8')))
+        self.assertIsNone(self.cache.get('metadata', 'abc'))
+
+    def test_entries_expire_after_their_ttl(self):
+        with mock.patch.dict(youtube_cache.TTLS, {'metadata': DAY}):
+            self.cache.put('metadata', 'abc', b'{}')
+            self.now += DAY - 1
+            self.assertIsNotNone(self.cache.get('metadata', 'abc'))
+            self.now += 1
+            self.assertIsNone(self.cache.get('metadata', 'abc'))
+
+    def test_put_purges_expired_entries(self):
+        with mock.patch.dict(youtube_cache.TTLS, {'metadata': DAY, 'transcript': 30 * DAY}):
+            self.cache.put('metadata', 'old', b'{}')
+            self.cache.put('transcript', 'kept', b'[]')
+            self.now += 2 * DAY
+            self.cache.put('metadata', 'new', b'{}')
+        self.assertEqual(self.rows(), [('transcript', 'kept'), ('metadata', 'new')])
+
+    def test_purge_uses_the_expiry_index(self):
+        plan = self.cache.connection().execute(
+            'EXPLAIN QUERY PLAN DELETE FROM responses WHERE expires_at <= ?', (self.now,)
+        ).fetchall()
+        self.assertIn('responses_expires_at', ' '.join(row[-1] for row in plan))
+
+    def test_fetches_once_and_serves_hits(self):
+        fetch = mock.Mock(return_value='{"title": "x"}')
+        for _ in range(3):
+            self.assertEqual(self.cache.get_or_fetch('metadata', 'abc', fetch), b'{"title": "x"}')
+        fetch.assert_called_once_with()
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 1))
+
+    def test_failures_are_cached_when_negative(self):
+        fetch = mock.Mock(side_effect=NoTranscript('no English transcript'))
+        with self.assertRaises(NoTranscript):
+            self.cache.get_or_fetch('transcript', 'abc', fetch, negative=(NoTranscript,))
+        with self.assertRaisesRegex(CachedError, 'no English transcript'):
+            self.cache.get_or_fetch('transcript', 'abc', fetch, negative=(NoTranscript,))
+        fetch.assert_called_once_with()
+        self.assertEqual(self.cache.get('transcript', 'abc')[0], STATUS_ERROR)
+
+    def test_other_failures_are_not_cached(self):
+        fetch = mock.Mock(side_effect=[ConnectionError('down'), '[]'])
+        with self.assertRaises(ConnectionError):
+            self.cache.get_or_fetch('transcript', 'abc', fetch, negative=(NoTranscript,))
+        self.assertEqual(self.cache.get_or_fetch('transcript', 'abc', fetch), b'[]')
+
+    def test_uncacheable_payloads_are_not_stored(self):
+        fetch = mock.Mock(return_value='[]')
+        self.cache.get_or_fetch('transcript', 'abc', fetch, cacheable=lambda payload: payload != b'[]')
+        self.assertIsNone(self.cache.get('transcript', 'abc'))
+
+
+class SingleFlightTest(unittest.TestCase):
+
+    def test_concurrent_callers_share_one_fetch(self):
+        with tempfile.TemporaryDirectory() as root:
+            cache = ResponseCache(root)
+            calls = []
+            started = threading.Event()
+
+            def fetch():
+                calls.append(threading.get_ident())
+                started.set()
+                # Hold the lock long enough for every other caller to queue on it
+                time.sleep(0.2)
+                return '{"title": "x"}'
+
+            results = []
+
+            def worker():
+                results.append(cache.get_or_fetch('metadata', 'abc', fetch))
+
+            threads = [threading.Thread(target=worker) for _ in range(8)]
+            threads[0].start()
+            started.wait(5)
+            for thread in threads[1:]:
+                thread.start()
+            for thread in threads:
+                thread.join(10)
+
+            self.assertEqual(len(calls), 1)
+            self.assertEqual(results, [b'{"title": "x"}'] * 8)
+            self.assertEqual((cache.hits, cache.misses), (7, 1))
+
+    def test_unrelated_videos_may_share_a_lock_file(self):
+        cache = ResponseCache('/tmp/unused')
+        paths = {cache.lock_path('transcript', f'video{i}') for i in range(2000)}
+        self.assertLessEqual(len(paths), youtube_cache.LOCK_BUCKETS)
+        self.assertEqual(cache.lock_path('metadata', 'abc'), cache.lock_path('metadata', 'abc'))
+
+
+if __name__ == '__main__':
+    unittest.main()
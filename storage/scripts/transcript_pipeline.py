@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Transcript Normalization Pipeline
+Single-pass language filtering, HTML unescaping, NFC normalization and JSON
+serialization of RapidAPI transcript responses, plus the cleaning and
+segmentation of TranscriptCleanerService / TranscriptSegmentationService
+"""
+
+import html
+import json
+import math
+import re
+import unicodedata
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+from json.encoder import encode_basestring
+from operator import add
+
+ARABIC_RE = re.compile(r'[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF]')
+
+# Cues serialized per encode() call; bounds the transient string memory
+SERIALIZE_BLOCK = 4096
+
+# TranscriptCleanerService: collapse whitespace, drop characters TTS trips on
+WHITESPACE_RE = re.compile(r'\s+')
+BRACKETS_RE = re.compile(r'[\[\]()]')
+
+# Words as PHP str_word_count() counts them: letters, apostrophes and hyphens
+WORD_RE = re.compile(r"[A-Za-z'][A-Za-z'-]*")
+
+# TranscriptSegmentationService thresholds
+SEGMENT_GAP = 0.5
+SEGMENT_MAX_WORDS = 80
+SEGMENT_MAX_DURATION = 15.0
+SEGMENT_SENTENCE_WORDS = 20
+
+
+class NoEnglishTranscriptError(Exception):
+    """The video has no English transcript (cached as a negative result)"""
+
+
+def contains_arabic(text):
+    """Check if text contains Arabic characters"""
+    if not text:
+        return False
+    return ARABIC_RE.search(text) is not None
+
+
+def _number(value):
+    """Format a float exactly like json.dumps does"""
+    if math.isfinite(value):
+        return float.__repr__(value)
+    return json.dumps(value)
+
+
+class CompactTranscript:
+    """
+    Transcript cues held as one list of texts plus two float arrays
+
+    Uses a fraction of the memory of a list of {'text', 'start', 'duration'}
+    dicts, and serializes to exactly the JSON that list would produce.
+    """
+
+    __slots__ = ('texts', 'starts', 'durations')
+
+    def __init__(self):
+        self.texts = []
+        self.starts = array('d')
+        self.durations = array('d')
+
+    def append(self, text, start, duration):
+        self.texts.append(text)
+        self.starts.append(start)
+        self.durations.append(duration)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __getitem__(self, index):
+        return {'text': self.texts[index], 'start': self.starts[index], 'duration': self.durations[index]}
+
+    def to_json(self):
+        """
+        Serialize as a JSON array of {"text", "start", "duration"} objects
+
+        Returns:
+            bytearray: UTF-8 JSON, byte-identical to json.dumps(list, ensure_ascii=False)
+        """
+        out = bytearray(b'[')
+        texts, starts, durations = self.texts, self.starts, self.durations
+        for block_start in range(0, len(texts), SERIALIZE_BLOCK):
+            block_end = min(block_start + SERIALIZE_BLOCK, len(texts))
+            if block_start:
+                out += b', '
+            out += ', '.join([
+                '{"text": %s, "start": %s, "duration": %s}' % (
+                    encode_basestring(texts[i]), _number(starts[i]), _number(durations[i])
+                )
+                for i in range(block_start, block_end)
+            ]).encode('utf-8')
+        out += b']'
+        return out
+
+
+def parse_response(raw_data):
+    """
+    Parse a raw RapidAPI response body without an intermediate decoded copy
+
+    Falls back to ISO-8859-1 when the body is not valid UTF-8.
+    """
+    try:
+        return json.loads(raw_data)
+    except UnicodeDecodeError:
+        return json.loads(raw_data.decode('iso-8859-1', errors='replace'))
+
+
+def normalize_items(items, debug_print=None):
+    """
+    Filter, clean and compact transcript items in a single pass
+
+    Items tagged with a language other than English are dropped; when items
+    carry language tags but none is 'en' the transcript is rejected. Each kept
+    item's text is HTML-unescaped, stripped and NFC-normalized, and its start
+    (RapidAPI 'offset') and duration go into float arrays. Processed entries
+    of `items` are released as the pass goes, so peak memory stays close to
+    one copy of the transcript.
+
+    Args:
+        items: List of cue dicts from the response (consumed)
+        debug_print: Optional function for debug messages
+
+    Returns:
+        CompactTranscript
+    """
+    transcript = CompactTranscript()
+    languages = set()
+    current_time = 0.0
+    normalize = unicodedata.normalize
+    unescape = html.unescape
+
+    for index in range(len(items)):
+        item = items[index]
+        items[index] = None
+        if not isinstance(item, dict) or 'text' not in item:
+            continue
+        lang = item.get('lang')
+        if lang is not None:
+            languages.add(lang)
+            if lang != 'en':
+                continue
+
+        # RapidAPI uses 'offset' instead of 'start'
+        start_time = float(item.get('offset', item.get('start', current_time)))
+        duration = float(item.get('duration', 3.0))
+
+        # Decode HTML entities (&#39; -> ', &quot; -> ", etc.)
+        raw_text = item['text']
+        if raw_text is None:
+            raw_text = ''
+        elif not isinstance(raw_text, str):
+            raw_text = str(raw_text)
+        transcript.append(normalize('NFC', unescape(raw_text).strip()), start_time, duration)
+
+        # Track current time for next segment
+        current_time = max(current_time, start_time + duration)
+
+    if debug_print:
+        debug_print(f"DEBUG: Languages in response: {languages}")
+
+    # Only accept English transcripts - reject if no English available
+    if languages and 'en' not in languages:
+        raise NoEnglishTranscriptError(f"Chỉ hỗ trợ transcript tiếng Anh. Video này có: {', '.join(languages)}")
+    if not len(transcript):
+        if languages:
+            raise NoEnglishTranscriptError("Không tìm thấy transcript tiếng Anh")
+        raise Exception("No transcript data found in API response")
+
+    # If language info is missing, enforce English by rejecting Arabic script
+    if not languages and contains_arabic(" ".join(transcript.texts[:10])):
+        raise NoEnglishTranscriptError("Chỉ hỗ trợ transcript tiếng Anh. Transcript hiện tại có ký tự Ả Rập")
+
+    return transcript
+
+
+def normalize_response(response_data, debug_print=None):
+    """
+    Turn a parsed RapidAPI response (a list of cues, or a dict nesting them
+    under 'transcript' or 'subtitles') into a CompactTranscript
+    """
+    if isinstance(response_data, dict) and 'error' in response_data:
+        raise Exception(f"RapidAPI error: {response_data.get('error')}")
+
+    if isinstance(response_data, list):
+        items = response_data
+    elif isinstance(response_data, dict):
+        items = response_data.get('transcript', response_data.get('subtitles', []))
+        if not isinstance(items, list) or not items:
+            raise Exception(f"Unexpected response format from RapidAPI - found dict but no transcript data. Keys: {list(response_data.keys())}")
+    else:
+        raise Exception("No transcript data found in API response")
+
+    if debug_print:
+        debug_print(f"DEBUG: Processing response with {len(items)} items")
+    return normalize_items(items, debug_print)
+
+
+def transcript_from_json(payload):
+    """Rebuild a CompactTranscript from its (possibly cached) JSON serialization"""
+    transcript = CompactTranscript()
+    for item in json.loads(payload):
+        transcript.append(item['text'], item['start'], item['duration'])
+    return transcript
+
+
+def clean_transcript(transcript):
+    """
+    Collapse whitespace, strip brackets and drop empty cues, as
+    TranscriptCleanerService::clean does
+
+    Returns:
+        CompactTranscript: A new transcript; the input is left unchanged
+    """
+    # One regex pass over all texts; NUL is neither whitespace nor a bracket,
+    # so nothing is collapsed or removed across cue boundaries
+    texts = transcript.texts
+    joined = '\0'.join(texts)
+    if joined.count('\0') == max(len(texts) - 1, 0):
+        texts = BRACKETS_RE.sub('', WHITESPACE_RE.sub(' ', joined)).split('\0')
+    else:
+        texts = [BRACKETS_RE.sub('', WHITESPACE_RE.sub(' ', text)) for text in texts]
+    cleaned = CompactTranscript()
+    for text, start, duration in zip(texts, transcript.starts, transcript.durations):
+        text = text.strip()
+        if text:
+            cleaned.append(text, start, duration)
+    return cleaned
+
+
+def segment_transcript(transcript, gap=SEGMENT_GAP, max_words=SEGMENT_MAX_WORDS,
+                       max_duration=SEGMENT_MAX_DURATION, sentence_words=SEGMENT_SENTENCE_WORDS,
+                       entries=False):
+    """
+    Group cleaned cues into dubbing segments, as TranscriptSegmentationService::segment does
+
+    A segment ends at the first cue that is followed by a silence longer than
+    `gap`, that ends a sentence once the segment has `sentence_words` words,
+    or that brings the segment to `max_words` words or `max_duration` seconds.
+    Rather than walking every cue, the per-cue gaps, word counts and sentence
+    ends are computed column-wise up front and each boundary is found by
+    bisecting their running totals, so the loop runs once per segment.
+
+    Args:
+        transcript: Cleaned CompactTranscript
+        gap: Silence (seconds) between cues that always starts a new segment
+        max_words: Word count that closes a segment
+        max_duration: Summed cue duration (seconds) that closes a segment
+        sentence_words: Words a segment needs before a sentence end may close it
+        entries: Include each segment's cues under 'entries', as the PHP service does
+
+    Returns:
+        list: {"text", "start_time", "end_time", "duration"[, "entries"]} dicts
+    """
+    texts, starts, durations = transcript.texts, transcript.starts, transcript.durations
+    count = len(texts)
+    if not count:
+        return []
+
+    ends = list(map(add, starts, durations))
+    # Cue i is followed by a gap when the next cue starts more than `gap` after it ends
+    gap_after = [i for i, (end, next_start) in enumerate(zip(ends, starts[1:])) if next_start - end > gap]
+    sentence_ends = [i for i, text in enumerate(texts) if text.endswith(('.', '!', '?'))]
+    # Running totals before each cue; durations are clamped so the sums stay sorted
+    word_totals = list(accumulate(map(len, map(WORD_RE.findall, texts)), initial=0))
+    duration_totals = list(accumulate((max(d, 0.0) for d in durations), initial=0.0))
+
+    def first_reaching(totals, first, threshold):
+        """Index of the first cue at which the running total since `first` reaches threshold"""
+        return bisect_left(totals, totals[first] + threshold, first + 1) - 1
+
+    segments = []
+    first = 0
+    segment_start = 0.0  # The first segment always starts at 0, not at its first cue
+    while first < count:
+        last = count - 1
+        index = bisect_left(gap_after, first)
+        if index < len(gap_after):
+            last = min(last, gap_after[index])
+        last = min(last, first_reaching(word_totals, first, max_words),
+                   first_reaching(duration_totals, first, max_duration))
+        index = bisect_left(sentence_ends, max(first, first_reaching(word_totals, first, sentence_words)))
+        if index < len(sentence_ends):
+            last = min(last, sentence_ends[index])
+
+        # Finalized segments end where the next cue starts if that is earlier
+        end = ends[last] if last == count - 1 else min(ends[last], starts[last + 1])
+        segment = {
+            'text': ' '.join(texts[first:last + 1]),
+            'start_time': segment_start,
+            'end_time': end,
+            'duration': max(0.0, end - segment_start),
+        }
+        if entries:
+            segment['entries'] = [transcript[i] for i in range(first, last + 1)]
+        segments.append(segment)
+
+        first = last + 1
+        if first < count:
+            segment_start = starts[first]
+    return segments
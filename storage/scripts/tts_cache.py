@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TTS Audio Cache
+Content-addressed on-disk cache of synthesized audio, bounded by total size
+with least-recently-used eviction
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import unicodedata
+from pathlib import Path
+
+from mp3_frames import FrameCounter
+
+# Edge TTS always returns this format; it is part of the key so a future format
+# change can never serve stale audio
+OUTPUT_FORMAT = 'audio-24khz-48kbitrate-mono-mp3'
+
+DEFAULT_CACHE_DIR = Path(__file__).parent.parent / 'app' / 'tts_cache'
+DEFAULT_MAX_MB = 2048
+
+# A process that has not walked the cache itself only walks it when no process
+# has done so for this many seconds
+EVICT_INTERVAL = 60
+
+# Eviction frees down to this fraction of max_bytes, so a full cache is walked
+# once per tenth of its size written rather than on every store
+EVICT_TARGET = 0.9
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Mode open() would give a new file; mkstemp's 0600 would hide audio from PHP
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+FILE_MODE = 0o666 & ~_UMASK
+
+
+def normalize_text(text):
+    """NFC-normalize text and collapse whitespace so trivial edits still hit"""
+    return _WHITESPACE_RE.sub(' ', unicodedata.normalize('NFC', text)).strip()
+
+
+def cache_key(text, voice, rate, output_format=OUTPUT_FORMAT, variant=None):
+    """
+    Hash the inputs that determine the synthesized audio
+
+    Args:
+        text: Text to synthesize
+        voice: Voice name, e.g. vi-VN-HoaiMyNeural
+        rate: Edge TTS rate string, e.g. +10%
+        output_format: Audio output format requested from the service
+        variant: How the audio was produced when not by a request of its own,
+                 e.g. 'packed' for a piece cut from a packed request
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    parts = [normalize_text(text), voice.strip(), rate.replace(' ', ''), output_format]
+    if variant:
+        parts.append(variant)
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+def temp_file(directory, prefix='.tts-', suffix='.tmp'):
+    """
+    Create a temp file in directory for an atomic rename onto a final path
+
+    Returns:
+        tuple: (open file descriptor, path), the file having the usual new-file mode
+    """
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=prefix, suffix=suffix)
+    os.chmod(tmp, FILE_MODE)
+    return fd, tmp
+
+
+def copy_atomic(src, dst):
+    """
+    Atomically place a private copy of src at dst
+
+    Never hard-links: callers reuse and rewrite their output paths, and a
+    shared inode would let that rewrite change a cache entry under its key.
+    """
+    dst = Path(dst)
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = temp_file(dst.parent)
+    os.close(fd)
+    try:
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def write_json_atomic(path, data):
+    """Write data as compact JSON through a temp file and rename"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = temp_file(path.parent)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def measure_file(path):
+    """Duration of an MP3 file computed from its frame headers"""
+    counter = FrameCounter()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(65536), b''):
+            counter.feed(block)
+    return round(counter.duration, 3)
+
+
+class TtsCache:
+    """
+    Size-bounded LRU cache of MP3 files keyed by cache_key()
+
+    Entries live at <root>/<key[:2]>/<key>.mp3 with the duration and word
+    timings of the audio in a <key>.json sidecar. Recency is tracked through the
+    entry mtime, which is refreshed on every hit, so several processes can share
+    one cache directory without a separate index.
+
+    Stores do not walk the cache. A process keeps a running total from its
+    last walk and walks again only once that total exceeds max_bytes. Until it
+    has walked, it walks only when the shared <root>/.evicted stamp shows that
+    no process has walked for EVICT_INTERVAL seconds, so a one-shot process
+    pays a single stat per store.
+    """
+
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Bytes in the cache as of this process's last walk plus its own stores since
+        self.total = None
+
+    def path_for(self, key):
+        return self.root / key[:2] / f"{key}.mp3"
+
+    def fetch(self, key, out):
+        """
+        Place the cached audio for key at out
+
+        Args:
+            key: Digest from cache_key(), or a list of digests tried in order
+            out: Destination path, or a binary file object to copy the audio into
+
+        Returns:
+            dict: Cached {'duration', 'words'} on a hit, None when the entry is missing
+        """
+        for entry in map(self.path_for, [key] if isinstance(key, str) else key):
+            try:
+                if hasattr(out, 'write'):
+                    with open(entry, 'rb') as f:
+                        shutil.copyfileobj(f, out)
+                else:
+                    copy_atomic(entry, out)
+                os.utime(entry)
+                break
+            except FileNotFoundError:
+                continue
+        else:
+            self.misses += 1
+            return None
+        self.hits += 1
+
+        try:
+            with open(entry.with_suffix('.json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            # Entry written before timings were cached: word timings are unknown
+            return {'duration': measure_file(entry), 'words': []}
+
+    def store(self, key, src, info=None, move=False):
+        """
+        Add a freshly synthesized file to the cache and enforce the size bound
+
+        Args:
+            key: Digest from cache_key()
+            src: Audio file to add; copied, so the caller keeps its own file
+            info: Optional {'duration', 'words'} written to the sidecar
+            move: src is a private temp file under the cache root; rename it
+                  into place instead of copying
+        """
+        entry = self.path_for(key)
+        try:
+            replaced = entry.stat().st_size
+        except FileNotFoundError:
+            replaced = 0
+        if info is not None:
+            write_json_atomic(entry.with_suffix('.json'), info)
+        if move:
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(src, entry)
+        else:
+            copy_atomic(src, entry)
+
+        if self.total is not None:
+            self.total += entry.stat().st_size - replaced
+            if self.total > self.max_bytes:
+                self.evict()
+        elif self.walk_due():
+            self.evict()
+
+    def walk_due(self):
+        """Whether no process has walked the cache within EVICT_INTERVAL seconds"""
+        try:
+            return time.time() - (self.root / '.evicted').stat().st_mtime >= EVICT_INTERVAL
+        except FileNotFoundError:
+            return True
+
+    def entries(self):
+        """List (mtime, size, path) for every cached file, oldest first"""
+        found = []
+        if not self.root.exists():
+            return found
+        for entry in self.root.glob('*/*.mp3'):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            found.append((stat.st_mtime, stat.st_size, entry))
+        found.sort()
+        return found
+
+    def evict(self):
+        """
+        Walk the cache and, once it exceeds max_bytes, remove least recently
+        used entries until it is back under EVICT_TARGET of that
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        (self.root / '.evicted').touch()
+        target = self.max_bytes * EVICT_TARGET if total > self.max_bytes else self.max_bytes
+        for _, size, entry in entries:
+            if total <= target:
+                break
+            try:
+                entry.unlink()
+                self.evictions += 1
+            except FileNotFoundError:
+                pass
+            try:
+                entry.with_suffix('.json').unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+        self.total = total
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TTS Duration Model
+Predicts how long a voice takes to speak a text from simple text features
+(syllables, digits, pauses) and picks the Edge TTS rate that makes the first
+synthesis fit a target slot; it learns per voice from every generated file
+"""
+
+import json
+import os
+import re
+import threading
+import unicodedata
+from pathlib import Path
+
+from tts_cache import temp_file
+
+DEFAULT_LOG_PATH = Path(__file__).parent.parent / 'app' / 'tts_durations.jsonl'
+
+FEATURES = ('syllables', 'digits', 'minor_pauses', 'major_pauses')
+
+# Seconds per feature unit (and a constant) at rate +0% before any data is seen
+DEFAULT_WEIGHTS = (0.2, 0.35, 0.25, 0.45, 0.2)
+
+# How many observations' worth of weight the prior carries in a fit
+PRIOR_STRENGTH = 4.0
+
+# A log longer than this is compacted into one line of sums per voice on load
+COMPACT_LINES = 2000
+
+MIN_RATE = -50
+MAX_RATE = 100
+
+WORD_RE = re.compile(r'[^\W\d_]+|\d+')
+VOWEL_RUN_RE = re.compile(r'[aeiouy]+')
+DECIMAL_RE = re.compile(r'(?<=\d)[.,](?=\d)')
+MINOR_PAUSE_RE = re.compile(r'[,;:()–—]|\s-\s')
+MAJOR_PAUSE_RE = re.compile(r'[.!?…]+|\n+')
+RATE_RE = re.compile(r'^\s*([+-]?\d+(?:\.\d+)?)\s*%\s*$')
+
+
+def text_features(text):
+    """
+    Count what drives spoken duration
+
+    Syllables are vowel groups of each word with diacritics stripped, which
+    gives one per Vietnamese word and a close count for English.
+
+    Returns:
+        tuple: (syllables, digits, minor_pauses, major_pauses)
+    """
+    plain = unicodedata.normalize('NFD', text.replace('đ', 'd').replace('Đ', 'D'))
+    plain = ''.join(c for c in plain if not unicodedata.combining(c)).lower()
+
+    syllables = digits = 0
+    for word in WORD_RE.findall(plain):
+        if word.isdigit():
+            digits += len(word)
+        else:
+            syllables += max(1, len(VOWEL_RUN_RE.findall(word)))
+
+    punctuation = DECIMAL_RE.sub('', text.strip())
+    return (
+        syllables,
+        digits,
+        len(MINOR_PAUSE_RE.findall(punctuation)),
+        len(MAJOR_PAUSE_RE.findall(punctuation)),
+    )
+
+
+def log_path_from_env():
+    """Duration log path from TTS_DURATION_LOG (default DEFAULT_LOG_PATH); None when set to 'false'"""
+    path = os.getenv('TTS_DURATION_LOG', str(DEFAULT_LOG_PATH))
+    return None if path.strip().lower() in ('', 'false') else path
+
+
+def parse_rate(rate):
+    """Edge TTS rate string ('+10%', '-5%') as a percentage"""
+    match = RATE_RE.match(str(rate or '+0%'))
+    if not match:
+        raise ValueError(f"Invalid rate: {rate!r} (expected e.g. +10% or -5%)")
+    return float(match.group(1))
+
+
+def format_rate(percent):
+    return f"{int(round(percent)):+d}%"
+
+
+def solve(matrix, vector):
+    """Solve a small dense linear system by Gaussian elimination with partial pivoting"""
+    size = len(vector)
+    rows = [list(matrix[i]) + [vector[i]] for i in range(size)]
+    for col in range(size):
+        pivot = max(range(col, size), key=lambda r: abs(rows[r][col]))
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        for r in range(col + 1, size):
+            factor = rows[r][col] / rows[col][col]
+            for c in range(col, size + 1):
+                rows[r][c] -= factor * rows[col][c]
+    solution = [0.0] * size
+    for r in range(size - 1, -1, -1):
+        solution[r] = (rows[r][size] - sum(rows[r][c] * solution[c] for c in range(r + 1, size))) / rows[r][r]
+    return solution
+
+
+class Stats:
+    """Sufficient statistics of a least-squares fit: X'X, X'y and a count"""
+
+    __slots__ = ('xtx', 'xty', 'count')
+
+    def __init__(self):
+        size = len(FEATURES) + 1
+        self.xtx = [[0.0] * size for _ in range(size)]
+        self.xty = [0.0] * size
+        self.count = 0
+
+    def add(self, x, y):
+        for i, xi in enumerate(x):
+            self.xty[i] += xi * y
+            row = self.xtx[i]
+            for j, xj in enumerate(x):
+                row[j] += xi * xj
+        self.count += 1
+
+    def merge(self, xtx, xty, count):
+        for i, row in enumerate(xtx):
+            self.xty[i] += xty[i]
+            for j, value in enumerate(row):
+                self.xtx[i][j] += value
+        self.count += count
+
+    def fit(self, prior):
+        """Ridge fit shrunk toward prior: (X'X + kI) w = X'y + k prior"""
+        size = len(prior)
+        matrix = [[self.xtx[i][j] + (PRIOR_STRENGTH if i == j else 0.0) for j in range(size)] for i in range(size)]
+        vector = [self.xty[i] + PRIOR_STRENGTH * prior[i] for i in range(size)]
+        return solve(matrix, vector)
+
+
+class DurationModel:
+    """
+    Per-voice linear duration model backed by an append-only JSONL log
+
+    Each synthesized file adds one line (voice, rate, features, duration);
+    loading replays the log into sufficient statistics, so fitting costs the
+    same no matter how much history there is. The log is only replayed once a
+    prediction is needed: recording just appends, so processes that never
+    predict never read it. Once it grows past COMPACT_LINES, load() rewrites
+    it as those statistics, one line per voice, so replay time stays bounded.
+    Voices with little data borrow strength from other voices of the same
+    language.
+    """
+
+    def __init__(self, path=DEFAULT_LOG_PATH):
+        self.path = Path(path) if path else None
+        self.lock = threading.Lock()
+        self.voices = {}
+        self.languages = {}
+        self.weights = {}
+        self.loaded = False
+
+    def load(self):
+        if self.loaded:
+            return
+        self.loaded = True
+        if not self.path or not self.path.exists():
+            return
+        lines = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                lines += 1
+                try:
+                    entry = json.loads(line)
+                    if 'xtx' in entry:
+                        self.observe_sums(entry['voice'], entry['xtx'], entry['xty'], entry['count'])
+                    else:
+                        self.observe(entry['voice'], parse_rate(entry['rate']), entry['features'], entry['duration'])
+                except (ValueError, KeyError, TypeError, IndexError):
+                    # A torn or hand-edited line must not take the model down
+                    continue
+            if lines > COMPACT_LINES:
+                self.compact(f)
+
+    def compact(self, log):
+        """
+        Replace the log with one line of sufficient statistics per voice
+
+        log is the replayed log, still open: lines other processes appended
+        since are copied over from it. One appended in the instant between that
+        copy and the rename is lost, which costs the fit a single observation.
+        """
+        fd, tmp = temp_file(self.path.parent, prefix='.durations-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                for voice, stats in sorted(self.voices.items()):
+                    line = {'voice': voice, 'count': stats.count, 'xtx': stats.xtx, 'xty': stats.xty}
+                    out.write(json.dumps(line).encode('utf-8') + b"\n")
+                out.write(log.read())
+            os.replace(tmp, self.path)
+        except OSError:
+            # Compaction only saves time; the full log still loads next run
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+
+    def observe(self, voice, rate_percent, features, duration):
+        """Add one observation, normalized to rate +0%"""
+        x = list(features) + [1.0]
+        y = float(duration) * (1 + rate_percent / 100)
+        self.voices.setdefault(voice, Stats()).add(x, y)
+        self.languages.setdefault(voice.split('-')[0], Stats()).add(x, y)
+        self.weights.clear()
+
+    def observe_sums(self, voice, xtx, xty, count):
+        """Add the statistics of a compacted log line"""
+        size = len(FEATURES) + 1
+        if len(xtx) != size or len(xty) != size or any(len(row) != size for row in xtx):
+            raise ValueError("statistics of the wrong size")
+        self.voices.setdefault(voice, Stats()).merge(xtx, xty, count)
+        self.languages.setdefault(voice.split('-')[0], Stats()).merge(xtx, xty, count)
+        self.weights.clear()
+
+    def voice_weights(self, voice):
+        with self.lock:
+            self.load()
+            weights = self.weights.get(voice)
+            if weights is None:
+                prior = list(DEFAULT_WEIGHTS)
+                language = self.languages.get(voice.split('-')[0])
+                if language:
+                    prior = language.fit(prior)
+                stats = self.voices.get(voice)
+                weights = stats.fit(prior) if stats else prior
+                self.weights[voice] = weights
+            return weights
+
+    def predict(self, text, voice, rate='+0%'):
+        """Predicted spoken duration in seconds of text at rate"""
+        weights = self.voice_weights(voice)
+        x = list(text_features(text)) + [1.0]
+        base = max(0.0, sum(w * xi for w, xi in zip(weights, x)))
+        return base / (1 + parse_rate(rate) / 100)
+
+    def pick_rate(self, text, voice, target_duration, base_rate='+0%', tolerance=0.05):
+        """
+        Choose the rate whose predicted duration matches target_duration
+
+        base_rate is kept when its prediction is already within tolerance.
+
+        Returns:
+            tuple: (rate string, predicted duration at that rate)
+        """
+        if target_duration <= 0:
+            raise ValueError("target_duration must be positive")
+        predicted = self.predict(text, voice, base_rate)
+        if abs(predicted / target_duration - 1) <= tolerance:
+            return base_rate, predicted
+        natural = self.predict(text, voice)
+        percent = max(MIN_RATE, min(MAX_RATE, round((natural / target_duration - 1) * 100)))
+        return format_rate(percent), natural / (1 + percent / 100)
+
+    def record(self, text, voice, rate, duration):
+        """
+        Append a generated file to the log
+
+        Once the log has been loaded the observation is also learned in memory;
+        before that it is left to whichever later load() replays the log.
+        """
+        features = text_features(text)
+        rate_percent = parse_rate(rate)
+        line = json.dumps({
+            'voice': voice,
+            'rate': format_rate(rate_percent),
+            'features': features,
+            'duration': round(duration, 3),
+        }) + "\n"
+        # Under the lock a concurrent load() sees the line either replayed or observed, never both
+        with self.lock:
+            if self.loaded or not self.path:
+                self.observe(voice, rate_percent, features, duration)
+            if not self.path:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # One short O_APPEND write per line keeps concurrent writers from interleaving
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line.encode('utf-8'))
+            finally:
+                os.close(fd)
+
+    def stats(self):
+        """Observation counts and fitted weights per voice"""
+        self.load()
+        return {
+            voice: {
+                'observations': stats.count,
+                'weights': dict(zip(FEATURES + ('constant',), (round(w, 4) for w in self.voice_weights(voice)))),
+            }
+            for voice, stats in sorted(self.voices.items())
+        }
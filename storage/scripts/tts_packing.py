@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+TTS Segment Packing
+Joins consecutive short segments into one synthesis request and cuts the
+returned MP3 back into per-segment pieces using WordBoundary timings
+"""
+
+import bisect
+import re
+
+from mp3_frames import id3v2_size, iter_frames
+
+# Segments are joined on separate lines so each keeps its own sentence prosody
+PACK_SEPARATOR = "\n"
+
+DEFAULT_PACK_CHARS = 1500
+DEFAULT_PACK_SEGMENTS = 25
+
+# Only segments up to this long are worth packing
+DEFAULT_SHORT_CHARS = 300
+
+SENTENCE_END_RE = re.compile(r'[.!?…]["\'”’)\]]*$')
+
+
+class PackSplitError(ValueError):
+    """The packed audio could not be attributed to its segments reliably"""
+
+
+def plan_groups(items, max_chars=DEFAULT_PACK_CHARS, max_segments=DEFAULT_PACK_SEGMENTS,
+                short_chars=DEFAULT_SHORT_CHARS):
+    """
+    Group consecutive packable items that share a voice and rate
+
+    Args:
+        items: (key, text) pairs in manifest order; key is (voice, rate), or
+               None for items that must be synthesized on their own
+
+    Returns:
+        list: Lists of item indexes; single-item lists are not packed
+    """
+    groups = []
+    current, current_key, current_chars = [], None, 0
+    for index, (key, text) in enumerate(items):
+        packable = key is not None and len(text) <= short_chars
+        if current and (not packable or key != current_key or current_chars + len(text) > max_chars
+                        or len(current) >= max_segments):
+            groups.append(current)
+            current, current_chars = [], 0
+        if not packable:
+            groups.append([index])
+            continue
+        current.append(index)
+        current_key = key
+        current_chars += len(text) + len(PACK_SEPARATOR)
+    if current:
+        groups.append(current)
+    return groups
+
+
+def join_texts(texts):
+    """
+    Join segment texts into one request
+
+    Segments without closing punctuation get a full stop, so the voice pauses
+    between them as it does at the end of a separate request.
+
+    Returns:
+        tuple: (joined text, [(start, end) character span of each segment])
+    """
+    parts, spans, pos = [], [], 0
+    for text in texts:
+        text = text.strip()
+        if not SENTENCE_END_RE.search(text):
+            text += '.'
+        if parts:
+            pos += len(PACK_SEPARATOR)
+        spans.append((pos, pos + len(text)))
+        parts.append(text)
+        pos += len(text)
+    return PACK_SEPARATOR.join(parts), spans
+
+
+def assign_words(words, joined, spans):
+    """
+    Attribute each [offset, duration, text] boundary event to a segment
+
+    Words are located in the joined text in order; events whose text cannot be
+    found (e.g. expanded numbers) are skipped.
+
+    Raises:
+        PackSplitError: When a segment ends up without any word
+    """
+    lowered = joined.lower()
+    starts = [span[0] for span in spans]
+    per_segment = [[] for _ in spans]
+    cursor = 0
+    for word in words:
+        text = (word[2] or '').lower()
+        pos = lowered.find(text, cursor) if text else -1
+        if pos < 0:
+            continue
+        cursor = pos + len(text)
+        per_segment[bisect.bisect_right(starts, pos) - 1].append(word)
+
+    missing = [i for i, segment_words in enumerate(per_segment) if not segment_words]
+    if missing:
+        raise PackSplitError(f"no word boundaries for packed segment(s) {missing}")
+    return per_segment
+
+
+def split_packed(audio, words, joined, spans):
+    """
+    Cut packed MP3 audio into one piece per segment
+
+    Each cut falls on the frame boundary nearest the middle of the pause
+    between two segments, so frames are copied untouched and any bit-reservoir
+    artefact of a cut lands in silence. Without a pause the cut can fall in
+    the frame where the next segment's first word starts; that word then
+    starts the piece, at offset 0.
+
+    Returns:
+        list: {'audio': bytes, 'duration': seconds, 'words': [[offset, duration, text], ...]}
+              per segment, word offsets relative to the piece
+    """
+    per_segment = assign_words(words, joined, spans)
+    cuts = [
+        (segment[-1][0] + segment[-1][1] + following[0][0]) / 2
+        for segment, following in zip(per_segment, per_segment[1:])
+    ]
+
+    pieces = [bytearray() for _ in spans]
+    samples = [0] * len(spans)
+    starts = [None] * len(spans)
+    elapsed = 0
+    piece = 0
+    for pos, (length, frame_samples, sample_rate, _) in iter_frames(audio, id3v2_size(audio[:10])):
+        middle = (elapsed + frame_samples / 2) / sample_rate
+        while piece < len(cuts) and middle >= cuts[piece]:
+            piece += 1
+        if starts[piece] is None:
+            starts[piece] = elapsed / sample_rate
+        pieces[piece] += audio[pos:pos + length]
+        samples[piece] += frame_samples
+        elapsed += frame_samples
+
+    if any(start is None for start in starts):
+        raise PackSplitError("packed audio is shorter than its word timings")
+    return [
+        {
+            'audio': bytes(pieces[i]),
+            'duration': round(samples[i] / sample_rate, 3),
+            'words': [[max(0.0, round(w[0] - starts[i], 3)), w[1], w[2]] for w in per_segment[i]],
+        }
+        for i in range(len(spans))
+    ]
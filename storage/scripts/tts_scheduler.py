@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Adaptive TTS Scheduler
+AIMD concurrency control and jittered retries for calls to a rate-limited service
+"""
+
+import asyncio
+import random
+import time
+
+from script_metrics import metrics
+
+DEFAULT_MIN_LIMIT = 1
+DEFAULT_MAX_LIMIT = 16
+DEFAULT_RETRIES = 4
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_CAP = 20.0
+
+# A call this many times slower (per unit of cost) than the best seen counts
+# as a congestion signal, like an error
+LATENCY_TOLERANCE = 2.5
+
+# Weight of the newest sample in the moving averages
+EWMA_WEIGHT = 0.2
+
+
+class AdaptiveScheduler:
+    """
+    Run coroutines under a concurrency limit that adapts to the service
+
+    The limit grows additively (about +1 per limit successful calls) while calls
+    succeed at normal speed, and halves on a transient error or a latency spike,
+    at most once per cooldown so a burst of failures counts as one signal.
+    Transient failures are retried with full-jitter exponential backoff.
+
+    The random source (anything with uniform()), sleep coroutine and monotonic
+    clock can be replaced, which makes the scheduler deterministic in tests.
+    """
+
+    def __init__(self, initial=4, min_limit=DEFAULT_MIN_LIMIT, max_limit=DEFAULT_MAX_LIMIT,
+                 retries=DEFAULT_RETRIES, is_transient=None,
+                 backoff_base=DEFAULT_BACKOFF_BASE, backoff_cap=DEFAULT_BACKOFF_CAP,
+                 rng=None, sleep=asyncio.sleep, clock=time.monotonic):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial, self.min_limit), self.max_limit))
+        self.retries = retries
+        self.is_transient = is_transient or (lambda exc: False)
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.rng = rng or random.Random()
+        self.sleep = sleep
+        self.clock = clock
+
+        self.in_flight = 0
+        self.condition = asyncio.Condition()
+        self.last_decrease = 0.0
+        self.best_latency = None
+        self.latency_ewma = None
+        self.error_rate = 0.0
+        self.counters = {
+            'calls': 0,
+            'succeeded': 0,
+            'failed': 0,
+            'transient_errors': 0,
+            'retries': 0,
+            'decreases': 0,
+        }
+
+    async def _acquire(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def _release(self):
+        async with self.condition:
+            self.in_flight -= 1
+            self.condition.notify_all()
+
+    def _decrease(self):
+        now = self.clock()
+        cooldown = self.latency_ewma or 1.0
+        if now - self.last_decrease < cooldown:
+            return
+        self.last_decrease = now
+        self.limit = max(float(self.min_limit), self.limit / 2)
+        self.counters['decreases'] += 1
+
+    def _observe(self, ok, latency=None, cost=0.0):
+        self.error_rate += EWMA_WEIGHT * ((0.0 if ok else 1.0) - self.error_rate)
+        if not ok:
+            self._decrease()
+            return
+
+        # Every call carries a fixed overhead worth one unit of cost
+        normalized = latency / (1 + cost)
+        if self.best_latency is None or normalized < self.best_latency:
+            self.best_latency = normalized
+        if self.latency_ewma is None:
+            self.latency_ewma = latency
+        else:
+            self.latency_ewma += EWMA_WEIGHT * (latency - self.latency_ewma)
+
+        if normalized > self.best_latency * LATENCY_TOLERANCE:
+            self._decrease()
+        else:
+            self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+
+    def backoff(self, attempt):
+        """Full-jitter delay before retry number attempt (1-based)"""
+        return self.rng.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+
+    async def run(self, call, cost=0.0):
+        """
+        Run call() under the adaptive limit, retrying transient failures
+
+        Args:
+            call: Zero-argument function returning a fresh coroutine per attempt
+            cost: Size of the work relative to the fixed per-call overhead, used
+                  to compare latencies of calls of different sizes
+
+        Returns:
+            tuple: (result of call(), number of attempts made)
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            with metrics.phase('queue_wait'):
+                await self._acquire()
+            self.counters['calls'] += 1
+            start = self.clock()
+            try:
+                result = await call()
+            except Exception as e:
+                transient = self.is_transient(e)
+                if transient:
+                    self.counters['transient_errors'] += 1
+                    self._observe(False)
+                await self._release()
+                if not transient or attempt > self.retries:
+                    self.counters['failed'] += 1
+                    raise
+                self.counters['retries'] += 1
+                metrics.count('retries')
+                with metrics.phase('backoff'):
+                    await self.sleep(self.backoff(attempt))
+                continue
+            except BaseException:
+                await self._release()
+                raise
+
+            self._observe(True, self.clock() - start, cost)
+            self.counters['succeeded'] += 1
+            await self._release()
+            return result, attempt
+
+    def stats(self):
+        """Current limits, error rate and counters"""
+        return dict(
+            self.counters,
+            limit=round(self.limit, 2),
+            min_limit=self.min_limit,
+            max_limit=self.max_limit,
+            in_flight=self.in_flight,
+            error_rate=round(self.error_rate, 4),
+            latency_ewma=round(self.latency_ewma, 3) if self.latency_ewma is not None else None,
+        )
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+YouTube Response Cache
+SQLite cache of transcript/metadata responses shared by the fetcher scripts,
+with per-kind TTLs, negative caching and cross-process single-flight fetches
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from script_metrics import metrics
+
+DEFAULT_CACHE_DIR = Path(__file__).parent.parent / 'app' / 'youtube_cache'
+
+DAY = 86400
+
+# Seconds a successful response stays fresh, per kind of response
+TTLS = {
+    'transcript': int(os.getenv('YOUTUBE_CACHE_TTL_TRANSCRIPT', 30 * DAY)),
+    'metadata': int(os.getenv('YOUTUBE_CACHE_TTL_METADATA', DAY)),
+}
+
+# Seconds a cached failure (e.g. no English transcript) is served before retrying
+NEGATIVE_TTL = int(os.getenv('YOUTUBE_CACHE_TTL_NEGATIVE', DAY))
+
+# Unrelated videos share one of this many lock files
+LOCK_BUCKETS = 256
+
+STATUS_OK = 'ok'
+STATUS_ERROR = 'error'
+
+
+class CachedError(Exception):
+    """A failure served from the negative cache"""
+
+
+def cache_enabled():
+    """Whether the response cache is on (disable with YOUTUBE_CACHE=false)"""
+    return os.getenv('YOUTUBE_CACHE', 'true').lower() != 'false'
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on path, blocking until other processes release it"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'a+b') as f:
+        if os.name == 'nt':
+            import msvcrt
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    # LK_LOCK gives up after about 10 seconds; keep waiting
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class ResponseCache:
+    """
+    Cache of serialized JSON responses keyed by (kind, video_id)
+
+    Payloads are stored as the exact UTF-8 bytes the script prints, so a hit is
+    written straight to stdout without being parsed or re-encoded.
+    """
+
+    def __init__(self, root=DEFAULT_CACHE_DIR):
+        self.root = Path(root)
+        self.db_path = self.root / 'responses.sqlite3'
+        self.local = threading.local()
+        self.hits = 0
+        self.misses = 0
+
+    def connection(self):
+        """Per-thread SQLite connection (batch fetches run in worker threads)"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                ' kind TEXT NOT NULL,'
+                ' video_id TEXT NOT NULL,'
+                ' status TEXT NOT NULL,'
+                ' payload BLOB NOT NULL,'
+                ' fetched_at REAL NOT NULL,'
+                ' expires_at REAL NOT NULL,'
+                ' PRIMARY KEY (kind, video_id))'
+            )
+            # put() purges expired rows on every write; without this it scans the table
+            conn.execute('CREATE INDEX IF NOT EXISTS responses_expires_at ON responses (expires_at)')
+            self.local.conn = conn
+        return conn
+
+    def get(self, kind, video_id):
+        """
+        Look up a fresh entry
+
+        Returns:
+            tuple: (status, payload bytes), or None when missing or expired
+        """
+        row = self.connection().execute(
+            'SELECT status, payload FROM responses WHERE kind = ? AND video_id = ? AND expires_at > ?',
+            (kind, video_id, time.time()),
+        ).fetchone()
+        return row
+
+    def put(self, kind, video_id, payload, status=STATUS_OK):
+        now = time.time()
+        ttl = TTLS.get(kind, DAY) if status == STATUS_OK else NEGATIVE_TTL
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        conn = self.connection()
+        conn.execute(
+            'INSERT OR REPLACE INTO responses (kind, video_id, status, payload, fetched_at, expires_at)'
+            ' VALUES (?, ?, ?, ?, ?, ?)',
+            (kind, video_id, status, payload, now, now + ttl),
+        )
+        conn.execute('DELETE FROM responses WHERE expires_at <= ?', (now,))
+
+    def lock_path(self, kind, video_id):
+        digest = hashlib.sha1(f"{kind}:{video_id}".encode('utf-8')).digest()
+        return self.root / 'locks' / f"{digest[0] % LOCK_BUCKETS:02x}.lock"
+
+    def get_or_fetch(self, kind, video_id, fetch, negative=(), cacheable=None):
+        """
+        Return the cached payload, or fetch it once across all processes
+
+        Concurrent callers asking for the same video wait on a lock file; the
+        first one fetches and stores the response, the others then read it.
+
+        Args:
+            kind: Response kind, e.g. 'transcript' or 'metadata'
+            video_id: YouTube video ID
+            fetch: Function returning the serialized JSON payload (str or bytes)
+            negative: Exception types whose message is cached as a failure
+            cacheable: Optional predicate on the payload; False skips storing it
+
+        Returns:
+            bytes: The payload
+
+        Raises:
+            CachedError: When a cached failure is still fresh
+        """
+        with metrics.phase('cache_lookup'):
+            entry = self.get(kind, video_id)
+        if entry is None:
+            with file_lock(self.lock_path(kind, video_id)):
+                entry = self.get(kind, video_id)
+                if entry is None:
+                    self.misses += 1
+                    metrics.count('cache_misses')
+                    try:
+                        payload = fetch()
+                    except negative as e:
+                        self.put(kind, video_id, str(e), STATUS_ERROR)
+                        raise
+                    if isinstance(payload, str):
+                        payload = payload.encode('utf-8')
+                    if cacheable is None or cacheable(payload):
+                        self.put(kind, video_id, payload)
+                    return payload
+
+        self.hits += 1
+        metrics.count('cache_hits')
+        status, payload = entry
+        if status == STATUS_ERROR:
+            raise CachedError(payload.decode('utf-8'))
+        return payload